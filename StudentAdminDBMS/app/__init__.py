@@ -1 +1,62 @@
-# Lost and Found Management System
+import os
+from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
+from app import assets, audit, auth, fragments, images, lifecycle, profiling, ratelimit, views
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def create_app(config=None, start_worker=True):
+    app = Flask(__name__, root_path=PROJECT_ROOT)
+    app.secret_key = os.environ.get('SESSION_SECRET', 'shhhhh')
+    app.config.update(
+        MATCH_IN_BACKGROUND=os.environ.get('MATCH_IN_BACKGROUND', '1') == '1',
+        SHUTDOWN_DRAIN_TIMEOUT=int(os.environ.get('SHUTDOWN_DRAIN_TIMEOUT', 30)),
+        MATCHING_DRIVER=os.environ.get('MATCHING_DRIVER', 'sync'),
+        MATCHING_CONCURRENCY=int(os.environ.get('MATCHING_CONCURRENCY', 4)),
+        REPLICA_STICKY_SECONDS=int(os.environ.get('REPLICA_STICKY_SECONDS', 10)),
+        PROFILE_SAMPLE_RATE=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+        PROFILE_SLOW_MS=int(os.environ.get('PROFILE_SLOW_MS', 500)),
+        PROFILE_INTERVAL_MS=int(os.environ.get('PROFILE_INTERVAL_MS', 5)),
+        PROFILE_DIR=os.environ.get('PROFILE_DIR', os.path.join(PROJECT_ROOT, 'profiles')),
+        RATE_LIMIT_ENABLED=os.environ.get('RATE_LIMIT_ENABLED', '1') == '1',
+        RATE_LIMIT_STORE=os.environ.get('RATE_LIMIT_STORE', 'memory'),
+        RATE_LIMIT_LOGIN=os.environ.get('RATE_LIMIT_LOGIN', '60/60'),
+        RATE_LIMIT_LOGIN_FAILURES=os.environ.get('RATE_LIMIT_LOGIN_FAILURES', '5/300'),
+        RATE_LIMIT_REGISTER=os.environ.get('RATE_LIMIT_REGISTER', '30/600'),
+        RATE_LIMIT_REPORT=os.environ.get('RATE_LIMIT_REPORT', '20/600'),
+        ADMISSION_SHED_QUEUE=int(os.environ.get('ADMISSION_SHED_QUEUE', 1000)),
+        ADMISSION_SHED_LATENCY_MS=float(os.environ.get('ADMISSION_SHED_LATENCY_MS', 1000)),
+        ADMISSION_DEFER_QUEUE=int(os.environ.get('ADMISSION_DEFER_QUEUE', 200)),
+        ADMISSION_DEFER_LATENCY_MS=float(os.environ.get('ADMISSION_DEFER_LATENCY_MS', 250)),
+        ADMISSION_RETRY_AFTER=int(os.environ.get('ADMISSION_RETRY_AFTER', 5)),
+        DUPLICATE_REPORT_WINDOW=int(os.environ.get('DUPLICATE_REPORT_WINDOW', 600)),
+        PROXY_FIX_X_FOR=int(os.environ.get('PROXY_FIX_X_FOR', 0)),
+    )
+    app.config.update(config or {})
+
+    # Behind reverse proxies, take the client address from the X-Forwarded-For
+    # entries they add, so rate limits are per client rather than per proxy.
+    # Only trust as many hops as there are proxies: clients can send the header too.
+    if app.config['PROXY_FIX_X_FOR']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+
+    @app.before_request
+    def ensure_worker_started():
+        # Servers without a post-fork hook get their resources on first request
+        lifecycle.start_worker(app)
+
+    auth.login_manager.init_app(app)
+    audit.init_app(app)
+    images.init_app(app)
+    views.init_app(app)
+    ratelimit.init_app(app)
+    profiling.init_app(app)
+
+    asset_manifest = assets.init_app(app)
+    fragments.precompile_templates(app)
+    app.config['TEMPLATES_VERSION'] = fragments.templates_version(app) + ':' + ','.join(sorted(asset_manifest.values()))
+
+    if start_worker:
+        lifecycle.start_worker(app)
+
+    return app
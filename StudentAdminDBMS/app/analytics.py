@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from app.normalize import CATEGORIES
+
+# Admin analytics: items reported, matched and recovered over time, per
+# category and per location. Triggers on the item and match tables append a
+# row to analytics_events for each of those (migration 0012); the aggregator
+# folds new events into hourly and daily rollups, ANALYTICS_BATCH_SIZE at a
+# time, and deletes them in the same transaction. Charts read a bounded
+# window of rollup rows, so a request costs the same however many items have
+# ever been reported, and the hot tables are never scanned for a chart.
+#
+# Every event is counted in the bucket of its item's report time: a day's
+# matched and recovered counts are those of the items reported that day, so
+# match and recovery rates compare like with like. Hourly rollups are kept for
+# ANALYTICS_HOURLY_DAYS; daily ones for good.
+#
+# Each server worker runs the aggregator every ANALYTICS_INTERVAL_SECONDS
+# (0 leaves it to 'manage.py aggregate-analytics' from cron). Runs take an
+# advisory lock, so workers never fold the same events twice; charts trail
+# new reports by up to one interval.
+
+ANALYTICS_INTERVAL_SECONDS = float(os.environ.get('ANALYTICS_INTERVAL_SECONDS', 60))
+ANALYTICS_BATCH_SIZE = int(os.environ.get('ANALYTICS_BATCH_SIZE', 5000))
+ANALYTICS_HOURLY_DAYS = int(os.environ.get('ANALYTICS_HOURLY_DAYS', 14))
+
+MAX_PERIODS = {'day': 366, 'hour': ANALYTICS_HOURLY_DAYS * 24}
+DEFAULT_PERIODS = {'day': 30, 'hour': 48}
+BREAKDOWN_LIMIT = 10
+
+# Stored category IDs are reported under their canonical name, aliases included
+CATEGORY_NAMES = {category_id: name for name, (category_id, aliases) in CATEGORIES.items()}
+
+def hourly_cutoff():
+    return datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=ANALYTICS_HOURLY_DAYS)
+
+def aggregate(db, batch_size=ANALYTICS_BATCH_SIZE, max_batches=None):
+    # Applies pending events until none are left. None when another process
+    # is aggregating.
+    started = time.perf_counter()
+    cutoff = hourly_cutoff()
+    applied = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        count = db.aggregate_analytics(batch_size, cutoff, CATEGORY_NAMES)
+        if count is None:
+            if batches == 0:
+                return None
+            break
+        batches += 1
+        applied += count
+        if count < batch_size:
+            break
+    pruned = db.prune_analytics(cutoff)
+    return {'events': applied, 'batches': batches, 'pruned': pruned, 'seconds': time.perf_counter() - started}
+
+class Aggregator:
+    # Runs aggregate() on a thread with its own connection
+    def __init__(self, database_factory, interval=ANALYTICS_INTERVAL_SECONDS):
+        self.database_factory = database_factory
+        self.interval = interval
+        self.stopping = threading.Event()
+        self.thread = None
+        self.runs = 0
+        self.events = 0
+        self.last_error = None
+
+    def start(self):
+        if self.thread is not None or self.interval <= 0:
+            return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run, name='analytics-aggregator', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        db = self.database_factory()
+        try:
+            while not self.stopping.wait(self.interval):
+                try:
+                    result = aggregate(db)
+                    self.last_error = None
+                except Exception as e:
+                    self.last_error = str(e)
+                    print(f"Analytics aggregation error: {e}")
+                    continue
+                if result is not None:
+                    self.runs += 1
+                    self.events += result['events']
+        finally:
+            db.close()
+
+    def stop(self, timeout=5):
+        if self.thread is None:
+            return
+        self.stopping.set()
+        self.thread.join(timeout)
+        self.thread = None
+
+    def stats(self):
+        return {'running': self.thread is not None, 'runs': self.runs, 'events': self.events,
+                'last_error': self.last_error}
+
+def buckets(grain, periods):
+    step = timedelta(hours=1) if grain == 'hour' else timedelta(days=1)
+    now = datetime.now()
+    last = now.replace(minute=0, second=0, microsecond=0) if grain == 'hour' else \
+        now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return [last - step * index for index in range(periods - 1, -1, -1)]
+
+def rates(row):
+    row['match_rate'] = round(row['matched'] / row['reported'], 4) if row['reported'] else None
+    row['recovery_rate'] = round(row['recovered'] / row['reported'], 4) if row['reported'] else None
+    return row
+
+def analytics_report(db, grain='day', periods=None):
+    periods = min(max(periods or DEFAULT_PERIODS[grain], 1), MAX_PERIODS[grain])
+    series_buckets = buckets(grain, periods)
+    since = series_buckets[0]
+
+    # Buckets without reports are rollup rows that were never written
+    series = {bucket: {kind: {'reported': 0, 'matched': 0, 'match_seconds': 0.0, 'recovered': 0}
+                       for kind in ('lost', 'found')} for bucket in series_buckets}
+    for row in db.get_analytics_series(grain, since):
+        if row['bucket'] in series:
+            series[row['bucket']][row['kind']] = {column: row[column] for column in
+                                                  ('reported', 'matched', 'match_seconds', 'recovered')}
+
+    totals = {}
+    points = []
+    for bucket in series_buckets:
+        point = {'bucket': bucket.isoformat()}
+        for kind, counts in series[bucket].items():
+            total = totals.setdefault(kind, {'reported': 0, 'matched': 0, 'match_seconds': 0.0, 'recovered': 0})
+            for column, value in counts.items():
+                total[column] += value
+            point[kind] = {'reported': counts['reported'], 'matched': counts['matched'],
+                           'recovered': counts['recovered']}
+        points.append(point)
+    for total in totals.values():
+        match_seconds = total.pop('match_seconds')
+        total['avg_hours_to_match'] = round(match_seconds / total['matched'] / 3600, 2) if total['matched'] else None
+        rates(total)
+
+    # Breakdowns always come from the daily rollups
+    day = since.replace(hour=0)
+
+    def breakdown(dimension):
+        rows = []
+        for row in db.get_analytics_breakdown(dimension, day, BREAKDOWN_LIMIT):
+            rows.append({'value': row['value'], **{kind: rates({
+                column: row[f'{kind}_{column}'] for column in ('reported', 'matched', 'recovered')
+            }) for kind in ('lost', 'found')}})
+        return rows
+
+    state = db.get_analytics_state()
+    return {
+        'grain': grain,
+        'periods': periods,
+        'since': since.isoformat(),
+        'series': points,
+        'totals': totals,
+        'categories': breakdown('category'),
+        'locations': breakdown('location'),
+        'updated_at': state['updated_at'].isoformat() if state['updated_at'] else None,
+        'pending_events': state['pending_events'],
+    }
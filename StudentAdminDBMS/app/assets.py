@@ -0,0 +1,97 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from flask import request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ASSETS = ('css/style.css', 'js/dashboard.js')
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+ONE_YEAR = 365 * 24 * 60 * 60
+
+def minify_css(source):
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    source = re.sub(r':\s+', ':', source)
+    return source.replace(';}', '}').strip()
+
+def minify_js(source):
+    # Conservative: drop comments, indentation and blank lines but keep line
+    # breaks so automatic semicolon insertion behaves exactly as before.
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    lines = (line.strip() for line in source.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+def build_assets(static_folder):
+    manifest = {}
+    for name in ASSETS:
+        base, ext = os.path.splitext(name)
+        with open(os.path.join(static_folder, name), encoding='utf-8') as f:
+            data = MINIFIERS[ext](f.read()).encode('utf-8')
+
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        hashed_name = f'{DIST_DIR}/{base}.{digest}{ext}'
+        path = os.path.join(static_folder, hashed_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, 'wb') as f:
+            f.write(data)
+        with open(path + '.gz', 'wb') as f:
+            f.write(gzip.compress(data, 9, mtime=0))
+        if brotli is not None:
+            with open(path + '.br', 'wb') as f:
+                f.write(brotli.compress(data))
+
+        manifest[name] = hashed_name
+
+    with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def init_app(app):
+    manifest = load_manifest(app.static_folder)
+    serve_default = app.view_functions['static']
+
+    def asset_url(filename):
+        return url_for('static', filename=manifest.get(filename, filename))
+
+    def serve_static(filename):
+        if not filename.startswith(DIST_DIR + '/'):
+            return serve_default(filename=filename)
+
+        # Hashed files never change, so they can be cached for a year and
+        # served from the pre-compressed variant the client accepts.
+        accepted = request.accept_encodings
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if accepted[encoding] and os.path.exists(os.path.join(app.static_folder, filename + suffix)):
+                response = send_from_directory(app.static_folder, filename + suffix, max_age=ONE_YEAR,
+                                               mimetype=mimetypes.guess_type(filename)[0])
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(app.static_folder, filename, max_age=ONE_YEAR)
+
+        response.headers['Cache-Control'] = f'public, max-age={ONE_YEAR}, immutable'
+        response.vary.add('Accept-Encoding')
+        return response
+
+    app.view_functions['static'] = serve_static
+    app.jinja_env.globals['asset_url'] = asset_url
+    return manifest
@@ -0,0 +1,139 @@
+import asyncio
+from app.database import DATABASE_DSN
+from app.matching import audit_match, lost_match_message, found_match_message
+from app.open_index import open_index
+from app.parallel import score_all
+from app.scoring import get_scorer
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+class AsyncDatabase:
+    # asyncio counterpart of Database for the matching and notification paths.
+    # Queries run on a small connection pool so candidate fetches and writes
+    # for several reports overlap instead of waiting on one connection.
+    def __init__(self, dsn=DATABASE_DSN, min_size=2, max_size=4, match_cache=None):
+        if asyncpg is None:
+            raise RuntimeError('asyncpg is required for the async database layer')
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.match_cache = match_cache
+        self.pool = None
+
+    async def connect(self):
+        self.pool = await asyncpg.create_pool(self.dsn, min_size=self.min_size, max_size=self.max_size)
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def fetch(self, query, *args):
+        return [dict(row) for row in await self.pool.fetch(query, *args)]
+
+    async def fetchrow(self, query, *args):
+        row = await self.pool.fetchrow(query, *args)
+        return dict(row) if row else None
+
+    async def get_lost_item_by_id(self, lost_id):
+        return await self.fetchrow("SELECT * FROM lost_items WHERE lost_id = $1", lost_id)
+
+    async def get_found_item_by_id(self, found_id):
+        return await self.fetchrow("SELECT * FROM found_items WHERE found_id = $1", found_id)
+
+    async def get_open_lost_items(self):
+        return await self.fetch("SELECT * FROM lost_items WHERE status = 'unfound'")
+
+    async def get_open_found_items(self):
+        return await self.fetch("SELECT * FROM found_items WHERE status = 'unclaimed'")
+
+    async def get_open_lost_items_by_ids(self, lost_ids):
+        return await self.fetch("SELECT * FROM lost_items WHERE lost_id = ANY($1::int[]) AND status = 'unfound' ORDER BY lost_id",
+                                list(lost_ids))
+
+    async def get_open_found_items_by_ids(self, found_ids):
+        return await self.fetch("SELECT * FROM found_items WHERE found_id = ANY($1::int[]) AND status = 'unclaimed' ORDER BY found_id",
+                                list(found_ids))
+
+    async def create_matches_bulk(self, matches):
+        # One round trip for the whole batch: arrays are expanded server-side
+        created = await self.fetch("""
+            INSERT INTO match_table (lost_id, found_id, match_score)
+            SELECT * FROM unnest($1::int[], $2::int[], $3::numeric[])
+            ON CONFLICT (lost_id, found_id) DO UPDATE SET match_score = EXCLUDED.match_score
+            RETURNING match_id, lost_id, found_id, (xmax = 0) AS inserted
+        """, [m[0] for m in matches], [m[1] for m in matches], [m[2] for m in matches])
+        if self.match_cache is not None:
+            self.match_cache.invalidate('lost', {row['lost_id'] for row in created})
+            self.match_cache.invalidate('found', {row['found_id'] for row in created})
+        return created
+
+    async def create_notifications_bulk(self, notifications):
+        await self.pool.execute("""
+            INSERT INTO notifications (user_id, match_id, message)
+            SELECT * FROM unnest($1::int[], $2::int[], $3::text[])
+        """, [n[0] for n in notifications], [n[1] for n in notifications], [n[2] for n in notifications])
+
+    async def score_item(self, scorer, item_id, item_type):
+        # The item and its matching open candidates as (row, score). The item
+        # and the open rows are fetched concurrently, unless the open items
+        # index supplies the candidates and only the matched rows are read.
+        if item_type == 'lost':
+            kind, get_item, get_open, get_by_ids = ('found', self.get_lost_item_by_id, self.get_open_found_items,
+                                                    self.get_open_found_items_by_ids)
+        else:
+            kind, get_item, get_open, get_by_ids = ('lost', self.get_found_item_by_id, self.get_open_lost_items,
+                                                    self.get_open_lost_items_by_ids)
+        if open_index.active:
+            item = await get_item(item_id)
+            if not item:
+                return None, []
+            item_features = scorer.features(item, item_type)
+            indexed = open_index.score(scorer, item_features, kind)
+            if indexed is not None:
+                scores = dict(indexed[0])
+                rows = await get_by_ids(scores) if scores else []
+                return item, [(row, scores[row[f'{kind}_id']]) for row in rows]
+            candidates = await get_open()
+        else:
+            item, candidates = await asyncio.gather(get_item(item_id), get_open())
+            if not item:
+                return None, []
+            item_features = scorer.features(item, item_type)
+        return item, score_all(scorer, item_features, ((row, scorer.features(row, kind)) for row in candidates), kind)
+
+    async def find_and_create_matches(self, item_id, item_type='lost'):
+        # Same results as matching.find_and_create_matches, but all matches
+        # and notifications are written in two statements.
+        item, candidates = await self.score_item(get_scorer(), item_id, item_type)
+        if not item:
+            return []
+        if item_type == 'lost':
+            scored = [(item, candidate, match_score) for candidate, match_score in candidates]
+        else:
+            scored = [(candidate, item, match_score) for candidate, match_score in candidates]
+        if not scored:
+            return []
+
+        created = await self.create_matches_bulk(
+            [(lost_item['lost_id'], found_item['found_id'], match_score) for lost_item, found_item, match_score in scored]
+        )
+        match_ids = {(row['lost_id'], row['found_id']): row['match_id'] for row in created}
+
+        notifications = []
+        matches = []
+        for lost_item, found_item, match_score in scored:
+            match_id = match_ids[(lost_item['lost_id'], found_item['found_id'])]
+            notifications.append((lost_item['user_id'], match_id, lost_match_message(lost_item, match_score)))
+            notifications.append((found_item['user_id'], match_id, found_match_message(found_item, match_score)))
+            audit_match(match_id, lost_item, found_item, match_score)
+            if item_type == 'lost':
+                matches.append({'match_id': match_id, 'found_item': found_item, 'match_score': match_score})
+            else:
+                matches.append({'match_id': match_id, 'lost_item': lost_item, 'match_score': match_score})
+        await self.create_notifications_bulk(notifications)
+
+        return matches
@@ -0,0 +1,262 @@
+import fcntl
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+import psycopg2
+from psycopg2.extras import Json, execute_values
+from flask import g, has_request_context, request
+from flask_login import current_user
+
+# Structured audit log: one JSON object per event (reports, matches created
+# and the users they notified, status changes, verifications, logins).
+# event() only builds a dict and hands it to a logging QueueHandler, so the
+# request or matching thread never waits on I/O. A writer thread drains the
+# queue and writes what arrived within AUDIT_FLUSH_SECONDS (at most
+# AUDIT_BATCH_SIZE events) to each sink in one go:
+#
+# - AUDIT_LOG_FILE: JSON lines, rotated at AUDIT_LOG_MAX_BYTES keeping
+#   AUDIT_LOG_BACKUPS old files. Server workers share the file: a batch is
+#   appended and the file rotated under an flock, and a worker whose file
+#   was rotated by another reopens it.
+# - AUDIT_LOG_DB=1: the audit_log table (migration 0010), one multi-row
+#   INSERT per batch on the writer's own connection. PostgreSQL backend only.
+#
+# Events raised during a request carry its request id (the X-Request-ID
+# header, or a new one echoed back in the response), the signed-in user and
+# the client address. The queue is bounded by AUDIT_QUEUE_SIZE: if the sinks
+# fall that far behind, events are dropped and counted rather than slowing
+# requests down. A sink error drops that batch for that sink only.
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AUDIT_LOG_FILE = os.environ.get('AUDIT_LOG_FILE', os.path.join(PROJECT_ROOT, 'logs', 'audit.log'))
+AUDIT_LOG_MAX_BYTES = int(os.environ.get('AUDIT_LOG_MAX_BYTES', 10 * 2 ** 20))
+AUDIT_LOG_BACKUPS = int(os.environ.get('AUDIT_LOG_BACKUPS', 5))
+AUDIT_LOG_DB = os.environ.get('AUDIT_LOG_DB', '0') == '1'
+AUDIT_REQUESTS = os.environ.get('AUDIT_REQUESTS', '0') == '1'
+AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 500))
+AUDIT_FLUSH_SECONDS = float(os.environ.get('AUDIT_FLUSH_SECONDS', 1.0))
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+logger = logging.getLogger('app.audit')
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+def json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+def dumps(event):
+    return json.dumps(event, default=json_default, separators=(',', ':'))
+
+class AuditQueueHandler(logging.handlers.QueueHandler):
+    # Events are dicts already: skip the message formatting QueueHandler
+    # does, and drop instead of raising when the queue is full
+    def __init__(self, events):
+        super().__init__(events)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record.audit
+
+    def enqueue(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+class FileSink:
+    name = 'file'
+
+    def __init__(self, path, max_bytes, backups):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = open(path + '.lock', 'a')
+        self.stream = None
+
+    def write(self, batch):
+        text = ''.join(dumps(event) + '\n' for event in batch)
+        fcntl.flock(self.lock, fcntl.LOCK_EX)
+        try:
+            self.reopen_if_rotated()
+            self.stream.write(text)
+            self.stream.flush()
+            if self.max_bytes and self.stream.tell() >= self.max_bytes:
+                self.rotate()
+        finally:
+            fcntl.flock(self.lock, fcntl.LOCK_UN)
+
+    def reopen_if_rotated(self):
+        if self.stream is not None:
+            try:
+                if os.stat(self.path).st_ino == os.fstat(self.stream.fileno()).st_ino:
+                    return
+            except FileNotFoundError:
+                pass
+            self.stream.close()
+        self.stream = open(self.path, 'a', encoding='utf-8')
+
+    def rotate(self):
+        # audit.log -> audit.log.1 -> ... -> audit.log.<backups>, oldest dropped
+        self.stream.close()
+        self.stream = None
+        for number in range(self.backups - 1, 0, -1):
+            if os.path.exists(f'{self.path}.{number}'):
+                os.replace(f'{self.path}.{number}', f'{self.path}.{number + 1}')
+        if self.backups:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+        self.lock.close()
+
+class DatabaseSink:
+    name = 'database'
+
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self.conn = None
+
+    def write(self, batch):
+        try:
+            if self.conn is None or self.conn.closed:
+                self.conn = psycopg2.connect(self.dsn)
+                self.conn.autocommit = True
+            cursor = self.conn.cursor()
+            execute_values(cursor, """
+                INSERT INTO audit_log (created_at, event, request_id, actor_id, data) VALUES %s
+            """, [(event['time'], event['event'], event.get('request_id'), event.get('actor_id'),
+                   Json(event, dumps=dumps)) for event in batch], page_size=len(batch))
+            cursor.close()
+        except psycopg2.Error:
+            if self.conn is not None:
+                self.conn.close()
+            raise
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+class AuditLog:
+    def __init__(self):
+        self.events = queue.Queue(AUDIT_QUEUE_SIZE)
+        self.handler = AuditQueueHandler(self.events)
+        self.sinks = []
+        self.thread = None
+        self.written = 0
+
+    def start(self, dsn=None):
+        # Per process, after the server has forked; dsn enables the database sink
+        if self.thread is not None:
+            return
+        sinks = []
+        if AUDIT_LOG_FILE:
+            sinks.append(FileSink(AUDIT_LOG_FILE, AUDIT_LOG_MAX_BYTES, AUDIT_LOG_BACKUPS))
+        if AUDIT_LOG_DB and dsn:
+            sinks.append(DatabaseSink(dsn))
+        if not sinks:
+            return
+        self.sinks = sinks
+        logger.addHandler(self.handler)
+        self.thread = threading.Thread(target=self.run, name='audit-writer', daemon=True)
+        self.thread.start()
+
+    @property
+    def running(self):
+        return self.thread is not None
+
+    def run(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                return
+            batch = [event]
+            stopping = False
+            deadline = time.monotonic() + AUDIT_FLUSH_SECONDS
+            while len(batch) < AUDIT_BATCH_SIZE:
+                try:
+                    event = self.events.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if event is None:
+                    stopping = True
+                    break
+                batch.append(event)
+            self.write(batch)
+            if stopping:
+                return
+
+    def write(self, batch):
+        for sink in self.sinks:
+            try:
+                sink.write(batch)
+            except Exception as e:
+                print(f"Audit log {sink.name} sink error, {len(batch)} events dropped: {e}")
+        self.written += len(batch)
+
+    def stop(self, timeout=5):
+        # Events queued before the sentinel are still written
+        if self.thread is None:
+            return
+        logger.removeHandler(self.handler)
+        try:
+            self.events.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            print(f"Audit log did not drain within {timeout}s; {self.events.qsize()} events dropped")
+        for sink in self.sinks:
+            sink.close()
+        self.sinks = []
+        self.thread = None
+
+    def stats(self):
+        return {'queued': self.events.qsize(), 'written': self.written, 'dropped': self.handler.dropped}
+
+audit_log = AuditLog()
+
+def event(name, **fields):
+    if not audit_log.running:
+        return
+    record = {'time': datetime.now(timezone.utc).isoformat(), 'event': name}
+    if has_request_context():
+        record['request_id'] = getattr(g, 'request_id', None)
+        if current_user.is_authenticated:
+            record['actor_id'] = current_user.id
+        record['ip'] = request.remote_addr
+    record.update(fields)
+    logger.info(name, extra={'audit': record})
+
+def init_app(app):
+    app.before_request(assign_request_id)
+    app.after_request(finish_request)
+
+def assign_request_id():
+    g.request_id = (request.headers.get(REQUEST_ID_HEADER) or '')[:64] or uuid.uuid4().hex
+    g.request_started = time.perf_counter()
+
+def finish_request(response):
+    if 'request_id' not in g:
+        return response
+    response.headers[REQUEST_ID_HEADER] = g.request_id
+    if AUDIT_REQUESTS and request.endpoint != 'static':
+        event('request', method=request.method, path=request.path, status=response.status_code,
+              ms=round((time.perf_counter() - g.request_started) * 1000, 1))
+    return response
@@ -0,0 +1,53 @@
+from flask import flash, jsonify, redirect, url_for
+from flask_login import LoginManager, UserMixin, current_user
+from functools import wraps
+from app.extensions import db
+
+login_manager = LoginManager()
+login_manager.login_view = 'login'
+
+class User(UserMixin):
+    def __init__(self, user_data):
+        self.id = user_data['user_id']
+        self.username = user_data['username']
+        self.email = user_data['email']
+        self.full_name = user_data['full_name']
+        self.role = user_data['role']
+        self.phone = user_data.get('phone')
+
+@login_manager.user_loader
+def load_user(user_id):
+    user_data = db.get_user_by_id(int(user_id))
+    if user_data:
+        return User(user_data)
+    return None
+
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated or current_user.role != 'admin':
+            flash('Access denied. Admin privileges required.', 'error')
+            return redirect(url_for('index'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def student_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated or current_user.role != 'student':
+            flash('Access denied. Student privileges required.', 'error')
+            return redirect(url_for('index'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def api_required(role=None):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_user.is_authenticated:
+                return jsonify({'error': 'Authentication required.'}), 401
+            if role and current_user.role != role:
+                return jsonify({'error': f'Access denied. {role.capitalize()} privileges required.'}), 403
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
@@ -0,0 +1,251 @@
+import csv
+import os
+import random
+import time
+from datetime import date, timedelta
+from app.matching import calculate_match_score, find_and_create_matches
+from app.memory_database import MemoryDatabase
+from app.scoring import get_scorer
+
+# Synthetic lost/found reports with known ground truth, for measuring match
+# quality (precision/recall at the scoring threshold) next to matching speed.
+# Every true pair is one object described twice: by its owner and, with
+# typos, vague wording, a nearby location and a later date, by its finder.
+# Distractors are unrelated reports drawn from the same vocabulary.
+
+CATEGORIES = {
+    'Electronics': ['phone', 'laptop', 'charger', 'headphones', 'earbuds', 'calculator', 'tablet', 'power bank'],
+    'Bags': ['backpack', 'tote bag', 'duffel bag', 'laptop bag', 'purse'],
+    'Keys': ['car keys', 'house keys', 'key ring', 'bike lock key'],
+    'Wallets': ['wallet', 'card holder', 'coin purse'],
+    'Clothing': ['jacket', 'hoodie', 'scarf', 'cap', 'gloves', 'sweater'],
+    'Books': ['textbook', 'notebook', 'novel', 'planner'],
+    'Accessories': ['umbrella', 'water bottle', 'sunglasses', 'glasses case', 'watch'],
+    'ID Cards': ['student id', 'id card', 'library card'],
+    'Jewelry': ['ring', 'necklace', 'bracelet', 'earrings'],
+}
+BRANDS = {
+    'Electronics': ['Apple', 'Samsung', 'Dell', 'Sony', 'Anker', 'Casio', 'Lenovo'],
+    'Bags': ['Nike', 'Adidas', 'JanSport', 'Herschel'],
+    'Clothing': ['Nike', 'Adidas', 'Uniqlo', 'Patagonia'],
+    'Accessories': ['Hydro Flask', 'Ray-Ban', 'Casio'],
+}
+COLORS = ['black', 'white', 'blue', 'red', 'green', 'silver', 'grey', 'pink', 'brown', 'yellow', 'purple']
+FEATURES = ['with stickers', 'cracked screen', 'name tag', 'keychain attached', 'scratched corner',
+            'torn strap', 'initials engraved', 'zip pocket', 'leather', 'plastic cover', 'small dent',
+            'star sticker', 'red lanyard', 'floral pattern', 'striped', 'rubber case']
+FILLER = ['my', 'a', 'the', 'old', 'new', 'small', 'large', 'very', 'really', 'please', 'contact', 'me',
+          'found', 'lost', 'left', 'near', 'on', 'it', 'has', 'looks', 'like']
+LOCATIONS = ['Library', 'Gym', 'Cafeteria', 'Lecture Hall A', 'Lecture Hall B', 'Parking Lot',
+             'Student Center', 'Dormitory', 'Science Building', 'Bus Stop', 'Chemistry Lab',
+             'Football Field', 'Bookstore', 'Auditorium']
+LOCATION_VARIANTS = ['{} entrance', 'near the {}', '{} second floor', 'outside {}']
+# Other words finders use for the same category or object
+CATEGORY_ALIASES = {
+    'Electronics': ['Gadgets', 'Devices'],
+    'Bags': ['Backpacks', 'Luggage'],
+    'Keys': ['Keychains'],
+    'Wallets': ['Purses'],
+    'Clothing': ['Clothes', 'Apparel'],
+    'Books': ['Textbooks', 'Stationery'],
+    'Accessories': ['Accessory'],
+    'ID Cards': ['Documents', 'Identification'],
+    'Jewelry': ['Jewellery'],
+}
+NOUN_ALIASES = {
+    'phone': ['mobile', 'smartphone', 'cellphone'],
+    'laptop': ['macbook', 'chromebook'],
+    'earbuds': ['airpods', 'earphones'],
+    'headphones': ['headset'],
+    'backpack': ['rucksack', 'bookbag'],
+    'jacket': ['coat'],
+    'hoodie': ['sweatshirt'],
+    'water bottle': ['water flask', 'tumbler'],
+}
+
+START_DATE = date(2026, 1, 1)
+DAYS = 120
+
+def typo(word, rng):
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    kind = rng.randrange(4)
+    if kind == 0:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i - 1] + word[i] + word[i - 1] + word[i + 1:]
+    if kind == 2:
+        return word[:i] + rng.choice('abcdefghijklmnopqrstuvwxyz') + word[i + 1:]
+    return word[:i] + word[i] + word[i:]
+
+def add_typos(text, rng, rate):
+    return ' '.join(typo(word, rng) if rng.random() < rate else word for word in text.split())
+
+def describe_object(rng):
+    category = rng.choice(list(CATEGORIES))
+    noun = rng.choice(CATEGORIES[category])
+    color = rng.choice(COLORS)
+    brand = rng.choice(BRANDS[category]) if category in BRANDS and rng.random() < 0.6 else None
+    features = rng.sample(FEATURES, rng.randint(1, 3))
+    return {
+        'category': category,
+        'noun': noun,
+        'color': color,
+        'brand': brand,
+        'features': features,
+        'location': rng.choice(LOCATIONS),
+        'date': START_DATE + timedelta(days=rng.randrange(DAYS)),
+    }
+
+def owner_report(obj, rng):
+    name = ' '.join(part for part in (obj['color'], obj['brand'], obj['noun']) if part)
+    words = rng.sample(FILLER, 3) + [obj['color'], obj['noun']] + ' '.join(obj['features']).split()
+    rng.shuffle(words)
+    return {
+        'item_name': name.title(),
+        'category': obj['category'],
+        'description': ' '.join(words),
+        'location': obj['location'],
+        'date': obj['date'],
+    }
+
+def finder_report(obj, rng, typo_rate, category_noise, date_jitter, alias_rate=0.0):
+    # Finders know less: often only the noun, some of the features, and
+    # wherever they happened to pick the item up.
+    noun = obj['noun']
+    # Only draw when aliases are on, so the default corpus stays the same per seed
+    if alias_rate and noun in NOUN_ALIASES and rng.random() < alias_rate:
+        noun = rng.choice(NOUN_ALIASES[noun])
+    name = noun if rng.random() < 0.5 else f"{obj['color']} {noun}"
+    features = rng.sample(obj['features'], rng.randint(0, len(obj['features'])))
+    words = rng.sample(FILLER, 4) + [noun] + ' '.join(features).split()
+    if rng.random() < 0.7:
+        words.append(obj['color'])
+    rng.shuffle(words)
+
+    category = obj['category']
+    if rng.random() < category_noise:
+        category = rng.choice([c for c in CATEGORIES if c != category] + ['Other'])
+    elif alias_rate and rng.random() < alias_rate:
+        category = rng.choice(CATEGORY_ALIASES[category])
+
+    location = obj['location']
+    roll = rng.random()
+    if roll < 0.4:
+        location = rng.choice(LOCATION_VARIANTS).format(location)
+    elif roll < 0.55:
+        location = rng.choice(LOCATIONS)
+
+    found_date = obj['date'] + timedelta(days=rng.randint(0, date_jitter))
+    if rng.random() < 0.05:
+        found_date = obj['date'] + timedelta(days=rng.randint(date_jitter + 1, 4 * date_jitter + 1))
+
+    return {
+        'item_name': add_typos(name, rng, typo_rate).title(),
+        'category': category,
+        'description': add_typos(' '.join(words), rng, typo_rate),
+        'location': location,
+        'date': found_date,
+    }
+
+def generate_corpus(pairs=300, distractors=700, seed=1, typo_rate=0.15, category_noise=0.1, date_jitter=5,
+                    alias_rate=0.0):
+    rng = random.Random(seed)
+    lost = []
+    found = []
+    truth = set()
+    for i in range(pairs):
+        obj = describe_object(rng)
+        truth.add((len(lost), len(found)))
+        lost.append(owner_report(obj, rng))
+        found.append(finder_report(obj, rng, typo_rate, category_noise, date_jitter, alias_rate))
+    for i in range(distractors):
+        lost.append(owner_report(describe_object(rng), rng))
+        found.append(finder_report(describe_object(rng), rng, typo_rate, category_noise, date_jitter, alias_rate))
+    return {'lost': lost, 'found': found, 'truth': truth}
+
+def report_order(corpus):
+    # Items arrive in date order; a lost item is reported the day it is lost
+    # and a found item the day it is found.
+    events = [(item['date'], 0, i) for i, item in enumerate(corpus['lost'])]
+    events += [(item['date'], 1, i) for i, item in enumerate(corpus['found'])]
+    events.sort()
+    return [('lost' if kind == 0 else 'found', i) for day, kind, i in events]
+
+def run_benchmark(corpus, match_items=find_and_create_matches, db=None):
+    # Replays the corpus report by report through the matching engine. Every
+    # lost/found pair is scored exactly once, when the later of the two
+    # arrives, so recall covers the whole corpus.
+    db = db or MemoryDatabase()
+    owner = db.create_user('benchmark_owner', 'owner@benchmark.local', 'x', 'Benchmark Owner', 'student', None)
+    finder = db.create_user('benchmark_finder', 'finder@benchmark.local', 'x', 'Benchmark Finder', 'student', None)
+
+    lost_ids = {}
+    found_ids = {}
+    pairs_scored = 0
+    elapsed = 0.0
+    for kind, i in report_order(corpus):
+        item = corpus[kind][i]
+        if kind == 'lost':
+            item_id = db.create_lost_item(owner, item['item_name'], item['category'], item['description'],
+                                          item['location'], item['date'])
+            lost_ids[item_id] = i
+            pairs_scored += len(found_ids)
+        else:
+            item_id = db.create_found_item(finder, item['item_name'], item['category'], item['description'],
+                                           item['location'], item['date'])
+            found_ids[item_id] = i
+            pairs_scored += len(lost_ids)
+        started = time.perf_counter()
+        match_items(db, item_id, kind)
+        elapsed += time.perf_counter() - started
+
+    predicted = {(lost_ids[row['lost_id']], found_ids[row['found_id']]) for row in db.iter_export_rows('matches')}
+    true_positives = len(predicted & corpus['truth'])
+    precision = true_positives / len(predicted) if predicted else 0.0
+    recall = true_positives / len(corpus['truth']) if corpus['truth'] else 0.0
+    return {
+        'lost_items': len(corpus['lost']),
+        'found_items': len(corpus['found']),
+        'true_pairs': len(corpus['truth']),
+        'predicted': len(predicted),
+        'true_positives': true_positives,
+        'precision': precision,
+        'recall': recall,
+        'f1': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        'threshold': get_scorer().threshold,
+        'pairs_scored': pairs_scored,
+        'wall_seconds': elapsed,
+        'pairs_per_second': pairs_scored / elapsed if elapsed else 0.0,
+        'missed': sorted(corpus['truth'] - predicted),
+    }
+
+def explain_miss(corpus, pair):
+    lost = corpus['lost'][pair[0]]
+    found = corpus['found'][pair[1]]
+    score = calculate_match_score(as_lost_row(lost), as_found_row(found))
+    return score, lost, found
+
+def as_lost_row(item):
+    return {'item_name': item['item_name'], 'category': item['category'], 'description': item['description'],
+            'location_lost': item['location'], 'date_lost': item['date']}
+
+def as_found_row(item):
+    return {'item_name': item['item_name'], 'category': item['category'], 'description': item['description'],
+            'location_found': item['location'], 'date_found': item['date']}
+
+def write_corpus_csv(corpus, directory, lost_username='john_doe', found_username='jane_smith'):
+    # Same columns as 'manage.py import-items', plus the ground truth by row number
+    os.makedirs(directory, exist_ok=True)
+    for kind, username in (('lost', lost_username), ('found', found_username)):
+        with open(os.path.join(directory, f'{kind}.csv'), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['username', 'item_name', 'category', 'description', f'location_{kind}', f'date_{kind}'])
+            for item in corpus[kind]:
+                writer.writerow([username, item['item_name'], item['category'], item['description'],
+                                 item['location'], item['date'].isoformat()])
+    with open(os.path.join(directory, 'truth.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['lost_row', 'found_row'])
+        writer.writerows(sorted(corpus['truth']))
@@ -0,0 +1,70 @@
+import csv
+import io
+from app import audit
+from app.database import IMPORT_TARGETS, EXPORT_COLUMNS
+from app.matching import match_new_items
+
+IMPORT_COLUMNS = {
+    'lost': {
+        'required': ('username', 'item_name', 'category', 'description', 'location_lost', 'date_lost'),
+        'optional': ('status', 'created_at', 'lost_id'),
+    },
+    'found': {
+        'required': ('username', 'item_name', 'category', 'description', 'location_found', 'date_found'),
+        'optional': ('status', 'created_at', 'found_id'),
+    },
+}
+
+def read_header(stream):
+    line = stream.readline()
+    if isinstance(line, bytes):
+        line = line.decode('utf-8-sig')
+    else:
+        line = line.lstrip('\ufeff')
+    return [column.strip().lower() for column in next(csv.reader([line]), [])]
+
+def import_items(db, kind, stream, run_matching=True):
+    if kind not in IMPORT_TARGETS:
+        raise ValueError(f'Unknown import type: {kind}')
+
+    columns = read_header(stream)
+    allowed = IMPORT_COLUMNS[kind]['required'] + IMPORT_COLUMNS[kind]['optional']
+    unknown = [c for c in columns if c not in allowed]
+    missing = [c for c in IMPORT_COLUMNS[kind]['required'] if c not in columns]
+    if unknown:
+        raise ValueError(f'Unknown CSV columns: {", ".join(unknown)}')
+    if missing:
+        raise ValueError(f'Missing CSV columns: {", ".join(missing)}')
+
+    new_ids, skipped = db.copy_import_items(kind, columns, stream)
+
+    matches = 0
+    if run_matching and new_ids:
+        if kind == 'lost':
+            matches = match_new_items(db, new_lost_ids=new_ids)
+        else:
+            matches = match_new_items(db, new_found_ids=new_ids)
+
+    audit.event('items_imported', kind=kind, imported=len(new_ids), skipped=skipped, matches=matches)
+    return {'imported': len(new_ids), 'skipped': skipped, 'matches': matches}
+
+def export_csv(db, kind, rows_per_chunk=500):
+    if kind not in EXPORT_COLUMNS:
+        raise ValueError(f'Unknown export type: {kind}')
+
+    columns = EXPORT_COLUMNS[kind]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    pending = 0
+    for row in db.iter_export_rows(kind):
+        writer.writerow([row[c] for c in columns])
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+
+    yield buffer.getvalue()
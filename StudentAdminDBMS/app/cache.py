@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import OrderedDict
+
+class LRUCache:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                return default
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+class MatchCache:
+    # Caches the match list of a single lost or found item. The store can be
+    # any object with get/set/delete/clear (for example a client for a shared
+    # cache server); by default it is a process-local LRUCache.
+    #
+    # Invalidation only reaches this process: matches written by another
+    # server worker or by manage.py (import, sweep) are picked up when the
+    # entry expires after ttl seconds. A list read before a concurrent
+    # invalidation must not be stored after it, so readers take a token with
+    # begin() and set() drops the list if the item was invalidated since.
+    def __init__(self, max_entries=2048, backend=None, ttl=30):
+        self.store = backend if backend is not None else LRUCache(max_entries)
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.reading = {}
+
+    def key(self, kind, item_id):
+        return f'matches:{kind}:{int(item_id)}'
+
+    def get(self, kind, item_id):
+        entry = self.store.get(self.key(kind, item_id))
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def begin(self, kind, item_id):
+        token = object()
+        with self.lock:
+            self.reading[self.key(kind, item_id)] = token
+        return token
+
+    def set(self, kind, item_id, matches, token):
+        key = self.key(kind, item_id)
+        with self.lock:
+            if self.reading.get(key) is not token:
+                return
+            del self.reading[key]
+            self.store.set(key, (time.monotonic() + self.ttl, matches))
+
+    def release(self, kind, item_id, token):
+        # Drops a token whose read failed; a no-op after set() stored it
+        key = self.key(kind, item_id)
+        with self.lock:
+            if self.reading.get(key) is token:
+                del self.reading[key]
+
+    def invalidate(self, kind, item_ids):
+        for item_id in item_ids:
+            key = self.key(kind, item_id)
+            with self.lock:
+                self.reading.pop(key, None)
+            self.store.delete(key)
+
+    def clear(self):
+        with self.lock:
+            self.reading.clear()
+        self.store.clear()
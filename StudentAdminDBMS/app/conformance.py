@@ -0,0 +1,388 @@
+import io
+import time
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from app import analytics, query_plans
+from app.normalize import category_id, name_tokens, token_id
+
+# Behaviour every storage backend must share. The checks run in order against
+# a live backend and only touch the two users they create, which are deleted
+# (with everything they own) at the end, so they are safe to run against a
+# PostgreSQL database that holds real data. Their items are counted by the
+# analytics rollups like any other report. Checks that write shared state
+# (the rollups) only run on PostgreSQL when the database is declared a
+# scratch one.
+CHECKS = []
+
+class Skipped(Exception):
+    pass
+
+def check(f):
+    CHECKS.append(f)
+    return f
+
+def expect(condition, message):
+    if not condition:
+        raise AssertionError(message)
+
+def postgres_only(db):
+    # Checks of PostgreSQL features are skipped on the other backends
+    if not hasattr(db, 'dsn'):
+        raise Skipped('PostgreSQL only')
+
+def scratch_only(db, ctx):
+    # Checks that leave rows nobody owns are skipped on a real database
+    if hasattr(db, 'dsn') and not ctx['scratch']:
+        raise Skipped('writes shared rows; run with --scratch against a scratch database')
+
+def run_conformance(db, scratch=False):
+    suffix = uuid.uuid4().hex[:8]
+    ctx = {'suffix': suffix, 'stats': db.get_statistics(), 'scratch': scratch}
+    ctx['owner'] = db.create_user(f'conformance_owner_{suffix}', f'owner_{suffix}@example.com',
+                                  'x', 'Conformance Owner', 'student', None)
+    ctx['finder'] = db.create_user(f'conformance_finder_{suffix}', f'finder_{suffix}@example.com',
+                                   'x', 'Conformance Finder', 'student', None)
+    # (name, 'ok' / 'skip' / 'FAIL', detail)
+    results = []
+    try:
+        for f in CHECKS:
+            try:
+                f(db, ctx)
+                results.append((f.__name__, 'ok', None))
+            except Skipped as e:
+                results.append((f.__name__, 'skip', str(e)))
+            except Exception as e:
+                db.rollback()
+                results.append((f.__name__, 'FAIL', f'{type(e).__name__}: {e}'))
+    finally:
+        db.delete_user(ctx['owner'])
+        db.delete_user(ctx['finder'])
+    return results
+
+@check
+def users_round_trip(db, ctx):
+    user = db.get_user_by_username(f"conformance_owner_{ctx['suffix']}")
+    expect(user and user['user_id'] == ctx['owner'], 'user not found by username')
+    expect(user['role'] == 'student' and user['password_hash'] == 'x', 'user columns differ')
+    expect(db.get_user_by_id(ctx['owner'])['username'] == user['username'], 'user not found by id')
+    expect(db.get_user_by_username(f"missing_{ctx['suffix']}") is None, 'unknown username should return None')
+
+@check
+def duplicate_username_rejected(db, ctx):
+    try:
+        db.create_user(f"conformance_owner_{ctx['suffix']}", f"other_{ctx['suffix']}@example.com",
+                       'x', 'Duplicate', 'student', None)
+    except Exception:
+        db.rollback()
+        return
+    raise AssertionError('duplicate username was accepted')
+
+@check
+def last_login_recorded(db, ctx):
+    expect(db.get_user_by_id(ctx['owner'])['last_login'] is None, 'new user already has last_login')
+    db.update_last_login(ctx['owner'])
+    expect(isinstance(db.get_user_by_id(ctx['owner'])['last_login'], datetime), 'last_login not set')
+
+@check
+def user_lists_hide_password(db, ctx):
+    users = {user['user_id']: user for user in db.get_all_users()}
+    expect(ctx['owner'] in users and ctx['finder'] in users, 'new users missing from get_all_users')
+    expect('password_hash' not in users[ctx['owner']], 'get_all_users exposes password_hash')
+    expect(all('password_hash' not in user for user in db.get_users_page(5, 0)), 'get_users_page exposes password_hash')
+
+@check
+def lost_item_round_trip(db, ctx):
+    ctx['lost'] = db.create_lost_item(ctx['owner'], 'Blue Backpack', 'Bags', 'blue backpack with laptop',
+                                      'Library', '2026-03-01')
+    item = db.get_lost_item_by_id(ctx['lost'])
+    expect(item['user_id'] == ctx['owner'] and item['status'] == 'unfound', 'lost item columns differ')
+    expect(item['date_lost'] == date(2026, 3, 1), 'date_lost is not returned as a date')
+    expect(isinstance(item['created_at'], datetime), 'created_at is not a datetime')
+    expect(db.get_lost_item_by_id(-1) is None, 'unknown lost item should return None')
+
+@check
+def found_item_round_trip(db, ctx):
+    ctx['found'] = db.create_found_item(ctx['finder'], 'Backpack', 'Bags', 'blue backpack',
+                                        'Library entrance', '2026-03-02')
+    ctx['found_other'] = db.create_found_item(ctx['finder'], 'Umbrella', 'Accessories', 'black umbrella',
+                                              'Cafeteria', '2026-03-05')
+    item = db.get_found_item_by_id(ctx['found'])
+    expect(item['user_id'] == ctx['finder'] and item['status'] == 'unclaimed', 'found item columns differ')
+    expect(item['date_found'] == date(2026, 3, 2), 'date_found is not returned as a date')
+
+@check
+def items_store_normalized_features(db, ctx):
+    lost = db.get_lost_item_by_id(ctx['lost'])
+    found = db.get_found_item_by_id(ctx['found'])
+    expect(lost['category_id'] == found['category_id'] == category_id('Bags'), 'category_id not stored')
+    expect(list(lost['name_tokens']) == name_tokens('Blue Backpack'), 'name_tokens not stored')
+    expect(set(found['name_tokens']) <= set(lost['name_tokens']), 'shared name words got different token IDs')
+    words = [f"{word}{ctx['suffix']}" for word in ('tok', 'tik', 'tak')]
+    ids = name_tokens(' '.join(words))
+    expect(len(ids) == 3 and name_tokens(words[1]) == [token_id(words[1])], f'token IDs collide or change: {ids}')
+
+@check
+def unknown_owner_rejected(db, ctx):
+    try:
+        db.create_lost_item(-1, 'Ghost', 'Other', 'nobody owns this', 'Nowhere', '2026-03-01')
+    except Exception:
+        db.rollback()
+        return
+    raise AssertionError('item for a missing user was accepted')
+
+@check
+def user_lists_newest_first(db, ctx):
+    ctx['lost_resolved'] = db.create_lost_item(ctx['owner'], 'Keys', 'Keys', 'car keys', 'Gym', '2026-03-03')
+    ids = [item['lost_id'] for item in db.get_lost_items_by_user(ctx['owner'])]
+    expect(ids == [ctx['lost_resolved'], ctx['lost']], f'unexpected order {ids}')
+    page = db.get_lost_items_page(1, 1, user_id=ctx['owner'])
+    expect([item['lost_id'] for item in page] == [ctx['lost']], 'limit/offset not applied')
+    ids = [item['found_id'] for item in db.get_found_items_page(10, 0, user_id=ctx['finder'])]
+    expect(ids == [ctx['found_other'], ctx['found']], f'unexpected found order {ids}')
+
+@check
+def admin_lists_include_contact(db, ctx):
+    lost = {item['lost_id']: item for item in db.get_all_lost_items()}
+    expect(lost[ctx['lost']]['username'] == f"conformance_owner_{ctx['suffix']}", 'lost item lacks owner username')
+    found = {item['found_id']: item for item in db.get_all_found_items()}
+    expect(found[ctx['found']]['full_name'] == 'Conformance Finder', 'found item lacks finder name')
+
+@check
+def status_updates_close_items(db, ctx):
+    expect(ctx['lost_resolved'] in {item['lost_id'] for item in db.get_open_lost_items()}, 'new lost item not open')
+    db.update_lost_item_status(ctx['lost_resolved'], 'resolved')
+    expect(ctx['lost_resolved'] not in {item['lost_id'] for item in db.get_open_lost_items()}, 'resolved item still open')
+    expect(ctx['found'] in {item['found_id'] for item in db.get_open_found_items()}, 'new found item not open')
+
+@check
+def match_upsert(db, ctx):
+    ctx['match'] = db.create_match(ctx['lost'], ctx['found'], 55.5)
+    expect(db.create_match(ctx['lost'], ctx['found'], 60) == ctx['match'], 'same pair created a second match')
+    matches = db.get_matches_for_lost_item(ctx['lost'])
+    expect(len(matches) == 1 and matches[0]['match_score'] == Decimal('60.00'), 'score not updated to 60.00')
+    expect(matches[0]['item_name'] == 'Backpack' and matches[0]['username'] == f"conformance_finder_{ctx['suffix']}",
+           'match lacks the found item and its finder')
+    expect(matches[0]['verified'] is False, 'new match is already verified')
+
+@check
+def bulk_matches_invalidate_cache(db, ctx):
+    created = db.create_matches_bulk([(ctx['lost'], ctx['found_other'], 45), (ctx['lost'], ctx['found'], 70)])
+    pairs = {(row['lost_id'], row['found_id']): row['match_id'] for row in created}
+    expect(pairs[(ctx['lost'], ctx['found'])] == ctx['match'], 'bulk upsert changed the match id')
+    inserted = {(row['lost_id'], row['found_id']): row['inserted'] for row in created}
+    expect(inserted == {(ctx['lost'], ctx['found_other']): True, (ctx['lost'], ctx['found']): False},
+           f'bulk upsert reported inserted rows wrong: {inserted}')
+    ctx['match_other'] = pairs[(ctx['lost'], ctx['found_other'])]
+    found_ids = [m['found_id'] for m in db.get_matches_for_lost_item(ctx['lost'])]
+    expect(found_ids == [ctx['found'], ctx['found_other']], f'matches not ordered by score: {found_ids}')
+
+@check
+def match_cache_drops_stale_reads(db, ctx):
+    # A list read before an invalidation must not be cached after it
+    cache = db.match_cache
+    cache.invalidate('lost', [ctx['lost']])
+    token = cache.begin('lost', ctx['lost'])
+    cache.invalidate('lost', [ctx['lost']])
+    cache.set('lost', ctx['lost'], [], token)
+    expect(cache.get('lost', ctx['lost']) is None, 'stale match list cached after an invalidation')
+    token = cache.begin('lost', ctx['lost'])
+    cache.release('lost', ctx['lost'], token)
+    expect(cache.key('lost', ctx['lost']) not in cache.reading, 'failed read left its token behind')
+    found_ids = [m['found_id'] for m in db.get_matches_for_lost_item(ctx['lost'])]
+    expect(cache.get('lost', ctx['lost']) is not None and found_ids, 'match list not cached')
+
+@check
+def verify_match(db, ctx):
+    db.verify_match(ctx['match'])
+    matches = db.get_matches_for_found_item(ctx['found'])
+    expect(matches[0]['verified'] is True and matches[0]['lost_id'] == ctx['lost'], 'match not verified')
+    expect(db.get_statistics()['verified_matches'] == ctx['stats']['verified_matches'] + 1,
+           'verified match not counted')
+
+@check
+def status_change_refreshes_matches(db, ctx):
+    db.get_matches_for_lost_item(ctx['lost'])
+    db.update_found_item_status(ctx['found_other'], 'returned')
+    statuses = {m['found_id']: m['status'] for m in db.get_matches_for_lost_item(ctx['lost'])}
+    expect(statuses[ctx['found_other']] == 'returned', 'cached match list kept the old status')
+
+@check
+def notifications(db, ctx):
+    first = db.create_notification(ctx['owner'], ctx['match'], 'first')
+    db.create_notifications_bulk([(ctx['owner'], ctx['match'], 'second'), (ctx['finder'], ctx['match'], 'third')])
+    messages = [n['message'] for n in db.get_user_notifications(ctx['owner'])]
+    expect(messages == ['second', 'first'], f'unexpected notifications {messages}')
+    expect(db.get_unread_count(ctx['owner']) == 2, 'unread count is not 2')
+    expect(db.mark_notification_read(first, user_id=ctx['finder']) is False, "marked another user's notification")
+    expect(db.mark_notification_read(first, user_id=ctx['owner']) is True, 'could not mark own notification')
+    expect([n['message'] for n in db.get_user_notifications(ctx['owner'], unread_only=True)] == ['second'],
+           'unread_only returned read notifications')
+    expect(len(db.get_notifications_page(ctx['owner'], 1, 1)) == 1, 'notification page size wrong')
+    db.mark_all_notifications_read(ctx['owner'])
+    expect(db.get_unread_count(ctx['owner']) == 0, 'mark_all_notifications_read left unread notifications')
+
+@check
+def statistics_count_new_rows(db, ctx):
+    stats = db.get_statistics()
+    expect(stats['total_lost'] == ctx['stats']['total_lost'] + 2, 'total_lost did not grow by 2')
+    expect(stats['total_found'] == ctx['stats']['total_found'] + 2, 'total_found did not grow by 2')
+    expect(stats['unfound_lost'] == ctx['stats']['unfound_lost'] + 1, 'unfound_lost did not grow by 1')
+    expect(stats['total_students'] == ctx['stats']['total_students'] + 2, 'total_students did not grow by 2')
+
+@check
+def dashboard_versions_change(db, ctx):
+    before = db.get_user_dashboard_version(ctx['owner'])
+    tables_before = db.get_table_versions()
+    db.create_notification(ctx['owner'], ctx['match'], 'fourth')
+    expect(db.get_user_dashboard_version(ctx['owner']) != before, 'version did not change after a notification')
+    db.update_lost_item_status(ctx['lost_resolved'], 'resolved')
+    after = db.get_table_versions()
+    expect(after['lost_version'] != tables_before['lost_version'], 'lost items version did not change after an update')
+    expect(after['found_version'] == tables_before['found_version'], 'found items version changed without a write')
+
+@check
+def csv_import_and_export(db, ctx):
+    stream = io.BytesIO(
+        f"conformance_owner_{ctx['suffix']},Wallet,Wallets,brown wallet,Library,2026-03-04\n"
+        f"missing_{ctx['suffix']},Phone,Electronics,black phone,Gym,2026-03-04\n".encode('utf-8')
+    )
+    columns = ['username', 'item_name', 'category', 'description', 'location_lost', 'date_lost']
+    new_ids, skipped = db.copy_import_items('lost', columns, stream)
+    expect(len(new_ids) == 1 and skipped == 1, f'imported {new_ids}, skipped {skipped}')
+    item = db.get_lost_item_by_id(new_ids[0])
+    expect(item['status'] == 'unfound' and item['date_lost'] == date(2026, 3, 4), 'imported row differs')
+    expect(item['category_id'] == category_id('Wallet') and item['name_tokens'], 'imported row not normalized')
+    exported = [row for row in db.iter_export_rows('lost') if row['lost_id'] == new_ids[0]]
+    expect(exported and exported[0]['username'] == f"conformance_owner_{ctx['suffix']}", 'imported row not exported')
+    exported = [row for row in db.iter_export_rows('matches') if row['match_id'] == ctx['match']]
+    expect(exported and exported[0]['found_item_name'] == 'Backpack', 'match not exported')
+
+@check
+def report_item_is_idempotent(db, ctx):
+    key = f"conformance-{ctx['suffix']}"
+    report = ('found', ctx['finder'], 'Blue Umbrella', 'Accessories', 'blue umbrella', 'Cafeteria', '2026-03-05')
+    item_id, created = db.report_item(*report, idempotency_key=key)
+    expect(created and db.get_found_item_by_id(item_id)['item_name'] == 'Blue Umbrella', 'report not stored')
+    expect(db.report_item(*report, idempotency_key=key) == (item_id, False), 'same key stored a second item')
+    near = ('found', ctx['finder'], 'blue umbrellas', 'Accessories', 'left by the door', 'Cafeteria', '2026-03-05')
+    expect(db.report_item(*near) == (item_id, False), 'near-duplicate report stored a second item')
+    expired_id, created = db.report_item(*near, duplicate_window=0)
+    expect(created and expired_id != item_id, 'report outside the duplicate window treated as a duplicate')
+    other_id, created = db.report_item(*near[:-1], '2026-03-06')
+    expect(created and other_id != item_id, 'report on another date treated as a duplicate')
+
+@check
+def report_stores_image(db, ctx):
+    report = ('lost', ctx['owner'], 'Grey Scarf', 'Clothing', 'grey wool scarf', 'Gym', '2026-03-06')
+    item_id, created = db.report_item(*report, image_file='0123456789abcdef0123456789abcdef.jpg')
+    item = db.get_lost_item_by_id(item_id)
+    expect(created and item['image_file'] == '0123456789abcdef0123456789abcdef.jpg', 'image file not stored')
+    expect(item['image_hash'] is None, 'image hash set before processing')
+    db.set_item_image_hash('lost', item_id, -2 ** 63)
+    expect(db.get_lost_item_by_id(item_id)['image_hash'] == -2 ** 63, 'image hash not stored')
+
+@check
+def verify_matches_retires_competitors(db, ctx):
+    lost = db.create_lost_item(ctx['owner'], 'Red Bottle', 'Accessories', 'red bottle', 'Gym', '2026-03-07')
+    other_lost = db.create_lost_item(ctx['owner'], 'Red Flask', 'Accessories', 'red flask', 'Gym', '2026-03-07')
+    found = db.create_found_item(ctx['finder'], 'Red Bottle', 'Accessories', 'red bottle', 'Gym', '2026-03-07')
+    other_found = db.create_found_item(ctx['finder'], 'Bottle', 'Accessories', 'bottle', 'Gym', '2026-03-07')
+    created = db.create_matches_bulk([(lost, found, 90), (other_lost, found, 60), (lost, other_found, 50)])
+    ids = {(row['lost_id'], row['found_id']): row['match_id'] for row in created}
+    queued = {match['match_id'] for match in db.get_verification_queue_page(10 ** 7, 0)}
+    expect(set(ids.values()) <= queued, 'new matches missing from the verification queue')
+    db.get_matches_for_found_item(found)
+    unread = db.get_unread_count(ctx['owner'])
+
+    def notifications(verified, retired):
+        return [(match['lost_user_id'], match['match_id'], 'verified') for match in verified] + [
+            (match['lost_user_id'], None, 'retired') for match in retired if match['lost_status'] == 'unfound']
+
+    verified = db.verify_matches([ids[(other_lost, found)], ids[(lost, found)]], notifications)
+    expect([match['match_id'] for match in verified] == [ids[(lost, found)]], 'competing match verified in the same batch')
+    expect(db.get_lost_item_by_id(lost)['status'] == 'found', 'lost item not marked found')
+    expect(db.get_found_item_by_id(found)['status'] == 'returned', 'found item not marked returned')
+    expect(db.get_lost_item_by_id(other_lost)['status'] == 'unfound', 'competing lost item changed status')
+    matches = db.get_matches_for_found_item(found)
+    expect([(m['lost_id'], m['verified']) for m in matches] == [(lost, True)], 'competing matches not retired')
+    expect(db.get_matches_for_found_item(other_found) == [], "lost item's other match not retired")
+    expect(db.get_unread_count(ctx['owner']) == unread + 2, 'verification notifications not sent')
+    expect(db.verify_matches([ids[(lost, found)]], notifications) == [], 'verified a match twice')
+
+@check
+def analytics_rollups(db, ctx):
+    # Aggregating drains every pending event into the rollups, which are
+    # never deleted
+    scratch_only(db, ctx)
+    location = f"Analytics Hall {ctx['suffix']}"
+    lost = db.create_lost_item(ctx['owner'], 'Green Cap', 'Hats', 'green cap', location, '2026-03-08')
+    found = db.create_found_item(ctx['finder'], 'Green Cap', 'Hats', 'green cap', f' {location} ', '2026-03-08')
+    other = db.create_found_item(ctx['finder'], 'Cap', 'Clothes', 'cap', location, '2026-03-08')
+    match_id = db.create_matches_bulk([(lost, found, 90)])[0]['match_id']
+    db.create_matches_bulk([(lost, other, 40)])
+    db.verify_matches([match_id], lambda verified, retired: [])
+    db.update_found_item_status(other, 'resolved')
+    db.update_found_item_status(other, 'unclaimed')
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    for attempt in range(50):
+        if analytics.aggregate(db) is not None:
+            break
+        time.sleep(0.1)
+    else:
+        raise AssertionError('another process held the aggregation lock for 5s')
+    rows = db.get_analytics_breakdown('location', today, 10 ** 6)
+    row = next((row for row in rows if row['value'] == location.lower()), None)
+    expect(row is not None, 'location missing from the breakdown')
+    expect((row['lost_reported'], row['lost_matched'], row['lost_recovered']) == (1, 1, 1), f'lost counts {row}')
+    expect((row['found_reported'], row['found_matched'], row['found_recovered']) == (2, 2, 1), f'found counts {row}')
+    categories = {row['value'] for row in db.get_analytics_breakdown('category', today, 10 ** 6)}
+    expect({'hats', 'clothing'} <= categories, f'categories {categories}')
+    series = [row for row in db.get_analytics_series('hour', today) if row['kind'] == 'lost']
+    expect(series and series[-1]['reported'] >= 1, 'hourly series missing')
+    expect(db.get_analytics_state()['updated_at'] is not None, 'aggregation time not recorded')
+
+@check
+def hot_queries_use_indexes(db, ctx):
+    # The EXPLAIN checks of 'manage.py explain-hot-queries'
+    postgres_only(db)
+    missed = [f"{result['name']} ({result['expected']})" for result in query_plans.check_hot_queries(db)
+              if not result['ok']]
+    expect(not missed, f"expected index not used: {', '.join(missed)}")
+
+@check
+def async_worker_waits_for_database(db, ctx):
+    # A worker started while PostgreSQL is unreachable keeps accepting jobs
+    # and runs them once the database answers
+    postgres_only(db)
+    from app import async_database
+    from app.worker import AsyncMatchingWorker
+    if async_database.asyncpg is None:
+        raise Skipped('asyncpg not installed')
+    dsn = ['postgresql://conformance@127.0.0.1:1/unreachable']
+    worker = AsyncMatchingWorker(lambda: async_database.AsyncDatabase(dsn=dsn[0]), retry_seconds=0.05)
+    worker.start()
+    try:
+        lost = db.create_lost_item(ctx['owner'], 'Red Umbrella', 'Other', 'red umbrella', 'Bus Stop', '2026-03-09')
+        found = db.create_found_item(ctx['finder'], 'Red Umbrella', 'Other', 'red umbrella', 'Bus Stop', '2026-03-09')
+        worker.submit(found, 'found')
+        time.sleep(0.2)
+        expect(worker.thread.is_alive() and worker.pending() == 1, 'job not queued while the database is down')
+        dsn[0] = db.dsn
+        deadline = time.monotonic() + 10
+        while worker.pending() and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        worker.stop(timeout=10)
+    expect(lost in {m['lost_id'] for m in db.get_matches_for_found_item(found)}, 'queued job not run after reconnecting')
+
+@check
+def delete_user_cascades(db, ctx):
+    lost = db.create_user(f"conformance_temp_{ctx['suffix']}", f"temp_{ctx['suffix']}@example.com",
+                          'x', 'Temporary', 'student', None)
+    lost_id = db.create_lost_item(lost, 'Scarf', 'Clothing', 'red scarf', 'Library', '2026-03-01')
+    db.create_match(lost_id, ctx['found'], 50)
+    expect(db.delete_user(lost) is True, 'delete_user reported nothing deleted')
+    expect(db.get_lost_item_by_id(lost_id) is None, "deleted user's item still exists")
+    expect(lost_id not in {m['lost_id'] for m in db.get_matches_for_found_item(ctx['found'])},
+           "deleted user's match still listed")
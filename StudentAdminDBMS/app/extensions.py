@@ -0,0 +1,9 @@
+from flask import current_app
+from werkzeug.local import LocalProxy
+
+# Per-worker resources live on app.extensions and are created by
+# app.lifecycle.start_worker, after the server has forked.
+db = LocalProxy(lambda: current_app.extensions['db'])
+matching_worker = LocalProxy(lambda: current_app.extensions['matching_worker'])
+image_pipeline = LocalProxy(lambda: current_app.extensions['image_pipeline'])
+analytics_aggregator = LocalProxy(lambda: current_app.extensions['analytics_aggregator'])
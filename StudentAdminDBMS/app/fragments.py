@@ -0,0 +1,41 @@
+import hashlib
+import os
+from flask import render_template
+from markupsafe import Markup
+from app.cache import LRUCache
+
+fragment_cache = LRUCache(int(os.environ.get('FRAGMENT_CACHE_SIZE', 64)))
+
+DASHBOARD_TEMPLATES = (
+    'login.html',
+    'register.html',
+    'student_dashboard.html',
+    'admin_dashboard.html',
+    'fragments/admin_lost_table.html',
+    'fragments/admin_found_table.html',
+    'fragments/admin_users_table.html',
+)
+
+def precompile_templates(app):
+    # Compile once at startup so the first dashboard request doesn't pay for it
+    for name in DASHBOARD_TEMPLATES:
+        app.jinja_env.get_template(name)
+
+def templates_version(app):
+    # Changes whenever a template is edited, so browsers drop old ETags after a deploy
+    latest = 0
+    for root, dirs, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+        for name in files:
+            latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+    return str(latest)
+
+def render_cached_fragment(name, version, load_context):
+    key = (name, version)
+    html = fragment_cache.get(key)
+    if html is None:
+        html = Markup(render_template(f'fragments/{name}.html', **load_context()))
+        fragment_cache.set(key, html)
+    return html
+
+def make_etag(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
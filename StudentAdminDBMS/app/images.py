@@ -0,0 +1,272 @@
+import hashlib
+import multiprocessing
+import os
+import queue
+import re
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from flask import Request, abort, jsonify, request, send_from_directory, url_for
+from werkzeug.exceptions import RequestEntityTooLarge
+from app.assets import ONE_YEAR
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# Photos on lost and found reports. A multipart part with an image content
+# type is written straight into UPLOAD_DIR as it is parsed, hashed on the way
+# and cut off at IMAGE_MAX_BYTES, so a request never holds a photo in memory
+# and the upload is not copied again when it is kept: once the report is
+# stored, StagedUpload.keep renames it after its content hash. A repeated
+# report keeps nothing and its upload is removed. Identical photos share one
+# file, and as a stored file never changes it is served with a one-year
+# immutable Cache-Control.
+#
+# Thumbnails are made by a pool of IMAGE_PROCESSES worker processes after the
+# report is stored. Each also yields a 64-bit difference hash of the photo,
+# stored as image_hash and scored by its Hamming distance when both items of
+# a pair have one (app/scoring.py). Matching for a report with a photo waits
+# for its hash. Until the thumbnail exists pages show the photo itself.
+# Without Pillow, photos are stored and shown but not hashed or thumbnailed.
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UPLOAD_DIR = os.environ.get('UPLOAD_DIR', os.path.join(PROJECT_ROOT, 'uploads'))
+IMAGE_MAX_BYTES = int(os.environ.get('IMAGE_MAX_BYTES', 8 * 2 ** 20))
+IMAGE_PROCESSES = int(os.environ.get('IMAGE_PROCESSES', 2))
+THUMBNAIL_SIZE = int(os.environ.get('THUMBNAIL_SIZE', 320))
+
+CHUNK_SIZE = 64 * 1024
+STORED_NAME = re.compile(r'^[0-9a-f]{32}(\.thumb)?\.(jpg|png|gif|webp)$')
+
+def image_extension(head):
+    # By the file's magic number; the client's file name and type are not trusted
+    if head.startswith(b'\xff\xd8\xff'):
+        return '.jpg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return '.png'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return '.gif'
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        return '.webp'
+    return None
+
+def thumbnail_name(filename):
+    return filename.rsplit('.', 1)[0] + '.thumb.jpg'
+
+class UploadFile:
+    # A file part being written into UPLOAD_DIR under a temporary name. Left
+    # unclaimed, it is removed when the request closes its files.
+    def __init__(self, directory=UPLOAD_DIR, max_bytes=IMAGE_MAX_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(suffix='.part', dir=directory)
+        self.file = os.fdopen(fd, 'w+b')
+        self.max_bytes = max_bytes
+        self.digest = hashlib.sha256()
+        self.head = b''
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.close()
+            raise RequestEntityTooLarge(f'Photos must be at most {round(self.max_bytes / 2 ** 20, 1):g} MB.')
+        if len(self.head) < 12:
+            self.head += data[:12 - len(self.head)]
+        self.digest.update(data)
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def claim(self, path):
+        self.file.close()
+        os.replace(self.path, path)
+        self.path = None
+
+    def close(self):
+        self.file.close()
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if content_type and content_type.startswith('image/'):
+            return UploadFile()
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+class StagedUpload:
+    # A checked photo with its stored file name, kept only when keep() is
+    # called; leaving the with block removes it otherwise. filename is None
+    # when no file was chosen.
+    def __init__(self, stream=None, filename=None):
+        self.stream = stream
+        self.filename = filename
+
+    def keep(self):
+        if self.stream is not None:
+            self.stream.claim(os.path.join(UPLOAD_DIR, self.filename))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.stream is not None:
+            self.stream.close()
+
+def stage_upload(upload):
+    # Raises ValueError for anything but an image
+    if upload is None or not upload.filename:
+        return StagedUpload()
+    stream = upload.stream
+    if not isinstance(stream, UploadFile):
+        # Sent without an image content type: parsed into a temporary file
+        stream = UploadFile()
+        try:
+            shutil.copyfileobj(upload.stream, stream, CHUNK_SIZE)
+        except Exception:
+            stream.close()
+            raise
+    extension = image_extension(stream.head)
+    if extension is None:
+        stream.close()
+        raise ValueError('Photo must be a JPEG, PNG, GIF or WebP image.')
+    return StagedUpload(stream, stream.digest.hexdigest()[:32] + extension)
+
+def difference_hash(image):
+    # 64 bits: whether each pixel of an 9x8 grayscale copy is brighter than
+    # its right neighbour. Stored signed, to fit a BIGINT.
+    pixels = list(image.convert('L').resize((9, 8), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for column in range(8):
+            value = value << 1 | (pixels[row * 9 + column] > pixels[row * 9 + column + 1])
+    return value - 2 ** 64 if value >= 2 ** 63 else value
+
+def process_image(source, thumbnail, size):
+    # Runs in a pool process: writes the thumbnail and returns the photo's hash
+    with Image.open(source) as image:
+        # JPEGs decode straight at a reduced scale
+        image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    image.thumbnail((size, size))
+    partial = f'{thumbnail}.{os.getpid()}.tmp'
+    image.save(partial, 'JPEG', quality=80, optimize=True)
+    os.replace(partial, thumbnail)
+    return difference_hash(image)
+
+class ImagePipeline:
+    # Hands photos to the pool and stores the results on a thread with its own
+    # connection. on_processed(db, item_id, kind) runs after an item's hash is
+    # stored (or its photo failed to process) when the report asked for it.
+    def __init__(self, database_factory, on_processed, processes=IMAGE_PROCESSES):
+        self.database_factory = database_factory
+        self.on_processed = on_processed
+        self.processes = processes
+        self.lock = threading.Lock()
+        self.executor = None
+        self.results = queue.Queue()
+        self.thread = None
+        self.db = None
+        self.pending = 0
+        self.processed = 0
+        self.failed = 0
+
+    @property
+    def available(self):
+        return Image is not None and self.processes > 0
+
+    def submit(self, kind, item_id, filename, match=True):
+        # False when photos cannot be processed here; the caller matches as usual
+        if not self.available:
+            return False
+        with self.lock:
+            if self.executor is None:
+                self.start()
+            self.pending += 1
+            source = os.path.join(UPLOAD_DIR, filename)
+            future = self.executor.submit(process_image, source, os.path.join(UPLOAD_DIR, thumbnail_name(filename)),
+                                          THUMBNAIL_SIZE)
+        future.add_done_callback(lambda future: self.results.put((kind, item_id, match, future)))
+        return True
+
+    def start(self):
+        # Spawned for the same reason as the scoring pool (app/parallel.py)
+        context = multiprocessing.get_context('spawn')
+        self.executor = ProcessPoolExecutor(self.processes, mp_context=context)
+        self.db = self.database_factory()
+        self.thread = threading.Thread(target=self.run, name='image-results', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            result = self.results.get()
+            if result is None:
+                return
+            kind, item_id, match, future = result
+            try:
+                self.db.set_item_image_hash(kind, item_id, future.result())
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Could not process the photo of {kind} item {item_id}: {e}")
+            try:
+                if match:
+                    self.on_processed(self.db, item_id, kind)
+            except Exception as e:
+                print(f"Matching error for {kind} item {item_id}: {e}")
+            finally:
+                with self.lock:
+                    self.pending -= 1
+
+    def stop(self):
+        # Photos already submitted are finished and their results stored
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is None:
+            return
+        executor.shutdown(wait=True)
+        self.results.put(None)
+        self.thread.join()
+        self.thread = None
+        self.db.close()
+
+    def stats(self):
+        return {'available': self.available, 'pending': self.pending,
+                'processed': self.processed, 'failed': self.failed}
+
+def photo_url(item):
+    if not item.get('image_file'):
+        return None
+    return url_for('uploaded_image', filename=item['image_file'])
+
+def thumbnail_url(item):
+    # The photo itself until its thumbnail has been made
+    if not item.get('image_file') or item.get('image_hash') is None:
+        return photo_url(item)
+    return url_for('uploaded_image', filename=thumbnail_name(item['image_file']))
+
+def uploaded_image(filename):
+    if not STORED_NAME.match(filename):
+        abort(404)
+    response = send_from_directory(UPLOAD_DIR, filename, max_age=ONE_YEAR)
+    response.headers['Cache-Control'] = f'public, max-age={ONE_YEAR}, immutable'
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+def too_large(error):
+    if request.path.startswith('/api/'):
+        return jsonify({'error': error.description}), 413
+    return error
+
+def init_app(app):
+    app.request_class = UploadRequest
+    app.register_error_handler(RequestEntityTooLarge, too_large)
+    app.add_url_rule('/uploads/<filename>', 'uploaded_image', uploaded_image)
+    app.jinja_env.globals.update(photo_url=photo_url, thumbnail_url=thumbnail_url)
@@ -0,0 +1,79 @@
+import atexit
+from app.database import Database, create_database
+from app.worker import MatchingWorker, AsyncMatchingWorker
+from app.analytics import Aggregator
+from app.audit import audit_log
+from app.images import ImagePipeline
+from app.matching import find_and_create_matches
+from app.parallel import scoring_pool
+from app.open_index import OPEN_INDEX, open_index
+
+def start_worker(app):
+    # Creates the per-worker resources. Must run in the process that will serve
+    # requests, i.e. after the server has forked, never in a preloading master.
+    # Nothing here waits for PostgreSQL to be up: connections are opened on
+    # first use, the open items index loads in the background, and /readyz
+    # reports whether the database can be reached.
+    if app.extensions.get('worker_started'):
+        return
+    app.extensions['worker_started'] = True
+
+    db = create_database()
+    app.extensions['db'] = db
+    audit_log.start(db.dsn if isinstance(db, Database) else None)
+
+    # The embedded backend keeps its rows in process already
+    if OPEN_INDEX and isinstance(db, Database):
+        open_index.start(db.dsn)
+
+    worker = create_matching_worker(app, db)
+    app.extensions['matching_worker'] = worker
+    if app.config['MATCH_IN_BACKGROUND']:
+        worker.start()
+    app.extensions['image_pipeline'] = ImagePipeline(db.clone, match_processed(app, worker))
+    app.extensions['analytics_aggregator'] = Aggregator(db.clone)
+    app.extensions['analytics_aggregator'].start()
+
+    # Warm the connection before the first request arrives
+    try:
+        db.get_table_versions()
+        db.rollback()
+    except Exception as e:
+        print(f"Database not reachable at worker start, connecting on first use: {e}")
+
+    atexit.register(stop_worker, app)
+
+def create_matching_worker(app, db):
+    if app.config['MATCHING_DRIVER'] == 'async' and isinstance(db, Database):
+        # Imported here so the threaded driver does not pay for asyncpg at startup
+        from app import async_database
+        if async_database.asyncpg is not None:
+            return AsyncMatchingWorker(
+                lambda: async_database.AsyncDatabase(dsn=db.dsn, match_cache=db.match_cache),
+                concurrency=app.config['MATCHING_CONCURRENCY']
+            )
+        print("MATCHING_DRIVER=async needs asyncpg; falling back to the threaded matching worker")
+    return MatchingWorker(db.clone)
+
+def match_processed(app, worker):
+    # Matching for a report with a photo, once the photo's hash is stored
+    def match(db, item_id, kind):
+        if app.config['MATCH_IN_BACKGROUND']:
+            worker.submit(item_id, kind)
+        else:
+            find_and_create_matches(db, item_id, kind)
+    return match
+
+def stop_worker(app):
+    if not app.extensions.get('worker_started'):
+        return
+    app.extensions['worker_started'] = False
+
+    # Processed photos still queue their matching passes
+    app.extensions['image_pipeline'].stop()
+    app.extensions['matching_worker'].stop(app.config['SHUTDOWN_DRAIN_TIMEOUT'])
+    app.extensions['analytics_aggregator'].stop()
+    app.extensions['db'].close()
+    scoring_pool.shutdown()
+    open_index.stop()
+    audit_log.stop()
@@ -0,0 +1,195 @@
+import threading
+from app import audit
+from app.open_index import open_index
+from app.parallel import scoring_pool
+from app.scoring import DEFAULT_RULES, get_scorer
+
+MATCH_THRESHOLD = DEFAULT_RULES['threshold']
+
+# Per-thread totals of matching passes, read by the request profiler
+pass_stats = threading.local()
+
+def reset_pass_stats():
+    pass_stats.passes = 0
+    pass_stats.pairs_scored = 0
+    pass_stats.matches = 0
+
+def record_pass(pairs_scored, matches):
+    pass_stats.passes = getattr(pass_stats, 'passes', 0) + 1
+    pass_stats.pairs_scored = getattr(pass_stats, 'pairs_scored', 0) + pairs_scored
+    pass_stats.matches = getattr(pass_stats, 'matches', 0) + matches
+
+def calculate_match_score(lost_item, found_item):
+    # Scores one pair with the active rules (app/scoring.py). Matching passes
+    # use the scorer directly so each item's features are computed only once.
+    return get_scorer().score(lost_item, found_item)
+
+def lost_match_message(lost_item, match_score):
+    return f"Potential match found for your lost {lost_item['item_name']}! Match score: {match_score}%"
+
+def found_match_message(found_item, match_score):
+    return f"Your found {found_item['item_name']} may match a lost item! Match score: {match_score}%"
+
+def verification_notifications(verified, retired):
+    # Both owners of each verified match, and once per lost item, the owners
+    # of lost items that lost a candidate to it
+    notifications = []
+    for match in verified:
+        notifications.append((match['lost_user_id'], match['match_id'],
+                              f"Your lost {match['lost_item_name']} has been verified as found! Please contact the finder."))
+        notifications.append((match['found_user_id'], match['match_id'],
+                              f"The {match['found_item_name']} you found has been verified as belonging to its owner. Thank you!"))
+    notified = set()
+    for match in retired:
+        if match['lost_status'] == 'unfound' and match['lost_id'] not in notified:
+            notified.add(match['lost_id'])
+            notifications.append((match['lost_user_id'], None,
+                                  f"A found item that may have matched your lost {match['lost_item_name']} has been returned to its owner."))
+    return notifications
+
+def score_open_items(db, scorer, item_features, kind):
+    # (row, score) for the open items of the given kind that match, and the
+    # number of candidates scored. The open items index finds and scores the
+    # candidates in process and only the matched rows are read; without it
+    # every open row is read and scored.
+    indexed = open_index.score(scorer, item_features, kind)
+    if indexed is not None:
+        scored, candidates = indexed
+        if not scored:
+            return [], candidates
+        scores = dict(scored)
+        if kind == 'found':
+            rows = db.get_open_found_items_by_ids(scores)
+        else:
+            rows = db.get_open_lost_items_by_ids(scores)
+        return [(row, scores[row[f'{kind}_id']]) for row in rows], candidates
+    if kind == 'found':
+        items = [f for f in db.get_open_found_items() if f['status'] == 'unclaimed']
+    else:
+        items = [l for l in db.get_open_lost_items() if l['status'] == 'unfound']
+    return scoring_pool.score(scorer, item_features, items, kind), len(items)
+
+def audit_match(match_id, lost_item, found_item, match_score):
+    audit.event('match_created', match_id=match_id, lost_id=lost_item['lost_id'], found_id=found_item['found_id'],
+                score=match_score, notified=[lost_item['user_id'], found_item['user_id']])
+
+def find_and_create_matches(db, item_id, item_type='lost'):
+    matches = []
+    candidates = 0
+    scorer = get_scorer()
+    
+    if item_type == 'lost':
+        lost_item = db.get_lost_item_by_id(item_id)
+        
+        if not lost_item:
+            return []
+        
+        scored, candidates = score_open_items(db, scorer, scorer.lost_features(lost_item), 'found')
+        
+        for found_item, match_score in scored:
+            match_id = db.create_match(lost_item['lost_id'], found_item['found_id'], match_score)
+            
+            db.create_notification(
+                lost_item['user_id'],
+                match_id,
+                lost_match_message(lost_item, match_score)
+            )
+            
+            db.create_notification(
+                found_item['user_id'],
+                match_id,
+                found_match_message(found_item, match_score)
+            )
+            audit_match(match_id, lost_item, found_item, match_score)
+            
+            matches.append({
+                'match_id': match_id,
+                'found_item': found_item,
+                'match_score': match_score
+            })
+    
+    elif item_type == 'found':
+        found_item = db.get_found_item_by_id(item_id)
+        
+        if not found_item:
+            return []
+        
+        scored, candidates = score_open_items(db, scorer, scorer.found_features(found_item), 'lost')
+        
+        for lost_item, match_score in scored:
+            match_id = db.create_match(lost_item['lost_id'], found_item['found_id'], match_score)
+            
+            db.create_notification(
+                found_item['user_id'],
+                match_id,
+                found_match_message(found_item, match_score)
+            )
+            
+            db.create_notification(
+                lost_item['user_id'],
+                match_id,
+                lost_match_message(lost_item, match_score)
+            )
+            audit_match(match_id, lost_item, found_item, match_score)
+            
+            matches.append({
+                'match_id': match_id,
+                'lost_item': lost_item,
+                'match_score': match_score
+            })
+    
+    record_pass(candidates, len(matches))
+    return matches
+
+def match_new_items(db, new_lost_ids=(), new_found_ids=(), flush_size=5000):
+    # One matching pass for a batch of freshly inserted items: new lost items
+    # are scored against every open found item, and new found items against
+    # the open lost items that were not already covered by the first loop.
+    new_lost_ids = set(new_lost_ids)
+    new_found_ids = set(new_found_ids)
+    if not new_lost_ids and not new_found_ids:
+        return 0
+
+    scorer = get_scorer()
+    open_lost = db.get_open_lost_items()
+    open_found = [(item, scorer.found_features(item)) for item in db.get_open_found_items()]
+    new_found = [(f, features) for f, features in open_found if f['found_id'] in new_found_ids]
+
+    total = 0
+    pairs_scored = 0
+    scored = []
+    for lost_item in open_lost:
+        candidates = open_found if lost_item['lost_id'] in new_lost_ids else new_found
+        pairs_scored += len(candidates)
+        if not candidates:
+            continue
+        lost_features = scorer.lost_features(lost_item)
+        for found_item, found_features in candidates:
+            match_score = scorer.score_features(lost_features, found_features)
+            if match_score >= scorer.threshold:
+                scored.append((lost_item, found_item, match_score))
+                if len(scored) >= flush_size:
+                    total += save_matches(db, scored)
+                    scored = []
+
+    if scored:
+        total += save_matches(db, scored)
+    record_pass(pairs_scored, total)
+    return total
+
+def save_matches(db, scored):
+    created = db.create_matches_bulk(
+        [(lost_item['lost_id'], found_item['found_id'], match_score) for lost_item, found_item, match_score in scored]
+    )
+    match_ids = {(row['lost_id'], row['found_id']): row['match_id'] for row in created}
+
+    notifications = []
+    for lost_item, found_item, match_score in scored:
+        match_id = match_ids[(lost_item['lost_id'], found_item['found_id'])]
+        notifications.append((lost_item['user_id'], match_id, lost_match_message(lost_item, match_score)))
+        notifications.append((found_item['user_id'], match_id, found_match_message(found_item, match_score)))
+    db.create_notifications_bulk(notifications)
+    # Bulk passes can create thousands of matches: one event per batch
+    audit.event('matches_created', source='import', matches=len(scored), notifications=len(notifications))
+
+    return len(scored)
@@ -0,0 +1,816 @@
+import csv
+import io
+import itertools
+import os
+import threading
+from datetime import date, datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from app.cache import MatchCache
+from app.database import IMPORT_TARGETS, EXPORT_COLUMNS
+from app.normalize import normalized_columns
+
+LOST_STATUSES = ('unfound', 'found', 'resolved')
+FOUND_STATUSES = ('unclaimed', 'returned', 'resolved')
+# As in the analytics triggers of migration 0012
+RECOVERED_STATUSES = {'lost': ('found', 'resolved'), 'found': ('returned', 'resolved')}
+ITEM_KINDS = {'lost_items': 'lost', 'found_items': 'found'}
+
+# Same accounts as database_schema.sql (admin123 / student123)
+DEMO_USERS = (
+    ('admin', 'admin@lostandfound.com', 'scrypt:32768:8:1$9mElRpSVvycCtcEq$9052c5ab96e3f375670d721be2407f614a7737f45634bd60de444364b690687eb335e329447c90ff922162cf5426f9a12ab7aa30e0af9f91027f21bb2e62188a', 'System Administrator', 'admin', '0000000000'),
+    ('john_doe', 'john@student.edu', 'scrypt:32768:8:1$RInTwP3C7ONIBFgb$c435da40460f03ec9d907526f59ee7cb3f549fab6bbc010553cf8174ece1361d7aec25495871a2b9dd6d3755817a3549a7846b1da0935e768f4a2c134e3e5c98', 'John Doe', 'student', '1234567890'),
+    ('jane_smith', 'jane@student.edu', 'scrypt:32768:8:1$RInTwP3C7ONIBFgb$c435da40460f03ec9d907526f59ee7cb3f549fab6bbc010553cf8174ece1361d7aec25495871a2b9dd6d3755817a3549a7846b1da0935e768f4a2c134e3e5c98', 'Jane Smith', 'student', '0987654321'),
+)
+
+USER_COLUMNS = ('user_id', 'username', 'email', 'full_name', 'role', 'phone', 'created_at', 'last_login')
+CONTACT_COLUMNS = ('username', 'full_name', 'email', 'phone')
+TABLES = ('users', 'lost_items', 'found_items', 'match_table', 'notifications',
+          'lost_items_archive', 'found_items_archive', 'match_table_archive', 'notifications_archive')
+
+def to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
+
+def to_score(value):
+    # match_score is DECIMAL(5,2) in PostgreSQL
+    return Decimal(str(value)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+def newest_first(rows, id_column, time_column='created_at'):
+    return sorted(rows, key=lambda row: (row[time_column], row[id_column]), reverse=True)
+
+def best_first(matches):
+    return sorted(matches, key=lambda m: (m['match_score'], m['match_date']), reverse=True)
+
+def truncate(moment, grain):
+    # date_trunc('hour' / 'day', moment)
+    if grain == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+class MemoryStore:
+    # The tables themselves; shared by every MemoryDatabase handle created
+    # with clone(), the way connections share one PostgreSQL database.
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.tables = {name: {} for name in TABLES}
+        self.sequences = {name: itertools.count(1) for name in TABLES}
+        self.match_pairs = {}
+        self.sweep_state = {}
+        self.sweep_locks = set()
+        self.analytics_events = []
+        self.analytics_matched = set()
+        self.analytics_rollups = {}
+        self.analytics_state = {'events_applied': 0, 'updated_at': None}
+
+    def next_id(self, table):
+        return next(self.sequences[table])
+
+class MemoryDatabase:
+    # Embedded implementation of the Database interface. Rows are plain dicts
+    # with the same columns and Python types psycopg2 returns, so the matching
+    # engine, bulk import and the views run unchanged against it. Nothing is
+    # persisted; PostgreSQL-only tools (migrations, query plans) need Database.
+    def __init__(self, match_cache=None, store=None, demo_users=False):
+        self.store = store or MemoryStore()
+        self.tables = self.store.tables
+        self.lock = self.store.lock
+        self.replicas = []
+        self.local = threading.local()
+        self.match_cache = match_cache or MatchCache(int(os.environ.get('MATCH_CACHE_SIZE', 2048)),
+                                                    ttl=float(os.environ.get('MATCH_CACHE_TTL', 30)))
+        if demo_users and not self.tables['users']:
+            for user in DEMO_USERS:
+                self.create_user(*user)
+
+    def connect(self):
+        pass
+
+    def commit(self):
+        self.local.wrote = True
+
+    def rollback(self):
+        pass
+
+    def ping(self):
+        pass
+
+    def pin_primary(self, pinned=True):
+        self.local.wrote = False
+
+    def has_written(self):
+        return getattr(self.local, 'wrote', False)
+
+    def clone(self):
+        return MemoryDatabase(match_cache=self.match_cache, store=self.store)
+
+    def close(self):
+        pass
+
+    def insert(self, table, id_column, row):
+        row[id_column] = self.store.next_id(table)
+        self.tables[table][row[id_column]] = row
+        if table in ITEM_KINDS:
+            self.log_analytics_event('reported', ITEM_KINDS[table], row)
+            self.log_status_event(ITEM_KINDS[table], row, None)
+        self.commit()
+        return row[id_column]
+
+    # What the analytics triggers of migration 0012 record
+    def log_analytics_event(self, event, kind, item, delta=1, seconds=None):
+        self.store.analytics_events.append({
+            'event': event, 'kind': kind, 'category': item['category'], 'category_id': item['category_id'],
+            'location': item[IMPORT_TARGETS[kind][2]], 'reported_at': item['created_at'],
+            'delta': delta, 'seconds': seconds,
+        })
+
+    def log_status_event(self, kind, item, old_status):
+        recovered = RECOVERED_STATUSES[kind]
+        if (old_status in recovered) != (item['status'] in recovered):
+            self.log_analytics_event('recovered', kind, item, 1 if item['status'] in recovered else -1)
+
+    def log_match_events(self, match):
+        for kind, table in (('lost', 'lost_items'), ('found', 'found_items')):
+            key = (kind, match[f'{kind}_id'])
+            if key not in self.store.analytics_matched:
+                self.store.analytics_matched.add(key)
+                item = self.tables[table][key[1]]
+                self.log_analytics_event('matched', kind, item,
+                                         seconds=(match['match_date'] - item['created_at']).total_seconds())
+
+    def require_user(self, user_id):
+        if user_id not in self.tables['users']:
+            raise ValueError(f'User {user_id} does not exist')
+
+    def with_contact(self, item):
+        user = self.tables['users'][item['user_id']]
+        row = dict(item)
+        row.update((column, user[column]) for column in CONTACT_COLUMNS)
+        return row
+
+    def page(self, rows, limit, offset):
+        return rows[offset:offset + limit]
+
+    # User operations
+    def get_user_by_username(self, username):
+        with self.lock:
+            for user in self.tables['users'].values():
+                if user['username'] == username:
+                    return dict(user)
+        return None
+
+    def get_user_by_id(self, user_id):
+        with self.lock:
+            user = self.tables['users'].get(user_id)
+            return dict(user) if user else None
+
+    def create_user(self, username, email, password_hash, full_name, role, phone):
+        if role not in ('student', 'admin'):
+            raise ValueError(f'Invalid role: {role}')
+        with self.lock:
+            for user in self.tables['users'].values():
+                if user['username'] == username or user['email'] == email:
+                    raise ValueError('Username or email already exists')
+            return self.insert('users', 'user_id', {
+                'username': username, 'email': email, 'password_hash': password_hash,
+                'full_name': full_name, 'role': role, 'phone': phone,
+                'created_at': datetime.now(), 'last_login': None,
+            })
+
+    def update_last_login(self, user_id):
+        with self.lock:
+            if user_id in self.tables['users']:
+                self.tables['users'][user_id]['last_login'] = datetime.now()
+            self.commit()
+
+    def delete_user(self, user_id):
+        with self.lock:
+            if self.tables['users'].pop(user_id, None) is None:
+                return False
+            lost_ids = {i for i, item in self.tables['lost_items'].items() if item['user_id'] == user_id}
+            found_ids = {i for i, item in self.tables['found_items'].items() if item['user_id'] == user_id}
+            for lost_id in lost_ids:
+                del self.tables['lost_items'][lost_id]
+            for found_id in found_ids:
+                del self.tables['found_items'][found_id]
+            match_ids = {m['match_id'] for m in self.tables['match_table'].values()
+                         if m['lost_id'] in lost_ids or m['found_id'] in found_ids}
+            for match_id in match_ids:
+                match = self.tables['match_table'].pop(match_id)
+                del self.store.match_pairs[(match['lost_id'], match['found_id'])]
+            for notification_id, notification in list(self.tables['notifications'].items()):
+                if notification['user_id'] == user_id or notification['match_id'] in match_ids:
+                    del self.tables['notifications'][notification_id]
+            self.commit()
+        self.match_cache.clear()
+        return True
+
+    def get_all_users(self):
+        with self.lock:
+            users = newest_first(self.tables['users'].values(), 'user_id')
+            return [{column: user[column] for column in USER_COLUMNS} for user in users]
+
+    def get_users_page(self, limit, offset):
+        return self.page(self.get_all_users(), limit, offset)
+
+    # Lost items operations
+    def create_lost_item(self, user_id, item_name, category, description, location_lost, date_lost):
+        return self.create_item('lost_items', 'lost_id', 'unfound', user_id, {
+            'item_name': item_name, 'category': category, 'description': description,
+            'location_lost': location_lost, 'date_lost': to_date(date_lost),
+        })
+
+    def get_lost_item_by_id(self, lost_id):
+        return self.get_item('lost_items', lost_id)
+
+    def get_lost_items_by_user(self, user_id):
+        return self.items_by_user('lost_items', 'lost_id', user_id)
+
+    def get_all_lost_items(self):
+        return self.all_items('lost_items', 'lost_id')
+
+    def get_lost_items_page(self, limit, offset, user_id=None):
+        if user_id is None:
+            return self.page(self.get_all_lost_items(), limit, offset)
+        return self.page(self.get_lost_items_by_user(user_id), limit, offset)
+
+    def get_open_lost_items(self):
+        return self.items_with_status('lost_items', 'unfound')
+
+    def get_open_lost_items_by_ids(self, lost_ids):
+        return self.items_by_ids('lost_items', lost_ids, 'unfound')
+
+    def update_lost_item_status(self, lost_id, status):
+        matched_found_ids = self.update_status('lost_items', LOST_STATUSES, lost_id, status, 'lost_id', 'found_id')
+        self.match_cache.invalidate('lost', [lost_id])
+        self.match_cache.invalidate('found', matched_found_ids)
+
+    # Found items operations
+    def create_found_item(self, user_id, item_name, category, description, location_found, date_found):
+        return self.create_item('found_items', 'found_id', 'unclaimed', user_id, {
+            'item_name': item_name, 'category': category, 'description': description,
+            'location_found': location_found, 'date_found': to_date(date_found),
+        })
+
+    def get_found_items_by_user(self, user_id):
+        return self.items_by_user('found_items', 'found_id', user_id)
+
+    def get_found_item_by_id(self, found_id):
+        return self.get_item('found_items', found_id)
+
+    def get_all_found_items(self):
+        return self.all_items('found_items', 'found_id')
+
+    def get_found_items_page(self, limit, offset, user_id=None):
+        if user_id is None:
+            return self.page(self.get_all_found_items(), limit, offset)
+        return self.page(self.get_found_items_by_user(user_id), limit, offset)
+
+    def get_open_found_items(self):
+        return self.items_with_status('found_items', 'unclaimed')
+
+    def get_open_found_items_by_ids(self, found_ids):
+        return self.items_by_ids('found_items', found_ids, 'unclaimed')
+
+    def update_found_item_status(self, found_id, status):
+        matched_lost_ids = self.update_status('found_items', FOUND_STATUSES, found_id, status, 'found_id', 'lost_id')
+        self.match_cache.invalidate('found', [found_id])
+        self.match_cache.invalidate('lost', matched_lost_ids)
+
+    # Shared item helpers
+    def create_item(self, table, id_column, status, user_id, fields):
+        with self.lock:
+            self.require_user(user_id)
+            now = datetime.now()
+            category_id, name_tokens = normalized_columns(fields['category'], fields['item_name'])
+            fields.update(user_id=user_id, status=status, created_at=now, updated_at=now,
+                          category_id=category_id, name_tokens=name_tokens,
+                          idempotency_key=fields.get('idempotency_key'), image_file=fields.get('image_file'),
+                          image_hash=None)
+            return self.insert(table, id_column, fields)
+
+    def get_item(self, table, item_id):
+        with self.lock:
+            item = self.tables[table].get(item_id)
+            return dict(item) if item else None
+
+    def items_by_user(self, table, id_column, user_id):
+        with self.lock:
+            items = [item for item in self.tables[table].values() if item['user_id'] == user_id]
+            return [dict(item) for item in newest_first(items, id_column)]
+
+    def all_items(self, table, id_column):
+        with self.lock:
+            return [self.with_contact(item) for item in newest_first(self.tables[table].values(), id_column)]
+
+    def items_with_status(self, table, status):
+        with self.lock:
+            return [dict(item) for item in self.tables[table].values() if item['status'] == status]
+
+    def items_by_ids(self, table, item_ids, status):
+        with self.lock:
+            items = (self.tables[table].get(item_id) for item_id in sorted(set(item_ids)))
+            return [dict(item) for item in items if item and item['status'] == status]
+
+    def update_status(self, table, allowed, item_id, status, id_column, other_column):
+        if status not in allowed:
+            raise ValueError(f'Invalid status: {status}')
+        with self.lock:
+            item = self.tables[table].get(item_id)
+            if item is None:
+                return []
+            old_status = item['status']
+            item['status'] = status
+            item['updated_at'] = datetime.now()
+            self.log_status_event(ITEM_KINDS[table], item, old_status)
+            self.commit()
+            return [m[other_column] for m in self.tables['match_table'].values() if m[id_column] == item_id]
+
+    # Report submission
+    def report_item(self, kind, user_id, item_name, category, description, location, item_date,
+                    idempotency_key=None, duplicate_window=600, image_file=None):
+        table, id_column, location_column, date_column, default_status = IMPORT_TARGETS[kind]
+        category_id, name_tokens = normalized_columns(category, item_name)
+        since = datetime.now() - timedelta(seconds=duplicate_window)
+        item_date = to_date(item_date)
+        with self.lock:
+            for item in newest_first(self.tables[table].values(), id_column, id_column):
+                if item['user_id'] != user_id:
+                    continue
+                if idempotency_key is not None and item['idempotency_key'] == idempotency_key:
+                    return item[id_column], False
+                if (item['created_at'] > since and item['category_id'] == category_id
+                        and item['name_tokens'] == name_tokens and item[date_column] == item_date):
+                    return item[id_column], False
+            item_id = self.create_item(table, id_column, default_status, user_id, {
+                'item_name': item_name, 'category': category, 'description': description,
+                location_column: location, date_column: item_date, 'idempotency_key': idempotency_key,
+                'image_file': image_file,
+            })
+        return item_id, True
+
+    def set_item_image_hash(self, kind, item_id, image_hash):
+        table = IMPORT_TARGETS[kind][0]
+        with self.lock:
+            item = self.tables[table].get(item_id)
+            if item is not None:
+                item['image_hash'] = image_hash
+                item['updated_at'] = datetime.now()
+                self.commit()
+
+    # Matching operations
+    def create_match(self, lost_id, found_id, match_score):
+        return self.create_matches_bulk([(lost_id, found_id, match_score)])[0]['match_id']
+
+    def create_matches_bulk(self, matches):
+        created = []
+        with self.lock:
+            for lost_id, found_id, match_score in matches:
+                if lost_id not in self.tables['lost_items'] or found_id not in self.tables['found_items']:
+                    raise ValueError(f'Match references a missing item: {lost_id}, {found_id}')
+            for lost_id, found_id, match_score in matches:
+                match_id = self.store.match_pairs.get((lost_id, found_id))
+                inserted = match_id is None
+                if inserted:
+                    match_id = self.insert('match_table', 'match_id', {
+                        'lost_id': lost_id, 'found_id': found_id, 'match_score': to_score(match_score),
+                        'match_date': datetime.now(), 'verified': False,
+                    })
+                    self.store.match_pairs[(lost_id, found_id)] = match_id
+                    self.log_match_events(self.tables['match_table'][match_id])
+                else:
+                    self.tables['match_table'][match_id]['match_score'] = to_score(match_score)
+                created.append({'match_id': match_id, 'lost_id': lost_id, 'found_id': found_id, 'inserted': inserted})
+            self.commit()
+        self.match_cache.invalidate('lost', {row['lost_id'] for row in created})
+        self.match_cache.invalidate('found', {row['found_id'] for row in created})
+        return created
+
+    def get_matches_for_lost_item(self, lost_id):
+        return self.matches_for('lost', lost_id, 'lost_id', 'found_id', 'found_items')
+
+    def get_matches_for_found_item(self, found_id):
+        return self.matches_for('found', found_id, 'found_id', 'lost_id', 'lost_items')
+
+    def matches_for(self, kind, item_id, id_column, other_column, other_table):
+        cached = self.match_cache.get(kind, item_id)
+        if cached is not None:
+            return cached
+        token = self.match_cache.begin(kind, item_id)
+        try:
+            with self.lock:
+                matches = []
+                for match in best_first(m for m in self.tables['match_table'].values() if m[id_column] == item_id):
+                    row = dict(match)
+                    row.update(self.with_contact(self.tables[other_table][match[other_column]]))
+                    matches.append(row)
+            self.match_cache.set(kind, item_id, matches, token)
+        finally:
+            self.match_cache.release(kind, item_id, token)
+        return matches
+
+    def verify_match(self, match_id):
+        with self.lock:
+            match = self.tables['match_table'].get(match_id)
+            if match:
+                match['verified'] = True
+            self.commit()
+        if match:
+            self.match_cache.invalidate('lost', [match['lost_id']])
+            self.match_cache.invalidate('found', [match['found_id']])
+
+    # Match verification
+    def get_verification_queue_page(self, limit, offset):
+        with self.lock:
+            lost_items = self.tables['lost_items']
+            found_items = self.tables['found_items']
+            users = self.tables['users']
+            queue = []
+            for match in sorted(self.tables['match_table'].values(), key=lambda m: (-m['match_score'], m['match_id'])):
+                lost = lost_items[match['lost_id']]
+                found = found_items[match['found_id']]
+                if match['verified'] or lost['status'] != 'unfound' or found['status'] != 'unclaimed':
+                    continue
+                queue.append({
+                    'match_id': match['match_id'], 'match_score': match['match_score'],
+                    'match_date': match['match_date'], 'lost_id': match['lost_id'], 'found_id': match['found_id'],
+                    'lost_item_name': lost['item_name'], 'location_lost': lost['location_lost'],
+                    'date_lost': lost['date_lost'], 'lost_owner': users[lost['user_id']]['full_name'],
+                    'found_item_name': found['item_name'], 'location_found': found['location_found'],
+                    'date_found': found['date_found'], 'finder': users[found['user_id']]['full_name'],
+                })
+        return self.page(queue, limit, offset)
+
+    def verify_matches(self, match_ids, notifications):
+        with self.lock:
+            lost_items = self.tables['lost_items']
+            found_items = self.tables['found_items']
+            candidates = []
+            for match_id in set(match_ids):
+                match = self.tables['match_table'].get(match_id)
+                if match is None or match['verified']:
+                    continue
+                lost = lost_items[match['lost_id']]
+                found = found_items[match['found_id']]
+                if lost['status'] == 'unfound' and found['status'] == 'unclaimed':
+                    candidates.append((match, lost, found))
+            verified = []
+            lost_ids = set()
+            found_ids = set()
+            for match, lost, found in sorted(candidates, key=lambda c: (-c[0]['match_score'], c[0]['match_id'])):
+                if match['lost_id'] in lost_ids or match['found_id'] in found_ids:
+                    continue
+                lost_ids.add(match['lost_id'])
+                found_ids.add(match['found_id'])
+                verified.append({
+                    'match_id': match['match_id'], 'lost_id': match['lost_id'], 'found_id': match['found_id'],
+                    'match_score': match['match_score'],
+                    'lost_user_id': lost['user_id'], 'lost_item_name': lost['item_name'],
+                    'found_user_id': found['user_id'], 'found_item_name': found['item_name'],
+                })
+            if not verified:
+                return []
+
+            now = datetime.now()
+            for match in verified:
+                self.tables['match_table'][match['match_id']]['verified'] = True
+            for lost_id in lost_ids:
+                lost_items[lost_id].update(status='found', updated_at=now)
+                self.log_status_event('lost', lost_items[lost_id], 'unfound')
+            for found_id in found_ids:
+                found_items[found_id].update(status='returned', updated_at=now)
+                self.log_status_event('found', found_items[found_id], 'unclaimed')
+            retired = []
+            for match in list(self.tables['match_table'].values()):
+                if match['verified'] or (match['lost_id'] not in lost_ids and match['found_id'] not in found_ids):
+                    continue
+                del self.tables['match_table'][match['match_id']]
+                del self.store.match_pairs[(match['lost_id'], match['found_id'])]
+                lost = lost_items[match['lost_id']]
+                retired.append({
+                    'match_id': match['match_id'], 'lost_id': match['lost_id'], 'found_id': match['found_id'],
+                    'lost_user_id': lost['user_id'], 'lost_item_name': lost['item_name'], 'lost_status': lost['status'],
+                })
+            retired_ids = {match['match_id'] for match in retired}
+            for notification_id, notification in list(self.tables['notifications'].items()):
+                if notification['match_id'] in retired_ids:
+                    del self.tables['notifications'][notification_id]
+            for user_id, match_id, message in notifications(verified, retired):
+                self.insert('notifications', 'notification_id', {
+                    'user_id': user_id, 'match_id': match_id, 'message': message,
+                    'is_read': False, 'created_at': now,
+                })
+            self.commit()
+        self.match_cache.invalidate('lost', lost_ids | {match['lost_id'] for match in retired})
+        self.match_cache.invalidate('found', found_ids | {match['found_id'] for match in retired})
+        return verified
+
+    # Notification operations
+    def create_notification(self, user_id, match_id, message):
+        with self.lock:
+            self.require_user(user_id)
+            return self.insert('notifications', 'notification_id', {
+                'user_id': user_id, 'match_id': match_id, 'message': message,
+                'is_read': False, 'created_at': datetime.now(),
+            })
+
+    def create_notifications_bulk(self, notifications):
+        with self.lock:
+            for user_id, match_id, message in notifications:
+                self.require_user(user_id)
+            now = datetime.now()
+            for user_id, match_id, message in notifications:
+                self.insert('notifications', 'notification_id', {
+                    'user_id': user_id, 'match_id': match_id, 'message': message,
+                    'is_read': False, 'created_at': now,
+                })
+
+    def get_user_notifications(self, user_id, unread_only=False):
+        with self.lock:
+            notifications = [n for n in self.tables['notifications'].values()
+                             if n['user_id'] == user_id and not (unread_only and n['is_read'])]
+            return [dict(n) for n in newest_first(notifications, 'notification_id')]
+
+    def get_notifications_page(self, user_id, limit, offset):
+        return self.page(self.get_user_notifications(user_id), limit, offset)
+
+    def get_unread_count(self, user_id):
+        return len(self.get_user_notifications(user_id, unread_only=True))
+
+    def mark_notification_read(self, notification_id, user_id=None):
+        with self.lock:
+            notification = self.tables['notifications'].get(notification_id)
+            if notification is None or (user_id is not None and notification['user_id'] != user_id):
+                return False
+            notification['is_read'] = True
+            self.commit()
+            return True
+
+    def mark_all_notifications_read(self, user_id):
+        with self.lock:
+            for notification in self.tables['notifications'].values():
+                if notification['user_id'] == user_id:
+                    notification['is_read'] = True
+            self.commit()
+
+    # Statistics
+    def get_statistics(self):
+        with self.lock:
+            tables = self.tables
+            return {
+                'total_lost': len(tables['lost_items']) + len(tables['lost_items_archive']),
+                'unfound_lost': sum(1 for item in tables['lost_items'].values() if item['status'] == 'unfound'),
+                'total_found': len(tables['found_items']) + len(tables['found_items_archive']),
+                'unclaimed_found': sum(1 for item in tables['found_items'].values() if item['status'] == 'unclaimed'),
+                'verified_matches': sum(1 for table in ('match_table', 'match_table_archive')
+                                        for m in tables[table].values() if m['verified']),
+                'total_students': sum(1 for user in tables['users'].values() if user['role'] == 'student'),
+            }
+
+    # Dashboard versions. Reads and writes share one lock here, so counts and
+    # timestamps are already a consistent version; PostgreSQL keeps counters.
+    def get_table_versions(self):
+        with self.lock:
+            tables = self.tables
+            return {
+                'lost_version': (len(tables['lost_items']),
+                                 max((i['updated_at'] for i in tables['lost_items'].values()), default=None)),
+                'found_version': (len(tables['found_items']),
+                                  max((i['updated_at'] for i in tables['found_items'].values()), default=None)),
+                'users_version': (len(tables['users']),
+                                  max((u['created_at'] for u in tables['users'].values()), default=None),
+                                  max((u['last_login'] for u in tables['users'].values() if u['last_login']), default=None)),
+                'verified_matches': sum(1 for m in tables['match_table'].values() if m['verified']),
+            }
+
+    def get_user_dashboard_version(self, user_id):
+        with self.lock:
+            lost = [i for i in self.tables['lost_items'].values() if i['user_id'] == user_id]
+            found = [i for i in self.tables['found_items'].values() if i['user_id'] == user_id]
+            notifications = [n for n in self.tables['notifications'].values() if n['user_id'] == user_id]
+            return {
+                'version': (len(lost), max((i['updated_at'] for i in lost), default=None),
+                            len(found), max((i['updated_at'] for i in found), default=None),
+                            len(notifications), sum(1 for n in notifications if not n['is_read'])),
+            }
+
+    # Archival
+    def archive_resolved(self, older_than_days=30, read_notification_days=90, batch_size=5000):
+        cutoff = datetime.now() - timedelta(days=older_than_days)
+        notification_cutoff = datetime.now() - timedelta(days=read_notification_days)
+        totals = {'notifications': 0, 'match_table': 0, 'lost_items': 0, 'found_items': 0}
+        with self.lock:
+            tables = self.tables
+            lost_ids = {i for i, item in tables['lost_items'].items()
+                        if item['status'] in ('resolved', 'found') and item['updated_at'] < cutoff}
+            found_ids = {i for i, item in tables['found_items'].items()
+                         if item['status'] in ('resolved', 'returned') and item['updated_at'] < cutoff}
+            match_ids = {i for i, m in tables['match_table'].items()
+                         if m['lost_id'] in lost_ids or m['found_id'] in found_ids}
+            notification_ids = {i for i, n in tables['notifications'].items()
+                                if n['match_id'] in match_ids or (n['is_read'] and n['created_at'] < notification_cutoff)}
+            for match_id in match_ids:
+                match = tables['match_table'][match_id]
+                del self.store.match_pairs[(match['lost_id'], match['found_id'])]
+            for table, ids in (('notifications', notification_ids), ('match_table', match_ids),
+                               ('lost_items', lost_ids), ('found_items', found_ids)):
+                archived_at = datetime.now()
+                for item_id in ids:
+                    row = tables[table].pop(item_id)
+                    row['archived_at'] = archived_at
+                    tables[table + '_archive'][item_id] = row
+                totals[table] = len(ids)
+            self.commit()
+        self.match_cache.clear()
+        return totals
+
+    def get_archived_lost_items_page(self, limit, offset, user_id=None):
+        return self.archived_items('lost_items_archive', 'lost_id', limit, offset, user_id)
+
+    def get_archived_found_items_page(self, limit, offset, user_id=None):
+        return self.archived_items('found_items_archive', 'found_id', limit, offset, user_id)
+
+    def archived_items(self, table, id_column, limit, offset, user_id):
+        with self.lock:
+            items = [item for item in self.tables[table].values() if user_id is None or item['user_id'] == user_id]
+            items = newest_first(items, id_column, 'archived_at')
+            return [self.with_contact(item) for item in self.page(items, limit, offset)]
+
+    def get_archived_matches(self, lost_id=None, found_id=None):
+        with self.lock:
+            return [dict(m) for m in best_first(self.tables['match_table_archive'].values())
+                    if (lost_id is None or m['lost_id'] == lost_id) and (found_id is None or m['found_id'] == found_id)]
+
+    # Re-matching sweep
+    def try_sweep_lock(self, name):
+        with self.lock:
+            if name in self.store.sweep_locks:
+                return False
+            self.store.sweep_locks.add(name)
+            return True
+
+    def release_sweep_lock(self, name):
+        with self.lock:
+            self.store.sweep_locks.discard(name)
+
+    def begin_sweep(self, name, lag_seconds):
+        cutoff = datetime.now() - timedelta(seconds=lag_seconds)
+        with self.lock:
+            state = self.store.sweep_state.setdefault(name, {
+                'name': name, 'lost_watermark': 0, 'found_watermark': 0, 'target_lost': None,
+                'target_found': None, 'done_partitions': [], 'started_at': None, 'finished_at': None,
+            })
+            if state['target_lost'] is None:
+                state['target_lost'] = max([state['lost_watermark']] + [
+                    i for i, item in self.tables['lost_items'].items() if item['created_at'] <= cutoff])
+                state['target_found'] = max([state['found_watermark']] + [
+                    i for i, item in self.tables['found_items'].items() if item['created_at'] <= cutoff])
+                state['done_partitions'] = []
+                state['started_at'] = datetime.now()
+            self.commit()
+            return dict(state, done_partitions=list(state['done_partitions']))
+
+    def save_sweep_partition(self, name, partition, matches, notifications):
+        with self.lock:
+            created = self.create_matches_bulk(matches) if matches else []
+            messages = notifications(created)
+            if messages:
+                self.create_notifications_bulk(messages)
+            self.store.sweep_state[name]['done_partitions'].append(partition)
+            self.commit()
+            return created
+
+    def finish_sweep(self, name):
+        with self.lock:
+            state = self.store.sweep_state[name]
+            if state['target_lost'] is not None:
+                state.update(lost_watermark=state['target_lost'], found_watermark=state['target_found'],
+                             target_lost=None, target_found=None, done_partitions=[], finished_at=datetime.now())
+            self.commit()
+
+    def get_sweep_state(self, name):
+        with self.lock:
+            state = self.store.sweep_state.get(name)
+            return dict(state, done_partitions=list(state['done_partitions'])) if state else None
+
+    # Analytics
+    def aggregate_analytics(self, batch_size, hourly_since, category_names):
+        with self.lock:
+            events = self.store.analytics_events
+            batch = events[:batch_size]
+            del events[:batch_size]
+            rollups = self.store.analytics_rollups
+            for event in batch:
+                category = category_names.get(event['category_id']) or event['category'].strip(' ').lower()
+                dimensions = (('all', ''), ('category', category), ('location', event['location'].strip(' ').lower()))
+                for grain in ('hour', 'day'):
+                    if grain == 'hour' and event['reported_at'] < hourly_since:
+                        continue
+                    bucket = truncate(event['reported_at'], grain)
+                    for dimension, value in dimensions:
+                        row = rollups.setdefault((grain, dimension, bucket, event['kind'], value), {
+                            'reported': 0, 'matched': 0, 'match_seconds': 0.0, 'recovered': 0,
+                        })
+                        row[event['event']] += event['delta']
+                        if event['event'] == 'matched':
+                            row['match_seconds'] += event['seconds']
+            self.store.analytics_state['events_applied'] += len(batch)
+            self.store.analytics_state['updated_at'] = datetime.now()
+            self.commit()
+            return len(batch)
+
+    def prune_analytics(self, hourly_since):
+        with self.lock:
+            rollups = self.store.analytics_rollups
+            old = [key for key in rollups if key[0] == 'hour' and key[2] < hourly_since]
+            for key in old:
+                del rollups[key]
+            return len(old)
+
+    def get_analytics_series(self, grain, since):
+        with self.lock:
+            rows = [dict(row, bucket=bucket, kind=kind)
+                    for (row_grain, dimension, bucket, kind, value), row in self.store.analytics_rollups.items()
+                    if row_grain == grain and dimension == 'all' and bucket >= since]
+        return sorted(rows, key=lambda row: (row['bucket'], row['kind']))
+
+    def get_analytics_breakdown(self, dimension, since, limit):
+        totals = {}
+        with self.lock:
+            for (grain, row_dimension, bucket, kind, value), row in self.store.analytics_rollups.items():
+                if grain != 'day' or row_dimension != dimension or bucket < since:
+                    continue
+                total = totals.setdefault(value, {
+                    'value': value, 'lost_reported': 0, 'lost_matched': 0, 'lost_recovered': 0,
+                    'found_reported': 0, 'found_matched': 0, 'found_recovered': 0,
+                })
+                for column in ('reported', 'matched', 'recovered'):
+                    total[f'{kind}_{column}'] += row[column]
+        rows = sorted(totals.values(), key=lambda row: (-(row['lost_reported'] + row['found_reported']), row['value']))
+        return rows[:limit]
+
+    def get_analytics_state(self):
+        with self.lock:
+            return {'updated_at': self.store.analytics_state['updated_at'],
+                    'pending_events': len(self.store.analytics_events)}
+
+    # Bulk import / export
+    def copy_import_items(self, kind, columns, stream):
+        table, id_column, location_column, date_column, default_status = IMPORT_TARGETS[kind]
+        data = stream.read()
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        staged = [dict(zip(columns, row)) for row in csv.reader(io.StringIO(data)) if row]
+
+        with self.lock:
+            users = {user['username']: user['user_id'] for user in self.tables['users'].values()}
+            rows = []
+            # Convert everything first so a bad row fails the whole import, as in PostgreSQL
+            for row in staged:
+                if row.get('username') not in users:
+                    continue
+                now = datetime.now()
+                category_id, name_tokens = normalized_columns(row['category'], row['item_name'])
+                rows.append({
+                    'user_id': users[row['username']], 'item_name': row['item_name'],
+                    'category': row['category'], 'description': row['description'],
+                    location_column: row[location_column], date_column: to_date(row[date_column]),
+                    'status': row.get('status') or default_status,
+                    'created_at': datetime.fromisoformat(row['created_at']) if row.get('created_at') else now,
+                    'updated_at': now, 'category_id': category_id, 'name_tokens': name_tokens,
+                    'idempotency_key': None, 'image_file': None, 'image_hash': None,
+                })
+            new_ids = [self.insert(table, id_column, row) for row in rows]
+        return new_ids, len(staged) - len(new_ids)
+
+    def normalize_items(self, kind, only_missing=False, batch_size=5000):
+        table = IMPORT_TARGETS[kind][0]
+        total = 0
+        with self.lock:
+            for item in self.tables[table].values():
+                if only_missing and item['name_tokens'] is not None:
+                    continue
+                item['category_id'], item['name_tokens'] = normalized_columns(item['category'], item['item_name'])
+                item['updated_at'] = datetime.now()
+                total += 1
+            self.commit()
+        self.match_cache.clear()
+        return total
+
+    def iter_export_rows(self, kind, batch_size=2000):
+        columns = EXPORT_COLUMNS[kind]
+        with self.lock:
+            if kind == 'matches':
+                rows = []
+                for match in sorted(self.tables['match_table'].values(), key=lambda m: m['match_id']):
+                    row = dict(match)
+                    row['lost_item_name'] = self.tables['lost_items'][match['lost_id']]['item_name']
+                    row['found_item_name'] = self.tables['found_items'][match['found_id']]['item_name']
+                    rows.append(row)
+            else:
+                table, id_column = IMPORT_TARGETS[kind][:2]
+                rows = [self.with_contact(item) for item in sorted(self.tables[table].values(), key=lambda i: i[id_column])]
+        for row in rows:
+            yield {column: row[column] for column in columns}
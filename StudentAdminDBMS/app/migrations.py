@@ -0,0 +1,55 @@
+import os
+import re
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+def available_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    return migrations
+
+def applied_versions(db):
+    cursor = db.get_cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(200) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT version FROM schema_migrations")
+    versions = {row['version'] for row in cursor.fetchall()}
+    db.commit()
+    cursor.close()
+    return versions
+
+def pending_migrations(db):
+    applied = applied_versions(db)
+    return [m for m in available_migrations() if m[0] not in applied]
+
+def upgrade(db, target=None):
+    # Each migration runs in its own transaction together with its
+    # schema_migrations row, so a failure leaves the schema at the last
+    # fully applied version.
+    done = []
+    for version, name, path in pending_migrations(db):
+        if target is not None and version > target:
+            break
+        with open(path) as f:
+            sql = f.read()
+        cursor = db.get_cursor()
+        try:
+            cursor.execute(sql)
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            db.commit()
+            cursor.close()
+        except Exception as e:
+            db.rollback()
+            cursor.close()
+            raise RuntimeError(f'Migration {version:04d}_{name} failed: {e}') from e
+        done.append((version, name))
+    return done
@@ -0,0 +1,157 @@
+import re
+import threading
+from functools import lru_cache
+
+# Normalization dictionary applied when an item is stored. Categories map to
+# small integer IDs (aliases included) and item names to sorted arrays of
+# token IDs, after stemming and synonym mapping, so matching compares
+# integers instead of strings. Token IDs are interned: each canonical token
+# gets the next free ID the first time it is seen, so two tokens never share
+# one. Changing this dictionary changes stored IDs; run 'manage.py
+# normalize-items' afterwards.
+
+# Category IDs are stored in the database: never renumber, only append.
+CATEGORIES = {
+    'electronics': (1, ['electronic', 'gadget', 'gadgets', 'device', 'devices', 'tech', 'phones', 'computers']),
+    'documents': (2, ['document', 'id cards', 'id card', 'ids', 'cards', 'papers', 'identification']),
+    'accessories': (3, ['accessory', 'glasses', 'umbrellas', 'watches']),
+    'books': (4, ['book', 'textbooks', 'notebooks', 'stationery']),
+    'clothing': (5, ['clothes', 'apparel', 'garments', 'clothing items']),
+    'keys': (6, ['key', 'keychain', 'keychains']),
+    'wallet': (7, ['wallets', 'purses', 'card holders']),
+    'other': (8, ['misc', 'miscellaneous']),
+    'bags': (9, ['bag', 'backpacks', 'luggage']),
+    'jewelry': (10, ['jewellery', 'jewels']),
+}
+
+TOKEN_SYNONYMS = [
+    ['phone', 'mobile', 'cellphone', 'smartphone', 'iphone', 'cell'],
+    ['laptop', 'macbook', 'chromebook'],
+    ['earbuds', 'earphones', 'airpods'],
+    ['headphones', 'headset'],
+    ['backpack', 'rucksack', 'knapsack', 'bookbag'],
+    ['wallet', 'billfold'],
+    ['id', 'identification'],
+    ['bottle', 'flask', 'tumbler'],
+    ['jacket', 'coat'],
+    ['hoodie', 'sweatshirt'],
+    ['glasses', 'spectacles', 'eyeglasses'],
+    ['charger', 'adapter'],
+]
+
+STOP_WORDS = {'a', 'an', 'the', 'my', 'of', 'and', 'with', 'for', 'in', 'on'}
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+def stem(word):
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us')):
+        return word[:-1]
+    return word
+
+def build_category_index():
+    index = {}
+    for name, (category_id, aliases) in CATEGORIES.items():
+        for alias in [name] + aliases:
+            index[' '.join(WORD_RE.findall(alias))] = category_id
+    return index
+
+def build_synonym_index():
+    index = {}
+    for group in TOKEN_SYNONYMS:
+        canonical = stem(group[0])
+        for word in group:
+            index[stem(word)] = canonical
+    return index
+
+CATEGORY_INDEX = build_category_index()
+SYNONYM_INDEX = build_synonym_index()
+
+@lru_cache(maxsize=1024)
+def category_id(category):
+    # None for categories outside the dictionary; callers fall back to the text
+    return CATEGORY_INDEX.get(' '.join(WORD_RE.findall((category or '').lower())))
+
+@lru_cache(maxsize=65536)
+def canonical_token(word):
+    word = stem(word)
+    return SYNONYM_INDEX.get(word, word)
+
+class TokenDictionary:
+    # Canonical token -> ID. Stored IDs must mean the same token in every
+    # process, so with a store (the name_token_ids table, see app/database.py)
+    # new tokens are allocated there; without one they are numbered in
+    # process, which suits the memory backend. Scoring worker processes are
+    # sent what their parent learned (learned, in order) and number tokens
+    # they were not sent below zero, so such a token can miss a match but
+    # never share an ID with another token.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ids = {}
+        self.learned = []
+        self.store = None
+        self.loaded = False
+        self.worker = False
+
+    def use_store(self, store):
+        with self.lock:
+            self.store = store
+            self.loaded = False
+            self.ids.clear()
+            self.learned.clear()
+
+    def learn(self, pairs):
+        # In a scoring worker: IDs allocated by the parent process
+        with self.lock:
+            self.worker = True
+            for token, token_id in pairs:
+                if token not in self.ids:
+                    self.ids[token] = token_id
+                    self.learned.append((token, token_id))
+
+    def lookup(self, tokens):
+        ids = self.ids
+        missing = [token for token in tokens if token not in ids]
+        if missing:
+            with self.lock:
+                self.allocate(missing)
+        return [ids[token] for token in tokens]
+
+    def allocate(self, tokens):
+        tokens = sorted({token for token in tokens if token not in self.ids})
+        if not tokens:
+            return
+        if self.worker:
+            allocated = [(token, -len(self.ids) - 1 - index) for index, token in enumerate(tokens)]
+        elif self.store is None:
+            allocated = [(token, len(self.ids) + 1 + index) for index, token in enumerate(tokens)]
+        else:
+            if not self.loaded:
+                # The whole dictionary once per process, then only new tokens
+                for token, token_id in self.store.load():
+                    self.ids[token] = token_id
+                    self.learned.append((token, token_id))
+                self.loaded = True
+                tokens = [token for token in tokens if token not in self.ids]
+                if not tokens:
+                    return
+            allocated = self.store.allocate(tokens)
+        for token, token_id in allocated:
+            self.ids[token] = token_id
+            self.learned.append((token, token_id))
+
+TOKENS = TokenDictionary()
+
+def token_id(token):
+    return TOKENS.lookup([token])[0]
+
+def name_tokens(name):
+    words = WORD_RE.findall((name or '').lower())
+    return sorted(set(TOKENS.lookup([canonical_token(word) for word in words if word not in STOP_WORDS])))
+
+def category_key(category, stored_id=None):
+    # What matching compares: the dictionary ID, or the lowercased text for
+    # categories the dictionary does not know
+    return stored_id or category_id(category) or (category or '').lower()
+
+def normalized_columns(category, item_name):
+    return category_id(category), name_tokens(item_name)
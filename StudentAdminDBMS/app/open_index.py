@@ -0,0 +1,496 @@
+import os
+import select
+import sys
+import threading
+from array import array
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from app.normalize import category_key, name_tokens
+from app.parallel import score_all
+
+# Process-resident index of the open lost and found items, so a matching pass
+# neither re-reads every open row from PostgreSQL nor rebuilds every
+# candidate's features. Items are stored column-wise in typed arrays: ids,
+# category codes, days and locations one entry per item, name tokens
+# and description words (as vocabulary ids) in shared flat arrays. Nothing is
+# kept per row but the id -> slot entry and a few posting-list entries, about
+# 22 MB per 100k open items (stats() reports the estimate).
+#
+# Posting lists by category, name token, location and day answer "which items
+# can reach the threshold against this one" without touching the rest. Only
+# a shared category earns category points and only a shared token earns name
+# points, so every item sharing either is a candidate. The others can only
+# earn description, location and date points; with the default rules that is
+# at most 45, and reaching 40 takes both the location and the date, so those
+# candidates are the items at a matching location within the date decay.
+# ScorerState works this bound out for the active rules (every category's
+# weights included); when no such bound exists every open item is scored.
+# The image signal only counts when both items have a photo, so for a new
+# item with a photo every open item with one is a candidate as well; photo
+# hashes are kept in a dict, by slot, for the items that have one.
+#
+# The index loads in the background when a server worker starts (matching
+# reads the database until it is ready) and follows the tables through
+# LISTEN/NOTIFY (triggers from migration 0009): a listener thread re-reads the
+# rows named in each notification, and every lookup first makes a round trip
+# on the listening connection and applies what it brought, so an item
+# committed before a pass starts is seen by it.
+# Removed items leave a tombstone until more than half the slots of a kind
+# are dead, then both kinds are compacted into a new vocabulary holding only
+# the strings live items use, so words of closed items do not pile up. If the connection fails the index switches
+# itself off, matching reads PostgreSQL as before, and the listener reconnects
+# and reloads.
+
+OPEN_INDEX = os.environ.get('OPEN_INDEX', '1') == '1'
+OPEN_INDEX_MAX_ITEMS = int(os.environ.get('OPEN_INDEX_MAX_ITEMS', 1000000))
+CHANNEL = 'open_items'
+RECONNECT_SECONDS = 5
+
+KINDS = {
+    # kind: (table, id column, open status, location column, date column)
+    'lost': ('lost_items', 'lost_id', 'unfound', 'location_lost', 'date_lost'),
+    'found': ('found_items', 'found_id', 'unclaimed', 'location_found', 'date_found'),
+}
+
+def select_open_items(kind):
+    table, id_column, status, location_column, date_column = KINDS[kind]
+    return f"""
+        SELECT {id_column} AS item_id, item_name, category, category_id, name_tokens, description,
+               {location_column} AS location, {date_column} AS item_date, image_hash
+        FROM {table} WHERE status = '{status}'
+    """
+
+class Vocabulary:
+    # Interned strings: locations, description words and categories outside
+    # the normalization dictionary. Shared by both kinds so ids compare.
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def intern(self, text):
+        string_id = self.ids.get(text)
+        if string_id is None:
+            string_id = self.ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+class ScorerState:
+    # What the index derives from one Scorer: which posting lists are needed
+    # to find every pair that can reach the threshold, and the scorer's
+    # synonyms translated to token and vocabulary ids
+    def __init__(self, scorer, vocabulary):
+        self.scorer = scorer
+        self.vocabulary = vocabulary
+        weight_sets = [scorer.default_weights] + list(scorer.category_weights.values())
+
+        def reaches(description=False, location=False, date=False):
+            # Whether a pair earning nothing but these signals can reach the threshold
+            return any(round((weights[3] * description + weights[5] * location
+                              + max(weights[6], default=0) * date) / weights[7] * 100, 2) >= scorer.threshold
+                       for weights in weight_sets)
+
+        # Pairs without a shared category or name token: which of location and
+        # date they need to reach the threshold, if they can at all
+        self.prune = True
+        self.extra = reaches(description=True, location=True, date=True)
+        self.need_location = not reaches(description=True, date=True)
+        self.need_date = not reaches(description=True, location=True)
+        if self.extra and not self.need_location and not self.need_date:
+            self.prune = False
+        self.date_window = max(len(weights[6]) for weights in weight_sets) - 1
+
+        self.token_map = scorer.name_token_map()
+        self.raw_tokens = {}
+        for raw, canonical in self.token_map.items():
+            self.raw_tokens.setdefault(canonical, {canonical}).add(raw)
+        self.synonyms = scorer.synonyms
+        self.word_map = {}
+        for canonical in set(scorer.synonyms.values()):
+            vocabulary.intern(canonical)
+
+    def word(self, word_id):
+        if not self.synonyms:
+            return word_id
+        mapped = self.word_map.get(word_id)
+        if mapped is None:
+            text = self.vocabulary.strings[word_id]
+            mapped = self.word_map[word_id] = self.vocabulary.intern(self.synonyms.get(text, text))
+        return mapped
+
+    def encode(self, features):
+        # A new item's Scorer features with description words as vocabulary
+        # ids; words no open item uses cannot overlap and are dropped
+        category, tokens, description, location, day, image = features
+        ids = self.vocabulary.ids
+        return category, tokens, {ids[word] for word in description if word in ids}, location, day, image
+
+class OpenItems:
+    # The open items of one kind, column-wise
+    def __init__(self, kind, vocabulary):
+        self.kind = kind
+        self.vocabulary = vocabulary
+        self.clear()
+
+    def clear(self):
+        self.ids = array('q')
+        self.categories = array('i')
+        self.days = array('i')
+        self.locations = array('i')
+        self.name_start = array('I')
+        self.name_length = array('B')
+        self.words_start = array('I')
+        self.words_length = array('H')
+        self.tokens = array('i')
+        self.words = array('i')
+        self.slots = {}
+        self.images = {}
+        self.by_category = {}
+        self.by_token = {}
+        self.by_location = {}
+        self.by_day = {}
+        self.dead = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def category_code(self, category, stored_id):
+        # Dictionary categories by ID, other categories by their interned text
+        key = category_key(category, stored_id)
+        return key if isinstance(key, int) else -1 - self.vocabulary.intern(key)
+
+    def category_key(self, code):
+        return code if code >= 0 else self.vocabulary.strings[-1 - code]
+
+    def add(self, row):
+        item_id = row['item_id']
+        if item_id in self.slots:
+            self.remove(item_id)
+        tokens = row['name_tokens']
+        if tokens is None:
+            tokens = name_tokens(row['item_name'])
+        tokens = sorted(set(tokens))[:255]
+        intern = self.vocabulary.intern
+        words = sorted({intern(word) for word in row['description'].lower().split()})[:65535]
+        category = self.category_code(row['category'], row['category_id'])
+        when = row['item_date']
+        day = when.toordinal() if hasattr(when, 'toordinal') else 0
+        self.append(item_id, category, day, intern(row['location'].lower()), tokens, words, row['image_hash'])
+
+    def append(self, item_id, category, day, location, tokens, words, image=None):
+        slot = len(self.ids)
+        self.slots[item_id] = slot
+        self.ids.append(item_id)
+        self.categories.append(category)
+        self.days.append(day)
+        self.locations.append(location)
+        self.name_start.append(len(self.tokens))
+        self.name_length.append(len(tokens))
+        self.tokens.extend(tokens)
+        self.words_start.append(len(self.words))
+        self.words_length.append(len(words))
+        self.words.extend(words)
+        if image is not None:
+            self.images[slot] = image
+
+        self.posting(self.by_category, category).append(slot)
+        for token in tokens:
+            self.posting(self.by_token, token).append(slot)
+        self.posting(self.by_location, location).append(slot)
+        if day:
+            self.posting(self.by_day, day).append(slot)
+
+    def posting(self, postings, key):
+        slots = postings.get(key)
+        if slots is None:
+            slots = postings[key] = array('I')
+        return slots
+
+    def remove(self, item_id):
+        # Leaves a tombstone; posting lists skip slots whose id is 0
+        slot = self.slots.pop(item_id, None)
+        if slot is None:
+            return
+        self.ids[slot] = 0
+        self.images.pop(slot, None)
+        self.dead += 1
+
+    def needs_compaction(self):
+        return self.dead > len(self.slots)
+
+    def compacted(self, vocabulary):
+        # The live items without tombstones, their strings interned in vocabulary
+        items = OpenItems(self.kind, vocabulary)
+        strings = self.vocabulary.strings
+        intern = vocabulary.intern
+        for slot in sorted(self.slots.values()):
+            category = self.categories[slot]
+            if category < 0:
+                category = -1 - intern(strings[-1 - category])
+            words = sorted(intern(strings[word]) for word in self.slot_words(slot))
+            items.append(self.ids[slot], category, self.days[slot], intern(strings[self.locations[slot]]),
+                         self.slot_tokens(slot), words, self.images.get(slot))
+        return items
+
+    def slot_tokens(self, slot):
+        start = self.name_start[slot]
+        return self.tokens[start:start + self.name_length[slot]]
+
+    def slot_words(self, slot):
+        start = self.words_start[slot]
+        return self.words[start:start + self.words_length[slot]]
+
+    def lookup(self, state, features):
+        # Slots of the live items that can reach the threshold against features
+        if not state.prune:
+            return [slot for slot in self.slots.values()]
+        category, tokens, description, location, day, image = features
+        if isinstance(category, int):
+            slots = set(self.by_category.get(category, ()))
+        elif category in self.vocabulary.ids:
+            slots = set(self.by_category.get(-1 - self.vocabulary.ids[category], ()))
+        else:
+            slots = set()
+        for token in tokens:
+            for raw in state.raw_tokens.get(token, (token,)):
+                slots.update(self.by_token.get(raw, ()))
+        if state.extra:
+            slots.update(self.lookup_extra(state, location, day))
+        if image is not None:
+            slots.update(self.images)
+        ids = self.ids
+        return [slot for slot in slots if ids[slot]]
+
+    def lookup_extra(self, state, location, day):
+        # Slots that can reach the threshold on description, location and date alone
+        extra = None
+        if state.need_location:
+            # Locations match when either contains the other
+            strings = self.vocabulary.strings
+            extra = set()
+            for location_id, slots in self.by_location.items():
+                other = strings[location_id]
+                if other in location or location in other:
+                    extra.update(slots)
+        if state.need_date:
+            if day is None:
+                return ()
+            days = set()
+            for other_day in range(day - state.date_window, day + state.date_window + 1):
+                days.update(self.by_day.get(other_day, ()))
+            extra = days if extra is None else extra & days
+        return extra
+
+    def features(self, state, slot):
+        # The Scorer's feature tuple, with description words as vocabulary ids
+        tokens = self.slot_tokens(slot)
+        if state.token_map:
+            tokens = [state.token_map.get(token, token) for token in tokens]
+        words = self.slot_words(slot)
+        if state.synonyms:
+            words = [state.word(word) for word in words]
+        day = self.days[slot]
+        return (
+            self.category_key(self.categories[slot]),
+            frozenset(tokens),
+            set(words),
+            self.vocabulary.strings[self.locations[slot]],
+            day or None,
+            self.images.get(slot),
+        )
+
+    def memory_bytes(self):
+        columns = (self.ids, self.categories, self.days, self.locations, self.name_start,
+                   self.name_length, self.words_start, self.words_length, self.tokens, self.words)
+        total = sum(sys.getsizeof(column) for column in columns) + sys.getsizeof(self.slots)
+        total += len(self.slots) * 2 * sys.getsizeof(2 ** 40)
+        total += sys.getsizeof(self.images) + len(self.images) * sys.getsizeof(2 ** 62)
+        for postings in (self.by_category, self.by_token, self.by_location, self.by_day):
+            total += sys.getsizeof(postings) + sum(sys.getsizeof(slots) for slots in postings.values())
+        return total
+
+class OpenItemsIndex:
+    def __init__(self, max_items=OPEN_INDEX_MAX_ITEMS):
+        self.max_items = max_items
+        self.vocabulary = Vocabulary()
+        self.kinds = {kind: OpenItems(kind, self.vocabulary) for kind in KINDS}
+        self.lock = threading.Lock()
+        self.state = None
+        self.dsn = None
+        self.conn = None
+        self.active = False
+        self.thread = None
+        self.stopping = threading.Event()
+        self.wakeup = None
+
+    def start(self, dsn, wait=False):
+        # Without wait the index loads on the listener thread, and matching
+        # reads the database until it is ready
+        self.dsn = dsn
+        self.stopping.clear()
+        # Written by stop() so the listener leaves select() at once
+        self.wakeup = os.pipe()
+        if wait:
+            self.connect()
+        self.thread = threading.Thread(target=self.run, name='open-items-index', daemon=True)
+        self.thread.start()
+
+    def connect(self):
+        # LISTEN before loading, so a change committed during the load is
+        # re-read afterwards rather than lost. The load fills new structures
+        # and swaps them in, so lookups keep falling back until it is done.
+        vocabulary = Vocabulary()
+        kinds = {kind: OpenItems(kind, vocabulary) for kind in KINDS}
+        try:
+            conn = psycopg2.connect(self.dsn, cursor_factory=RealDictCursor)
+            conn.autocommit = True
+            cursor = conn.cursor()
+            cursor.execute(f"LISTEN {CHANNEL}")
+            for kind, items in kinds.items():
+                cursor.execute(select_open_items(kind))
+                for row in cursor:
+                    items.add(row)
+            cursor.close()
+        except psycopg2.Error as e:
+            print(f"Could not load the open items index, matching reads the database: {e}")
+            return False
+        with self.lock:
+            if self.stopping.is_set():
+                # stop() gave up waiting for this load
+                conn.close()
+                return False
+            self.vocabulary = vocabulary
+            self.kinds = kinds
+            self.state = None
+            self.conn = conn
+            self.active = self.within_budget()
+        return True
+
+    def within_budget(self):
+        total = sum(len(items) for items in self.kinds.values())
+        if total > self.max_items:
+            print(f"Open items index disabled: {total} open items exceed OPEN_INDEX_MAX_ITEMS={self.max_items}")
+            return False
+        return True
+
+    def run(self):
+        if self.conn is None:
+            self.connect()
+        while not self.stopping.is_set():
+            conn = self.conn
+            if conn is None:
+                if not self.stopping.wait(RECONNECT_SECONDS):
+                    self.connect()
+                continue
+            try:
+                select.select([conn, self.wakeup[0]], [], [])
+            except (OSError, ValueError):
+                pass
+            if not self.stopping.is_set():
+                self.refresh()
+
+    def refresh(self, sync=False):
+        # Applies every notification delivered so far. With sync, a round trip
+        # first: the server sends the notifications of every transaction
+        # committed before it, which NOTIFY alone delivers only eventually.
+        with self.lock:
+            conn = self.conn
+            if conn is None:
+                return
+            try:
+                if sync:
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT 1")
+                    cursor.close()
+                conn.poll()
+                changed = {kind: set() for kind in KINDS}
+                while conn.notifies:
+                    kind, item_id = conn.notifies.pop(0).payload.split(':')
+                    changed[kind].add(int(item_id))
+                for kind, item_ids in changed.items():
+                    if item_ids:
+                        self.reload(kind, item_ids)
+            except psycopg2.Error as e:
+                print(f"Open items index lost its connection, matching reads the database: {e}")
+                self.disconnect()
+                return
+            if self.active and not self.within_budget():
+                self.active = False
+
+    def reload(self, kind, item_ids):
+        table, id_column = KINDS[kind][:2]
+        items = self.kinds[kind]
+        cursor = self.conn.cursor()
+        cursor.execute(select_open_items(kind) + f" AND {id_column} = ANY(%s)", (list(item_ids),))
+        rows = cursor.fetchall()
+        cursor.close()
+        for row in rows:
+            items.add(row)
+        for item_id in item_ids - {row['item_id'] for row in rows}:
+            items.remove(item_id)
+        if items.needs_compaction():
+            self.compact()
+
+    def compact(self):
+        # Both kinds share the vocabulary, so both move to the new one; the
+        # scorer state's word ids refer to the old one and are rebuilt
+        vocabulary = Vocabulary()
+        self.kinds = {kind: items.compacted(vocabulary) for kind, items in self.kinds.items()}
+        self.vocabulary = vocabulary
+        self.state = None
+
+    def disconnect(self):
+        self.active = False
+        if self.conn is not None:
+            self.conn.close()
+        self.conn = None
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            os.write(self.wakeup[1], b'x')
+            self.thread.join(timeout=5)
+            self.thread = None
+            for fd in self.wakeup:
+                os.close(fd)
+            self.wakeup = None
+        with self.lock:
+            self.disconnect()
+
+    def scorer_state(self, scorer):
+        if self.state is None or self.state.scorer is not scorer:
+            self.state = ScorerState(scorer, self.vocabulary)
+        return self.state
+
+    def candidates(self, scorer, item_features, kind):
+        # (encoded item features, [(item_id, features)]) for the open items of
+        # the given kind that can match; None while the index is not usable
+        self.refresh(sync=True)
+        with self.lock:
+            if not self.active:
+                return None
+            state = self.scorer_state(scorer)
+            items = self.kinds[kind]
+            encoded = state.encode(item_features)
+            return encoded, [(items.ids[slot], items.features(state, slot)) for slot in items.lookup(state, encoded)]
+
+    def score(self, scorer, item_features, kind):
+        # ([(item_id, score)] at or above the threshold, pairs scored), or
+        # None while the index is not usable
+        found = self.candidates(scorer, item_features, kind)
+        if found is None:
+            return None
+        encoded, candidates = found
+        return score_all(scorer, encoded, candidates, kind), len(candidates)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'active': self.active,
+                'lost_items': len(self.kinds['lost']),
+                'found_items': len(self.kinds['found']),
+                'vocabulary': len(self.vocabulary.strings),
+                'memory_bytes': sum(items.memory_bytes() for items in self.kinds.values())
+                                + sys.getsizeof(self.vocabulary.ids) + sys.getsizeof(self.vocabulary.strings),
+            }
+
+open_index = OpenItemsIndex()
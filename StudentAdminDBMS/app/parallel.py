@@ -0,0 +1,159 @@
+import atexit
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from app.normalize import TOKENS, name_tokens
+from app.scoring import Scorer
+
+# Parallel scoring of one new item against a large candidate list. Candidates
+# are sharded by id across MATCH_PROCESSES worker processes, one executor per
+# shard, and each worker keeps its shard's items and their features resident
+# between calls. The parent mirrors which (id, updated_at) every shard holds,
+# so a call only ships the candidates that are new or changed since the last
+# one plus the ids that left the list; in the steady state that is the new
+# item's features and nothing else. Computing features is the expensive part
+# of a pass, so it happens in the workers, once per item version. Workers are
+# also sent the name token IDs the parent learned since the last call, and
+# rows get their name_tokens in the parent, so IDs are never allocated in a
+# worker (app/normalize.py).
+#
+# Lists shorter than MATCH_PARALLEL_MIN_CANDIDATES are scored inline, where
+# the dispatch round trip would cost more than it saves. If a worker dies the
+# shards are dropped and rebuilt on the next call, which is scored inline.
+
+MATCH_PROCESSES = int(os.environ.get('MATCH_PROCESSES', os.cpu_count() or 1))
+MATCH_PARALLEL_MIN_CANDIDATES = int(os.environ.get('MATCH_PARALLEL_MIN_CANDIDATES', 2000))
+
+ITEM_COLUMNS = {
+    'lost': ('item_name', 'category', 'category_id', 'name_tokens', 'description', 'location_lost', 'date_lost',
+             'image_hash'),
+    'found': ('item_name', 'category', 'category_id', 'name_tokens', 'description', 'location_found', 'date_found',
+              'image_hash'),
+}
+
+# Resident state of a shard worker process
+shard_items = {'lost': {}, 'found': {}}
+shard_features = {'lost': {}, 'found': {}}
+shard_rules = None
+shard_scorer = None
+
+def score_shard(kind, upserts, removals, rules, item_features, tokens):
+    # Runs in a shard worker: applies the delta for its candidates of this
+    # kind, then scores the new item (of the other kind) against all of them
+    global shard_rules, shard_scorer
+    TOKENS.learn(tokens)
+    if rules != shard_rules:
+        shard_scorer = Scorer(json.loads(rules))
+        shard_rules = rules
+        for features in shard_features.values():
+            features.clear()
+    items = shard_items[kind]
+    features = shard_features[kind]
+    for item_id in removals:
+        items.pop(item_id, None)
+        features.pop(item_id, None)
+    for item_id, row in upserts:
+        items[item_id] = row
+        features[item_id] = shard_scorer.features(row, kind)
+    for item_id, row in items.items():
+        if item_id not in features:
+            features[item_id] = shard_scorer.features(row, kind)
+    return score_all(shard_scorer, item_features, features.items(), kind)
+
+def score_all(scorer, item_features, candidates, kind):
+    # candidates: (key, features) of the given kind; returns (key, score) above the threshold
+    threshold = scorer.threshold
+    score_features = scorer.score_features
+    if kind == 'found':
+        scores = ((key, score_features(item_features, features)) for key, features in candidates)
+    else:
+        scores = ((key, score_features(features, item_features)) for key, features in candidates)
+    return [(key, score) for key, score in scores if score >= threshold]
+
+class ScoringPool:
+    def __init__(self, processes, min_candidates):
+        self.processes = processes
+        self.min_candidates = min_candidates
+        self.lock = threading.Lock()
+        self.shards = None
+        self.mirrors = None
+
+    def score(self, scorer, item_features, candidates, kind):
+        # Scores a new item against candidate rows of the given kind and
+        # returns (row, score) for every pair at or above the threshold
+        if self.processes < 1 or len(candidates) < self.min_candidates:
+            return self.score_inline(scorer, item_features, candidates, kind)
+        with self.lock:
+            try:
+                return self.score_sharded(scorer, item_features, candidates, kind)
+            except (BrokenProcessPool, OSError) as e:
+                print(f"Scoring pool failed, scoring inline: {e}")
+                self.shutdown()
+        return self.score_inline(scorer, item_features, candidates, kind)
+
+    def score_inline(self, scorer, item_features, candidates, kind):
+        candidates = ((row, scorer.features(row, kind)) for row in candidates)
+        return score_all(scorer, item_features, candidates, kind)
+
+    def score_sharded(self, scorer, item_features, candidates, kind):
+        if self.shards is None:
+            self.start()
+        id_column = f'{kind}_id'
+        columns = ITEM_COLUMNS[kind]
+        rows = {row[id_column]: row for row in candidates}
+        upserts = [[] for shard in self.shards]
+        for item_id, row in rows.items():
+            shard = item_id % len(self.shards)
+            mirror = self.mirrors[shard][kind]
+            if mirror.get(item_id) != row['updated_at']:
+                mirror[item_id] = row['updated_at']
+                shipped = {column: row.get(column) for column in columns}
+                if shipped['name_tokens'] is None:
+                    shipped['name_tokens'] = name_tokens(row['item_name'])
+                upserts[shard].append((item_id, shipped))
+        removals = []
+        for mirrors in self.mirrors:
+            mirror = mirrors[kind]
+            gone = [item_id for item_id in mirror if item_id not in rows]
+            for item_id in gone:
+                del mirror[item_id]
+            removals.append(gone)
+
+        rules = json.dumps(scorer.rules, sort_keys=True)
+        # Learned is append-only; the synonym IDs the workers' Scorer needs are in it
+        scorer.name_token_map()
+        learned = TOKENS.learned
+        count = len(learned)
+        tokens = [learned[min(sent, count):count] for sent in self.tokens_sent]
+        self.tokens_sent = [count] * len(self.shards)
+        futures = [
+            executor.submit(score_shard, kind, upserts[shard], removals[shard], rules, item_features, tokens[shard])
+            for shard, executor in enumerate(self.shards)
+        ]
+        try:
+            return [(rows[item_id], score) for future in futures for item_id, score in future.result()]
+        except Exception:
+            # The mirrors already assume the delta was applied
+            self.shutdown()
+            raise
+
+    def start(self):
+        # Spawned, not forked: the server process has threads and open
+        # connections that must not be copied into the workers
+        context = multiprocessing.get_context('spawn')
+        self.shards = [ProcessPoolExecutor(1, mp_context=context) for i in range(self.processes)]
+        self.mirrors = [{'lost': {}, 'found': {}} for i in range(self.processes)]
+        self.tokens_sent = [0] * self.processes
+        atexit.register(self.shutdown)
+
+    def shutdown(self):
+        shards = self.shards
+        self.shards = None
+        self.mirrors = None
+        for executor in shards or []:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+scoring_pool = ScoringPool(MATCH_PROCESSES, MATCH_PARALLEL_MIN_CANDIDATES)
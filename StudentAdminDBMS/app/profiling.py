@@ -0,0 +1,142 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from flask import current_app, g, request
+from flask_login import current_user
+from app import database, matching
+from app.extensions import matching_worker
+
+# Opt-in sampling profiler for single requests. A request is profiled when an
+# admin sends the PROFILE_HEADER, or at random with PROFILE_SAMPLE_RATE. While
+# it runs, one shared thread records the request thread's stack every
+# PROFILE_INTERVAL_MS. Stacks are written in the folded format used by
+# flamegraph.pl and speedscope, next to a JSON file with the route, query
+# count and matching stats. Sampled requests are only written when slower
+# than PROFILE_SLOW_MS; header requests always are.
+
+PROFILE_HEADER = 'X-Profile'
+
+class Sampler:
+    def __init__(self, interval):
+        self.interval = interval
+        self.targets = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def start(self, thread_id):
+        stacks = Counter()
+        with self.lock:
+            self.targets[thread_id] = stacks
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='profiler', daemon=True)
+                self.thread.start()
+        self.wakeup.set()
+        return stacks
+
+    def stop(self, thread_id):
+        with self.lock:
+            return self.targets.pop(thread_id, None)
+
+    def run(self):
+        while True:
+            self.wakeup.wait()
+            with self.lock:
+                targets = list(self.targets.items())
+                if not targets:
+                    self.wakeup.clear()
+                    continue
+            frames = sys._current_frames()
+            for thread_id, stacks in targets:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    stacks[folded_stack(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+def folded_stack(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+def init_app(app):
+    app.extensions['profiler'] = Sampler(app.config['PROFILE_INTERVAL_MS'] / 1000)
+    app.before_request(start_profile)
+    app.after_request(finish_profile)
+    app.teardown_request(discard_profile)
+
+def profile_trigger():
+    if request.headers.get(PROFILE_HEADER) and current_user.is_authenticated and current_user.role == 'admin':
+        return 'header'
+    rate = current_app.config['PROFILE_SAMPLE_RATE']
+    if rate and random.random() < rate:
+        return 'sample'
+    return None
+
+def start_profile():
+    trigger = profile_trigger()
+    if trigger is None:
+        return
+    database.reset_query_stats()
+    matching.reset_pass_stats()
+    g.profile = {
+        'trigger': trigger,
+        'started': time.perf_counter(),
+        'stacks': current_app.extensions['profiler'].start(threading.get_ident()),
+    }
+
+def finish_profile(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    current_app.extensions['profiler'].stop(threading.get_ident())
+    duration_ms = (time.perf_counter() - profile['started']) * 1000
+    if profile['trigger'] == 'header' or duration_ms >= current_app.config['PROFILE_SLOW_MS']:
+        name = write_profile(profile, response, duration_ms)
+        if profile['trigger'] == 'header':
+            response.headers['X-Profile-Id'] = name
+    return response
+
+def discard_profile(exc):
+    # Requests that failed before after_request still have to leave the sampler
+    if g.pop('profile', None) is not None:
+        current_app.extensions['profiler'].stop(threading.get_ident())
+
+def write_profile(profile, response, duration_ms):
+    endpoint = request.endpoint or 'unknown'
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{endpoint}-{int(duration_ms)}ms"
+    root = f'{request.method} {endpoint}'
+    meta = {
+        'route': request.url_rule.rule if request.url_rule else None,
+        'endpoint': endpoint,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': round(duration_ms, 2),
+        'trigger': profile['trigger'],
+        'user_id': current_user.id if current_user.is_authenticated else None,
+        'pid': os.getpid(),
+        'interval_ms': current_app.config['PROFILE_INTERVAL_MS'],
+        'samples': sum(profile['stacks'].values()),
+        'queries': getattr(database.query_stats, 'count', 0),
+        'query_ms': round(getattr(database.query_stats, 'seconds', 0.0) * 1000, 2),
+        'match_passes': getattr(matching.pass_stats, 'passes', 0),
+        'pairs_scored': getattr(matching.pass_stats, 'pairs_scored', 0),
+        'matches_created': getattr(matching.pass_stats, 'matches', 0),
+        'queued_matching_jobs': matching_worker.pending(),
+    }
+    directory = current_app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, name + '.folded'), 'w') as f:
+        for stack, count in profile['stacks'].most_common():
+            f.write(f'{root};{stack} {count}\n')
+    with open(os.path.join(directory, name + '.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return name
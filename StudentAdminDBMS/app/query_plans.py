@@ -0,0 +1,51 @@
+import json
+from app.database import HOT_QUERIES
+
+INDEX_NODES = ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan')
+
+# (name, HOT_QUERIES key, params, indexes expected in the plan). The SQL is
+# the application's own, so a check cannot pass while the real query scans.
+CHECKED_QUERIES = [
+    ('lost items by user', 'lost_items_by_user', (1,), ('idx_lost_items_user_created',)),
+    ('found items by user', 'found_items_by_user', (1,), ('idx_found_items_user_created',)),
+    ('notifications by user', 'notifications_by_user', (1,), ('idx_notifications_user_created',)),
+    ('unread notifications', 'unread_notifications', (1,), ('idx_notifications_user_unread',)),
+    ('unread count', 'unread_count', (1,), ('idx_notifications_user_unread',)),
+    ('open lost items', 'open_lost_items', (), ('idx_lost_items_status',)),
+    ('open found items', 'open_found_items', (), ('idx_found_items_status',)),
+    ('matches for lost item', 'matches_for_lost_item', (1,), ('idx_match_table_lost_score',)),
+    ('matches for found item', 'matches_for_found_item', (1,), ('idx_match_table_found_score',)),
+    ('verified matches', 'verified_matches', (), ('idx_match_table_verified',)),
+    ('table versions', 'table_versions', (),
+     ('table_versions_pkey', 'idx_match_table_verified')),
+]
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+def explain(db, query, params):
+    # Sequential scans are disabled so the check asks "can the planner use the
+    # index for this query" rather than "is a seq scan cheaper on this
+    # particular (possibly tiny) table".
+    cursor = db.get_cursor()
+    try:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+        plan = cursor.fetchone()['QUERY PLAN']
+    finally:
+        db.rollback()
+        cursor.close()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+def check_hot_queries(db):
+    results = []
+    for name, key, params, expected in CHECKED_QUERIES:
+        nodes = list(plan_nodes(explain(db, HOT_QUERIES[key], params)))
+        used = [(node['Node Type'], node.get('Index Name')) for node in nodes if node['Node Type'] in INDEX_NODES]
+        ok = set(expected) <= {index for node_type, index in used}
+        results.append({'name': name, 'expected': ', '.join(expected), 'used': used, 'ok': ok})
+    return results
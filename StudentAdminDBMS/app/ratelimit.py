@@ -0,0 +1,258 @@
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+import psycopg2
+from flask import current_app, jsonify, make_response, render_template, request
+from flask_login import current_user
+from app.database import query_latency
+from app.extensions import matching_worker
+
+# Rate limiting and admission control for the expensive routes: login and
+# registration run scrypt, reports start a matching pass.
+#
+# Rate limits are token buckets per client. Each limited route belongs to a
+# group ('login', 'register', 'report') with a RATE_LIMIT_<GROUP> of
+# 'count/seconds': a client may burst up to count requests, and tokens refill
+# at count per seconds. Login and registration are limited per IP. Clients
+# behind one NAT share an IP, so the login limit is only a loose cap; password
+# guessing is held back by RATE_LIMIT_LOGIN_FAILURES, per (IP, username) and
+# spent by failed attempts only, so nobody can lock an account out by
+# spending its bucket. Reports are limited per user. The buckets live in a store with consume() and peek().
+# The in-process store is per server worker. RATE_LIMIT_STORE=postgres shares
+# them between all workers through an UNLOGGED table.
+#
+# Admission control protects the worker as a whole. When the matching queue
+# or the average query time crosses the SHED thresholds, limited routes are
+# refused with 429 before doing any work (login and registration only on
+# query time, which is all they depend on). Past the lower DEFER thresholds, reports are still
+# stored but their matching pass is skipped and left to 'manage.py sweep'.
+
+LATENCY_WINDOW = 10
+# The shared store: how long to wait for a connection, for a query, and
+# before trying to connect again after a failure
+STORE_CONNECT_TIMEOUT = 2
+STORE_STATEMENT_TIMEOUT_MS = 500
+STORE_RETRY_SECONDS = 5
+
+class MemoryBucketStore:
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def consume(self, key, capacity, rate, cost=1):
+        # Returns (allowed, seconds until enough tokens are back)
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated = self.buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self.buckets[key] = (tokens, now)
+            while len(self.buckets) > self.max_entries:
+                self.buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def peek(self, key, capacity, rate, cost=1):
+        # As consume, without spending
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated = self.buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        return tokens >= cost, 0.0 if tokens >= cost else (cost - tokens) / rate
+
+REFILLED = "LEAST(%(capacity)s, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * %(rate)s)"
+
+class DatabaseBucketStore:
+    # One upsert per check on its own autocommit connection, so limits never
+    # join (or roll back with) the request's transaction. If PostgreSQL is
+    # unreachable requests are allowed: the limiter must not become an outage.
+    # Connecting happens outside the lock with a short timeout, only one
+    # thread tries at a time, and after a failure the store is skipped for
+    # STORE_RETRY_SECONDS, so requests never queue behind a dead server.
+    def __init__(self, dsn, expire_seconds=86400):
+        self.dsn = dsn
+        self.expire_seconds = expire_seconds
+        self.conn = None
+        self.connecting = False
+        self.retry_at = 0.0
+        self.lock = threading.Lock()
+
+    def connection(self):
+        # None while another thread connects or after a recent failure
+        with self.lock:
+            if self.conn is not None and not self.conn.closed:
+                return self.conn
+            if self.connecting or time.monotonic() < self.retry_at:
+                return None
+            self.connecting = True
+        conn = None
+        try:
+            conn = psycopg2.connect(self.dsn, connect_timeout=STORE_CONNECT_TIMEOUT,
+                                    options=f'-c statement_timeout={STORE_STATEMENT_TIMEOUT_MS}')
+            conn.autocommit = True
+        except psycopg2.Error as e:
+            print(f"Rate limit store unreachable, allowing requests for {STORE_RETRY_SECONDS}s: {e}")
+        with self.lock:
+            self.connecting = False
+            self.conn = conn
+            if conn is None:
+                self.retry_at = time.monotonic() + STORE_RETRY_SECONDS
+        return conn
+
+    def execute(self, query, params):
+        # The query's row, or None when the store is unavailable
+        conn = self.connection()
+        if conn is None:
+            return None
+        with self.lock:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                row = cursor.fetchone()
+                if random.random() < 0.001:
+                    cursor.execute("DELETE FROM rate_limit_buckets WHERE updated_at < now() - make_interval(secs => %s)",
+                                   (self.expire_seconds,))
+                cursor.close()
+                return row
+            except psycopg2.Error as e:
+                print(f"Rate limit store error, allowing request: {e}")
+                conn.close()
+                self.retry_at = time.monotonic() + STORE_RETRY_SECONDS
+                return None
+
+    def consume(self, key, capacity, rate, cost=1):
+        row = self.execute(f"""
+            INSERT INTO rate_limit_buckets AS b (key, tokens, allowed, updated_at)
+            VALUES (%(key)s, %(capacity)s - %(cost)s, TRUE, now())
+            ON CONFLICT (key) DO UPDATE SET
+                tokens = {REFILLED} - CASE WHEN {REFILLED} >= %(cost)s THEN %(cost)s ELSE 0 END,
+                allowed = {REFILLED} >= %(cost)s,
+                updated_at = now()
+            RETURNING tokens, allowed
+        """, {'key': key, 'capacity': capacity, 'rate': rate, 'cost': cost})
+        if row is None:
+            return True, 0.0
+        tokens, allowed = row
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def peek(self, key, capacity, rate, cost=1):
+        row = self.execute(f"""
+            SELECT COALESCE((SELECT {REFILLED} FROM rate_limit_buckets b WHERE b.key = %(key)s), %(capacity)s)
+        """, {'key': key, 'capacity': capacity, 'rate': rate})
+        if row is None:
+            return True, 0.0
+        tokens = row[0]
+        return tokens >= cost, 0.0 if tokens >= cost else (cost - tokens) / rate
+
+def create_bucket_store(app):
+    store = app.config['RATE_LIMIT_STORE']
+    if store == 'memory':
+        return MemoryBucketStore()
+    if store == 'postgres':
+        from app.database import DATABASE_DSN
+        return DatabaseBucketStore(DATABASE_DSN)
+    raise ValueError(f'Unknown rate limit store: {store}')
+
+def init_app(app):
+    app.extensions['rate_limits'] = create_bucket_store(app)
+
+def parse_limit(spec):
+    # 'count/seconds' -> (bucket capacity, tokens per second)
+    count, seconds = spec.split('/')
+    return float(count), float(count) / float(seconds)
+
+def client_keys(group):
+    keys = [f'{group}:ip:{request.remote_addr}']
+    if group == 'report' and current_user.is_authenticated:
+        keys = [f'{group}:user:{current_user.id}']
+    return keys
+
+def login_failure_key(username):
+    username = (username or '').strip().lower()
+    return f'login_failures:user:{username}:ip:{request.remote_addr}' if username else None
+
+def check_login_failures(username):
+    # A 429 response when this client has used up its failed attempts at the
+    # username. Only failures spend the bucket, and each client has its own,
+    # so guesses from elsewhere never refuse the account owner's login.
+    config = current_app.config
+    key = login_failure_key(username)
+    if key is None or not config['RATE_LIMIT_ENABLED'] or not config['RATE_LIMIT_LOGIN_FAILURES']:
+        return None
+    capacity, rate = parse_limit(config['RATE_LIMIT_LOGIN_FAILURES'])
+    allowed, retry_after = current_app.extensions['rate_limits'].peek(key, capacity, rate)
+    if not allowed:
+        return too_many_requests('Too many failed attempts for this account. Please try again later.', retry_after)
+    return None
+
+def record_login_failure(username):
+    config = current_app.config
+    key = login_failure_key(username)
+    if key is None or not config['RATE_LIMIT_ENABLED'] or not config['RATE_LIMIT_LOGIN_FAILURES']:
+        return
+    capacity, rate = parse_limit(config['RATE_LIMIT_LOGIN_FAILURES'])
+    current_app.extensions['rate_limits'].consume(key, capacity, rate)
+
+def matching_backlog():
+    return matching_worker.pending()
+
+def db_latency_ms():
+    return query_latency.recent(LATENCY_WINDOW) * 1000
+
+def over(value, threshold):
+    return bool(threshold) and value >= threshold
+
+def should_shed(group):
+    config = current_app.config
+    if over(db_latency_ms(), config['ADMISSION_SHED_LATENCY_MS']):
+        return True
+    return group == 'report' and over(matching_backlog(), config['ADMISSION_SHED_QUEUE'])
+
+def should_defer_matching():
+    config = current_app.config
+    return (over(matching_backlog(), config['ADMISSION_DEFER_QUEUE'])
+            or over(db_latency_ms(), config['ADMISSION_DEFER_LATENCY_MS']))
+
+def check_request(group):
+    # A 429 response when the request must be refused, otherwise None
+    config = current_app.config
+    if should_shed(group):
+        return too_many_requests('The server is busy. Please try again shortly.', config['ADMISSION_RETRY_AFTER'])
+    spec = config[f'RATE_LIMIT_{group.upper()}']
+    if not config['RATE_LIMIT_ENABLED'] or not spec:
+        return None
+    capacity, rate = parse_limit(spec)
+    store = current_app.extensions['rate_limits']
+    for key in client_keys(group):
+        allowed, retry_after = store.consume(key, capacity, rate)
+        if not allowed:
+            return too_many_requests('Too many requests. Please try again later.', retry_after)
+    return None
+
+def too_many_requests(message, retry_after):
+    retry_after = max(1, math.ceil(retry_after))
+    if request.path.startswith('/api/'):
+        response = jsonify({'error': message, 'retry_after': retry_after})
+    else:
+        response = make_response(render_template('too_many_requests.html', message=message, retry_after=retry_after))
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def limited(group):
+    # Route decorator; GET requests only render forms and are not limited
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method == 'POST':
+                refusal = check_request(group)
+                if refusal is not None:
+                    return refusal
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
@@ -0,0 +1,218 @@
+import json
+import os
+import threading
+import time
+from app.normalize import canonical_token, category_key, name_tokens, token_id
+
+# Scoring rules, declared as data and compiled into a Scorer. A JSON file
+# named by SCORING_RULES overrides any of them and is reloaded when it
+# changes, so weights can be tuned without restarting workers. Categories and
+# names are compared through the normalization dictionary (app/normalize.py):
+# category IDs for equality and name token IDs for containment/overlap.
+#
+# weights        points for each signal; a pair's score is the points earned
+#                as a percentage of the total of these weights. The image
+#                weight only counts, in the points and the total, when both
+#                items have a photo, so pairs without photos score as before.
+# name_partial   fraction of the name weight for a shared word instead of
+#                one name containing the other
+# description_per_word
+#                fraction of the description weight per shared word, capped
+#                at the full weight
+# date_decay     [max_days_apart, fraction of the date weight] steps
+# image_decay    [max_differing_bits, fraction of the image weight] steps,
+#                by the Hamming distance of the photos' 64-bit difference
+#                hashes (app/images.py)
+# category_weights
+#                weight overrides keyed by the lost item's category (aliases
+#                resolve through the normalization dictionary)
+# synonyms       extra groups of words treated as the same word in names and
+#                descriptions, on top of the normalization dictionary
+
+DEFAULT_RULES = {
+    'threshold': 40,
+    'weights': {'category': 30, 'name': 25, 'description': 20, 'location': 15, 'date': 10, 'image': 20},
+    'name_partial': 0.6,
+    'description_per_word': 0.1,
+    'date_decay': [[1, 1.0], [7, 0.5], [14, 0.2]],
+    'image_decay': [[6, 1.0], [12, 0.5], [18, 0.2]],
+    'category_weights': {},
+    'synonyms': [],
+}
+
+SIGNALS = ('category', 'name', 'description', 'location', 'date')
+OPTIONAL_SIGNALS = ('image',)
+
+def merge_rules(overrides):
+    rules = json.loads(json.dumps(DEFAULT_RULES))
+    unknown = set(overrides) - set(rules)
+    if unknown:
+        raise ValueError(f'Unknown scoring rules: {", ".join(sorted(unknown))}')
+    for key, value in overrides.items():
+        if key == 'weights':
+            rules['weights'].update(value)
+        else:
+            rules[key] = value
+    return rules
+
+class Scorer:
+    def __init__(self, rules=None):
+        rules = merge_rules(rules or {})
+        self.rules = rules
+        self.threshold = float(rules['threshold'])
+
+        self.synonyms = {}
+        self.token_synonyms = []
+        for group in rules['synonyms']:
+            canonical = group[0].lower()
+            for word in group:
+                self.synonyms[word.lower()] = canonical
+                self.token_synonyms.append((canonical_token(word.lower()), canonical_token(canonical)))
+        # Token IDs are interned, so the ID map is built on first use rather
+        # than when the rules are loaded at import time
+        self.token_map = None
+
+        self.default_weights = self.compile_weights(rules['weights'])
+        self.category_weights = {
+            category_key(category): self.compile_weights(dict(rules['weights'], **weights))
+            for category, weights in rules['category_weights'].items()
+        }
+
+    def compile_weights(self, weights):
+        unknown = set(weights) - set(SIGNALS) - set(OPTIONAL_SIGNALS)
+        if unknown:
+            raise ValueError(f'Unknown scoring weights: {", ".join(sorted(unknown))}')
+        rules = self.rules
+        # Date points indexed by days apart, so the per-pair lookup is one index
+        decay = []
+        for max_days, fraction in sorted(rules['date_decay']):
+            while len(decay) <= max_days:
+                decay.append(weights['date'] * fraction)
+        image_decay = []
+        for max_bits, fraction in sorted(rules['image_decay']):
+            while len(image_decay) <= max_bits:
+                image_decay.append(weights['image'] * fraction)
+        return (
+            weights['category'],
+            weights['name'],
+            weights['name'] * rules['name_partial'],
+            weights['description'],
+            weights['description'] * rules['description_per_word'],
+            weights['location'],
+            tuple(decay),
+            sum(weights[signal] for signal in SIGNALS),
+            weights['image'],
+            tuple(image_decay),
+        )
+
+    def name_token_map(self):
+        # Token ID -> the ID of its synonym group's canonical token
+        if self.token_map is None:
+            self.token_map = {token_id(word): token_id(canonical) for word, canonical in self.token_synonyms}
+        return self.token_map
+
+    def canonical(self, text):
+        if not self.synonyms:
+            return text
+        return ' '.join(self.synonyms.get(word, word) for word in text.split())
+
+    def features(self, item, kind):
+        # Everything the per-pair comparison needs, computed once per item.
+        # Stored features are used when present; rows stored before they
+        # existed are normalized here.
+        tokens = item.get('name_tokens')
+        if tokens is None:
+            tokens = name_tokens(item['item_name'])
+        if self.token_synonyms:
+            token_map = self.name_token_map()
+            tokens = [token_map.get(token, token) for token in tokens]
+        description = self.canonical(item['description'].lower())
+        when = item[f'date_{kind}']
+        return (
+            category_key(item['category'], item.get('category_id')),
+            frozenset(tokens),
+            set(description.split()),
+            item[f'location_{kind}'].lower(),
+            when.toordinal() if hasattr(when, 'toordinal') else None,
+            item.get('image_hash'),
+        )
+
+    def lost_features(self, item):
+        return self.features(item, 'lost')
+
+    def found_features(self, item):
+        return self.features(item, 'found')
+
+    def score_features(self, lost, found):
+        lost_category, lost_tokens, lost_description, lost_location, lost_day, lost_image = lost
+        found_category, found_tokens, found_description, found_location, found_day, found_image = found
+        (category_points, name_points, partial_points, description_points, word_points,
+         location_points, date_points, total, image_weight, image_points) = \
+            self.category_weights.get(lost_category, self.default_weights)
+
+        score = 0
+        if lost_category == found_category:
+            score += category_points
+        if lost_tokens and found_tokens and (lost_tokens <= found_tokens or found_tokens <= lost_tokens):
+            score += name_points
+        elif not lost_tokens.isdisjoint(found_tokens):
+            score += partial_points
+        common_words = len(lost_description & found_description)
+        if common_words:
+            score += min(description_points, common_words * word_points)
+        if lost_location in found_location or found_location in lost_location:
+            score += location_points
+        if lost_day is not None and found_day is not None:
+            days = abs(lost_day - found_day)
+            if days < len(date_points):
+                score += date_points[days]
+        if lost_image is not None and found_image is not None:
+            total += image_weight
+            # Hashes are stored as signed 64-bit integers
+            bits = bin((lost_image ^ found_image) & 0xFFFFFFFFFFFFFFFF).count('1')
+            if bits < len(image_points):
+                score += image_points[bits]
+        return round(score / total * 100, 2)
+
+    def score(self, lost_item, found_item):
+        return self.score_features(self.lost_features(lost_item), self.found_features(found_item))
+
+class ScorerLoader:
+    # Holds the active Scorer and swaps in a new one when the rules file's
+    # mtime changes. The file is checked at most every check_interval seconds
+    # and a broken file keeps the previous scorer.
+    def __init__(self, path=None, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.checked = 0.0
+        self.scorer = Scorer()
+        if path:
+            self.reload()
+
+    def reload(self):
+        with self.lock:
+            self.checked = time.monotonic()
+            try:
+                mtime = os.path.getmtime(self.path)
+                if mtime == self.mtime:
+                    return False
+                with open(self.path) as f:
+                    scorer = Scorer(json.load(f))
+            except (OSError, ValueError, TypeError, KeyError) as e:
+                print(f"Could not load scoring rules from {self.path}: {e}")
+                return False
+            self.scorer = scorer
+            self.mtime = mtime
+            return True
+
+    def get(self):
+        if self.path and time.monotonic() - self.checked >= self.check_interval:
+            self.reload()
+        return self.scorer
+
+scorer_loader = ScorerLoader(os.environ.get('SCORING_RULES'), float(os.environ.get('SCORING_RULES_CHECK_SECONDS', 2)))
+
+def get_scorer():
+    return scorer_loader.get()
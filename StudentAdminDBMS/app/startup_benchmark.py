@@ -0,0 +1,77 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Startup-time benchmark. Each run starts a fresh interpreter and times the
+# phases a server goes through: importing the app, create_app(), the
+# per-worker start_worker() and the first requests. With gunicorn's
+# preload_app the master pays for the import and create_app once, so a
+# (re)spawned worker only pays start_worker and its first request.
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PHASES = ('import', 'create_app', 'start_worker', 'first_request', 'readyz', 'stop_worker')
+
+CHILD = """
+import json, time
+marks = [time.perf_counter()]
+from app import create_app, lifecycle
+marks.append(time.perf_counter())
+app = create_app(start_worker=False)
+marks.append(time.perf_counter())
+lifecycle.start_worker(app)
+marks.append(time.perf_counter())
+client = app.test_client()
+client.get('/healthz')
+marks.append(time.perf_counter())
+ready = client.get('/readyz').status_code
+marks.append(time.perf_counter())
+lifecycle.stop_worker(app)
+marks.append(time.perf_counter())
+print(json.dumps({'marks': marks, 'ready': ready}))
+"""
+
+def run_child(importtime=False):
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', CHILD]
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=PROJECT_ROOT, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f'Startup run failed:\n{result.stderr}')
+    output = json.loads(result.stdout.strip().splitlines()[-1])
+    marks = output['marks']
+    phases = {phase: marks[index + 1] - marks[index] for index, phase in enumerate(PHASES)}
+    phases['process'] = wall
+    return phases, output['ready'], result.stderr
+
+def slowest_imports(stderr, count):
+    # (self seconds, cumulative seconds, module) from python -X importtime
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        imports.append((int(own) / 1e6, int(cumulative) / 1e6, name.strip()))
+    imports.sort(reverse=True)
+    return imports[:count]
+
+def run_startup_benchmark(runs=5, top_imports=0):
+    samples = []
+    ready = []
+    for _ in range(runs):
+        phases, status, _ = run_child()
+        samples.append(phases)
+        ready.append(status)
+    result = {
+        'runs': runs,
+        'median': {phase: statistics.median(sample[phase] for sample in samples) for phase in samples[0]},
+        'min': {phase: min(sample[phase] for sample in samples) for phase in samples[0]},
+        'ready': ready,
+        'imports': [],
+    }
+    if top_imports:
+        result['imports'] = slowest_imports(run_child(importtime=True)[2], top_imports)
+    return result
@@ -0,0 +1,140 @@
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from app import audit
+from app.matching import found_match_message, lost_match_message, record_pass
+from app.scoring import Scorer, get_scorer
+
+# Periodic re-matching sweep. Matching normally runs once, when an item is
+# reported; if that pass fails or is skipped, the pair is never scored. A
+# sweep scores every open lost x found pair in which at least one item is
+# newer than the last completed sweep (the watermark), so every pair is
+# covered at least once even when its inline pass was lost.
+#
+# Work is split by the lost item's category. Each partition scores its lost
+# items against the open found items in a worker process (a category only
+# weights the score, so the found side cannot be narrowed to it) and the
+# parent upserts the results through match_table's (lost_id, found_id) key.
+# A partition's matches, their notifications and its checkpoint commit in one
+# transaction, and an interrupted run resumes with the same targets, skipping
+# finished partitions. A partition is either done with every notification
+# sent or redone from scratch.
+
+SWEEP_NAME = 'matching'
+
+# Set in each worker process by init_worker
+worker_scorer = None
+worker_found = None
+
+def init_worker(rules, found):
+    global worker_scorer, worker_found
+    worker_scorer = Scorer(rules)
+    worker_found = found
+
+def score_partition(lost, found_watermark):
+    return score_lost_items(worker_scorer, lost, worker_found, found_watermark)
+
+def score_lost_items(scorer, lost, found, found_watermark):
+    # New lost items are scored against every open found item, the rest only
+    # against found items newer than the watermark
+    new_found = [(found_id, features) for found_id, features in found if found_id > found_watermark]
+    threshold = scorer.threshold
+    scored = []
+    pairs_scored = 0
+    for lost_id, lost_features, is_new in lost:
+        candidates = found if is_new else new_found
+        pairs_scored += len(candidates)
+        for found_id, found_features in candidates:
+            match_score = scorer.score_features(lost_features, found_features)
+            if match_score >= threshold:
+                scored.append((lost_id, found_id, match_score))
+    return scored, pairs_scored
+
+def run_sweep(db, processes=None, lag_seconds=60, name=SWEEP_NAME):
+    # None when another sweep with the same name is already running
+    if not db.try_sweep_lock(name):
+        return None
+    try:
+        return sweep(db, processes, lag_seconds, name)
+    finally:
+        db.release_sweep_lock(name)
+
+def sweep(db, processes=None, lag_seconds=60, name=SWEEP_NAME):
+    started = time.perf_counter()
+    state = db.begin_sweep(name, lag_seconds)
+    lost_watermark = state['lost_watermark']
+    found_watermark = state['found_watermark']
+    scorer = get_scorer()
+
+    lost_items = {item['lost_id']: item for item in db.get_open_lost_items()
+                  if item['lost_id'] <= state['target_lost']}
+    found_items = {item['found_id']: item for item in db.get_open_found_items()
+                   if item['found_id'] <= state['target_found']}
+    found = [(found_id, scorer.found_features(found_items[found_id])) for found_id in sorted(found_items)]
+    any_new_found = any(found_id > found_watermark for found_id in found_items)
+
+    partitions = defaultdict(list)
+    for lost_id, item in lost_items.items():
+        is_new = lost_id > lost_watermark
+        if is_new or any_new_found:
+            features = scorer.lost_features(item)
+            partitions[str(features[0])].append((lost_id, features, is_new))
+    done = set(state['done_partitions'])
+    pending = [(key, partitions[key]) for key in sorted(partitions) if key not in done]
+
+    stats = {
+        'lost_watermark': lost_watermark,
+        'found_watermark': found_watermark,
+        'target_lost': state['target_lost'],
+        'target_found': state['target_found'],
+        'resumed_partitions': len(done),
+        'partitions': len(pending),
+        'pairs_scored': 0,
+        'matches_created': 0,
+        'matches_updated': 0,
+    }
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(pending) <= 1:
+        for key, lost in pending:
+            save_partition(db, name, key, score_lost_items(scorer, lost, found, found_watermark),
+                           lost_items, found_items, stats)
+    else:
+        # Spawned for the same reason as the scoring pool (app/parallel.py)
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(min(processes, len(pending)), mp_context=context, initializer=init_worker,
+                                 initargs=(scorer.rules, found)) as pool:
+            futures = {pool.submit(score_partition, lost, found_watermark): key for key, lost in pending}
+            for future in as_completed(futures):
+                save_partition(db, name, futures[future], future.result(), lost_items, found_items, stats)
+
+    db.finish_sweep(name)
+    record_pass(stats['pairs_scored'], stats['matches_created'])
+    audit.event('matches_created', source='sweep', matches=stats['matches_created'],
+                notifications=2 * stats['matches_created'], updated=stats['matches_updated'])
+    stats['seconds'] = time.perf_counter() - started
+    return stats
+
+def save_partition(db, name, key, result, lost_items, found_items, stats):
+    scored, pairs_scored = result
+    scores = {(lost_id, found_id): match_score for lost_id, found_id, match_score in scored}
+
+    def notifications(created):
+        messages = []
+        for row in created:
+            if not row['inserted']:
+                continue
+            lost_item = lost_items[row['lost_id']]
+            found_item = found_items[row['found_id']]
+            match_score = scores[(row['lost_id'], row['found_id'])]
+            messages.append((lost_item['user_id'], row['match_id'], lost_match_message(lost_item, match_score)))
+            messages.append((found_item['user_id'], row['match_id'], found_match_message(found_item, match_score)))
+        return messages
+
+    # Matches, notifications and the checkpoint commit together
+    created = db.save_sweep_partition(name, key, scored, notifications)
+    inserted = sum(1 for row in created if row['inserted'])
+    stats['pairs_scored'] += pairs_scored
+    stats['matches_created'] += inserted
+    stats['matches_updated'] += len(created) - inserted
@@ -0,0 +1,639 @@
+from flask import current_app, render_template, request, redirect, url_for, flash, jsonify, session, Response, stream_with_context, make_response
+from flask_login import login_user, logout_user, login_required, current_user
+from werkzeug.security import check_password_hash, generate_password_hash
+from app.auth import User, admin_required, student_required, api_required
+from app.extensions import analytics_aggregator, db, image_pipeline, matching_worker
+from app.matching import find_and_create_matches, verification_notifications
+from app import analytics, audit, bulk, fragments, images
+from app.audit import audit_log
+from app.open_index import open_index
+from app.ratelimit import limited, should_defer_matching, check_login_failures, record_login_failure
+from datetime import datetime, date
+from decimal import Decimal
+import time
+
+routes = []
+
+def route(rule, **options):
+    # Collected here and registered by init_app, so endpoint names stay the
+    # plain function names used by url_for throughout the templates.
+    def decorator(f):
+        routes.append((rule, f, options))
+        return f
+    return decorator
+
+def init_app(app):
+    for rule, view, options in routes:
+        app.add_url_rule(rule, view.__name__, view, **options)
+    app.before_request(route_reads)
+    app.after_request(remember_write)
+
+def route_reads():
+    # Read-your-writes: for a short while after a user changes something,
+    # their reads skip the replicas, which may not have caught up yet.
+    db.pin_primary(session.get('primary_until', 0) > time.time())
+
+def remember_write(response):
+    if db.replicas and db.has_written():
+        session['primary_until'] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+    return response
+
+def queue_matching(item_id, item_type, image_file=None):
+    # Under load the item is only stored; the next sweep matches it. With a
+    # photo the pass waits for its hash and the image pipeline queues it.
+    match = not should_defer_matching()
+    if image_file and image_pipeline.submit(item_type, item_id, image_file, match):
+        return
+    if not match:
+        return
+    if current_app.config['MATCH_IN_BACKGROUND']:
+        matching_worker.submit(item_id, item_type)
+    else:
+        find_and_create_matches(db, item_id, item_type)
+
+LOST_STATUSES = ('unfound', 'found', 'resolved')
+FOUND_STATUSES = ('unclaimed', 'returned', 'resolved')
+MAX_VERIFY_BATCH = 500
+
+def json_row(row):
+    result = {}
+    for key, value in row.items():
+        if key == 'password_hash':
+            continue
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = float(value)
+        result[key] = value
+    return result
+
+def page_args():
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = min(100, max(1, request.args.get('per_page', 25, type=int)))
+    return page, per_page
+
+def paginated(fetch_page):
+    # Fetch one extra row to know whether another page exists without a COUNT(*)
+    page, per_page = page_args()
+    rows = fetch_page(per_page + 1, (page - 1) * per_page)
+    return jsonify({
+        'items': [json_row(row) for row in rows[:per_page]],
+        'page': page,
+        'per_page': per_page,
+        'has_more': len(rows) > per_page,
+    })
+
+def request_data():
+    return request.get_json(silent=True) or request.form
+
+def idempotency_key():
+    # Set by the report forms' script, or sent by API clients as a header
+    key = (request.headers.get('Idempotency-Key') or request_data().get('idempotency_key') or '').strip()
+    return key or None
+
+def duplicate_item(kind, item_id, fields):
+    # The stored original, in the shape the report API returns
+    original = json_row(db.get_lost_item_by_id(item_id) if kind == 'lost' else db.get_found_item_by_id(item_id))
+    return dict({field: original[field] for field in fields + (f'{kind}_id', 'status')},
+                image_url=images.photo_url(original))
+
+def requested_match_ids():
+    # From a JSON body's match_ids list or repeated form fields; None if malformed
+    data = request.get_json(silent=True)
+    values = data.get('match_ids') if data else request.form.getlist('match_ids')
+    if not isinstance(values, list):
+        return None
+    try:
+        return [int(value) for value in values]
+    except (TypeError, ValueError):
+        return None
+
+def audit_verified(verified):
+    for match in verified:
+        audit.event('match_verified', match_id=match['match_id'], lost_id=match['lost_id'], found_id=match['found_id'],
+                    notified=[match['lost_user_id'], match['found_user_id']])
+
+def verify_result(verified, requested):
+    verified_ids = {match['match_id'] for match in verified}
+    return {
+        'verified': [json_row(match) for match in verified],
+        'skipped': [match_id for match_id in dict.fromkeys(requested) if match_id not in verified_ids],
+    }
+
+def not_modified(etag):
+    response = make_response('', 304)
+    return with_etag(response, etag)
+
+def with_etag(response, etag):
+    # Dashboards are per-user: let the browser keep a copy but revalidate every time
+    response.headers['Cache-Control'] = 'private, no-cache'
+    if etag:
+        response.set_etag(etag)
+    return response
+
+@route('/')
+def index():
+    if current_user.is_authenticated:
+        if current_user.role == 'admin':
+            return redirect(url_for('admin_dashboard'))
+        else:
+            return redirect(url_for('student_dashboard'))
+    return redirect(url_for('login'))
+
+@route('/healthz')
+def healthz():
+    # Liveness: the worker answers requests. Never touches the database, so a
+    # database outage does not get every worker restarted.
+    return jsonify({'status': 'ok'})
+
+@route('/readyz')
+def readyz():
+    # Readiness: the worker can serve traffic, i.e. reach the database and,
+    # with background matching, run passes. The open items index and the
+    # audit log are reported but not required.
+    checks = {}
+    try:
+        db.ping()
+        checks['database'] = 'ok'
+    except Exception:
+        # Unauthenticated: the error (printed when connecting) stays in the log
+        checks['database'] = 'unreachable'
+    if current_app.config['MATCH_IN_BACKGROUND']:
+        thread = matching_worker.thread
+        checks['matching_worker'] = 'ok' if thread is not None and thread.is_alive() else 'stopped'
+    ready = all(value == 'ok' for value in checks.values())
+    return jsonify({
+        'status': 'ready' if ready else 'unavailable',
+        'checks': checks,
+        'matching_queue': matching_worker.pending(),
+        'open_index': open_index.stats()['active'],
+        'image_pipeline': image_pipeline.stats(),
+        'audit_log': audit_log.stats() if audit_log.running else None,
+        'analytics_aggregator': analytics_aggregator.stats(),
+    }), 200 if ready else 503
+
+@route('/login', methods=['GET', 'POST'])
+@limited('login')
+def login():
+    if current_user.is_authenticated:
+        return redirect(url_for('index'))
+    
+    if request.method == 'POST':
+        username = request.form.get('username')
+        password = request.form.get('password')
+        
+        refusal = check_login_failures(username)
+        if refusal is not None:
+            return refusal
+        
+        user_data = db.get_user_by_username(username)
+        
+        if user_data and check_password_hash(user_data['password_hash'], password):
+            user = User(user_data)
+            login_user(user)
+            db.update_last_login(user.id)
+            audit.event('login', username=username)
+            
+            flash(f'Welcome back, {user.full_name}!', 'success')
+            return redirect(url_for('index'))
+        else:
+            audit.event('login_failed', username=username)
+            record_login_failure(username)
+            flash('Invalid username or password', 'error')
+    
+    return render_template('login.html')
+
+@route('/register', methods=['GET', 'POST'])
+@limited('register')
+def register():
+    if current_user.is_authenticated:
+        return redirect(url_for('index'))
+    
+    if request.method == 'POST':
+        username = request.form.get('username')
+        email = request.form.get('email')
+        password = request.form.get('password')
+        full_name = request.form.get('full_name')
+        phone = request.form.get('phone')
+        role = request.form.get('role', 'student')
+        
+        if role not in ['student', 'admin']:
+            role = 'student'
+        
+        try:
+            password_hash = generate_password_hash(password)
+            user_id = db.create_user(username, email, password_hash, full_name, role, phone)
+            audit.event('user_registered', user_id=user_id, username=username, role=role)
+            flash('Registration successful! Please login.', 'success')
+            return redirect(url_for('login'))
+        except Exception as e:
+            flash(f'Registration failed: {str(e)}', 'error')
+    
+    return render_template('register.html')
+
+@route('/logout')
+@login_required
+def logout():
+    audit.event('logout')
+    logout_user()
+    flash('You have been logged out successfully.', 'info')
+    return redirect(url_for('login'))
+
+@route('/student/dashboard')
+@login_required
+@student_required
+def student_dashboard():
+    etag = None
+    if '_flashes' not in session:
+        version = db.get_user_dashboard_version(current_user.id)
+        etag = fragments.make_etag('student', current_app.config['TEMPLATES_VERSION'], current_user.id, tuple(version.values()))
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+    
+    lost_items = db.get_lost_items_by_user(current_user.id)
+    found_items = db.get_found_items_by_user(current_user.id)
+    notifications = db.get_user_notifications(current_user.id)
+    
+    response = make_response(render_template('student_dashboard.html', 
+                         lost_items=lost_items,
+                         found_items=found_items,
+                         notifications=notifications))
+    return with_etag(response, etag)
+
+@route('/student/report_lost', methods=['POST'])
+@login_required
+@student_required
+@limited('report')
+def report_lost():
+    try:
+        item_name = request.form.get('item_name')
+        category = request.form.get('category')
+        description = request.form.get('description')
+        location_lost = request.form.get('location_lost')
+        date_lost = request.form.get('date_lost')
+        with images.stage_upload(request.files.get('photo')) as photo:
+            image_file = photo.filename
+            lost_id, created = db.report_item('lost', current_user.id, item_name, category, description,
+                                               location_lost, date_lost, idempotency_key(),
+                                               current_app.config['DUPLICATE_REPORT_WINDOW'], image_file=image_file)
+            if created:
+                photo.keep()
+        audit.event('item_reported', kind='lost', item_id=lost_id, item_name=item_name, duplicate=not created,
+                    image=image_file)
+        
+        if created:
+            queue_matching(lost_id, 'lost', image_file)
+            flash(f'Lost item "{item_name}" reported successfully!', 'success')
+        else:
+            flash(f'Lost item "{item_name}" was already reported.', 'info')
+    except Exception as e:
+        flash(f'Error reporting lost item: {str(e)}', 'error')
+    
+    return redirect(url_for('student_dashboard'))
+
+@route('/student/report_found', methods=['POST'])
+@login_required
+@student_required
+@limited('report')
+def report_found():
+    try:
+        item_name = request.form.get('item_name')
+        category = request.form.get('category')
+        description = request.form.get('description')
+        location_found = request.form.get('location_found')
+        date_found = request.form.get('date_found')
+        with images.stage_upload(request.files.get('photo')) as photo:
+            image_file = photo.filename
+            found_id, created = db.report_item('found', current_user.id, item_name, category, description,
+                                                location_found, date_found, idempotency_key(),
+                                                current_app.config['DUPLICATE_REPORT_WINDOW'], image_file=image_file)
+            if created:
+                photo.keep()
+        audit.event('item_reported', kind='found', item_id=found_id, item_name=item_name, duplicate=not created,
+                    image=image_file)
+        
+        if created:
+            queue_matching(found_id, 'found', image_file)
+            flash(f'Found item "{item_name}" reported successfully!', 'success')
+        else:
+            flash(f'Found item "{item_name}" was already reported.', 'info')
+    except Exception as e:
+        flash(f'Error reporting found item: {str(e)}', 'error')
+    
+    return redirect(url_for('student_dashboard'))
+
+@route('/admin/dashboard')
+@login_required
+@admin_required
+def admin_dashboard():
+    versions = db.get_table_versions()
+    
+    etag = None
+    if '_flashes' not in session:
+        etag = fragments.make_etag('admin', current_app.config['TEMPLATES_VERSION'], current_user.id, tuple(versions.values()))
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+    
+    lost_table = fragments.render_cached_fragment('admin_lost_table', versions['lost_version'],
+                                                  lambda: {'lost_items': db.get_all_lost_items()})
+    found_table = fragments.render_cached_fragment('admin_found_table', versions['found_version'],
+                                                   lambda: {'found_items': db.get_all_found_items()})
+    users_table = fragments.render_cached_fragment('admin_users_table', versions['users_version'],
+                                                   lambda: {'users': db.get_all_users()})
+    stats = db.get_statistics()
+    
+    response = make_response(render_template('admin_dashboard.html',
+                         lost_table=lost_table,
+                         found_table=found_table,
+                         users_table=users_table,
+                         stats=stats))
+    return with_etag(response, etag)
+
+@route('/admin/update_lost_status', methods=['POST'])
+@login_required
+@admin_required
+def update_lost_status():
+    try:
+        lost_id = request.form.get('lost_id')
+        status = request.form.get('status')
+        
+        db.update_lost_item_status(lost_id, status)
+        audit.event('status_changed', kind='lost', item_id=lost_id, status=status)
+        flash('Lost item status updated successfully!', 'success')
+    except Exception as e:
+        flash(f'Error updating status: {str(e)}', 'error')
+    
+    return redirect(url_for('admin_dashboard'))
+
+@route('/admin/update_found_status', methods=['POST'])
+@login_required
+@admin_required
+def update_found_status():
+    try:
+        found_id = request.form.get('found_id')
+        status = request.form.get('status')
+        
+        db.update_found_item_status(found_id, status)
+        audit.event('status_changed', kind='found', item_id=found_id, status=status)
+        flash('Found item status updated successfully!', 'success')
+    except Exception as e:
+        flash(f'Error updating status: {str(e)}', 'error')
+    
+    return redirect(url_for('admin_dashboard'))
+
+@route('/admin/import/<kind>', methods=['POST'])
+@login_required
+@admin_required
+def import_items(kind):
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash('Please choose a CSV file to import.', 'error')
+        return redirect(url_for('admin_dashboard'))
+    
+    try:
+        result = bulk.import_items(db, kind, upload.stream, run_matching=request.form.get('skip_matching') != 'on')
+        flash(f"Imported {result['imported']} {kind} items ({result['skipped']} skipped, {result['matches']} matches found).", 'success')
+    except Exception as e:
+        flash(f'Import failed: {str(e)}', 'error')
+    
+    return redirect(url_for('admin_dashboard'))
+
+@route('/admin/export/<kind>.csv')
+@login_required
+@admin_required
+def export_items(kind):
+    if kind not in ('lost', 'found', 'matches'):
+        flash('Unknown export type.', 'error')
+        return redirect(url_for('admin_dashboard'))
+    
+    return Response(
+        stream_with_context(bulk.export_csv(db, kind)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={kind}.csv'}
+    )
+
+@route('/notifications/mark_read/<int:notification_id>')
+@login_required
+def mark_notification_read(notification_id):
+    db.mark_notification_read(notification_id)
+    return redirect(request.referrer or url_for('index'))
+
+@route('/notifications/mark_all_read')
+@login_required
+def mark_all_read():
+    db.mark_all_notifications_read(current_user.id)
+    flash('All notifications marked as read.', 'success')
+    return redirect(request.referrer or url_for('index'))
+
+# JSON API
+@route('/api/student/lost_items')
+@api_required('student')
+def api_student_lost_items():
+    return paginated(lambda limit, offset: db.get_lost_items_page(limit, offset, user_id=current_user.id))
+
+@route('/api/student/found_items')
+@api_required('student')
+def api_student_found_items():
+    return paginated(lambda limit, offset: db.get_found_items_page(limit, offset, user_id=current_user.id))
+
+@route('/api/student/lost_items', methods=['POST'])
+@api_required('student')
+@limited('report')
+def api_report_lost():
+    data = request_data()
+    fields = ('item_name', 'category', 'description', 'location_lost', 'date_lost')
+    item = {field: data.get(field) for field in fields}
+    if not all(item.values()):
+        return jsonify({'error': 'All fields are required.'}), 400
+    key = idempotency_key()
+    if key and len(key) > 64:
+        return jsonify({'error': 'Idempotency key must be at most 64 characters.'}), 400
+    try:
+        photo = images.stage_upload(request.files.get('photo'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    image_file = photo.filename
+    
+    try:
+        with photo:
+            item['lost_id'], created = db.report_item('lost', current_user.id, *(item[field] for field in fields), key,
+                                                     current_app.config['DUPLICATE_REPORT_WINDOW'], image_file=image_file)
+            if created:
+                photo.keep()
+        audit.event('item_reported', kind='lost', item_id=item['lost_id'], item_name=item['item_name'],
+                    duplicate=not created, image=image_file)
+        if created:
+            queue_matching(item['lost_id'], 'lost', image_file)
+    except Exception as e:
+        return jsonify({'error': f'Error reporting lost item: {str(e)}'}), 500
+    
+    if not created:
+        # A repeat: answer with the original and skip matching and notifications
+        return jsonify({
+            'item': duplicate_item('lost', item['lost_id'], fields),
+            'duplicate': True,
+            'message': f'Lost item "{item["item_name"]}" was already reported.'
+        })
+    
+    item['status'] = 'unfound'
+    item['image_url'] = images.photo_url({'image_file': image_file})
+    return jsonify({
+        'item': item,
+        'message': f'Lost item "{item["item_name"]}" reported successfully!'
+    }), 201
+
+@route('/api/student/found_items', methods=['POST'])
+@api_required('student')
+@limited('report')
+def api_report_found():
+    data = request_data()
+    fields = ('item_name', 'category', 'description', 'location_found', 'date_found')
+    item = {field: data.get(field) for field in fields}
+    if not all(item.values()):
+        return jsonify({'error': 'All fields are required.'}), 400
+    key = idempotency_key()
+    if key and len(key) > 64:
+        return jsonify({'error': 'Idempotency key must be at most 64 characters.'}), 400
+    try:
+        photo = images.stage_upload(request.files.get('photo'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    image_file = photo.filename
+    
+    try:
+        with photo:
+            item['found_id'], created = db.report_item('found', current_user.id, *(item[field] for field in fields), key,
+                                                      current_app.config['DUPLICATE_REPORT_WINDOW'], image_file=image_file)
+            if created:
+                photo.keep()
+        audit.event('item_reported', kind='found', item_id=item['found_id'], item_name=item['item_name'],
+                    duplicate=not created, image=image_file)
+        if created:
+            queue_matching(item['found_id'], 'found', image_file)
+    except Exception as e:
+        return jsonify({'error': f'Error reporting found item: {str(e)}'}), 500
+    
+    if not created:
+        # A repeat: answer with the original and skip matching and notifications
+        return jsonify({
+            'item': duplicate_item('found', item['found_id'], fields),
+            'duplicate': True,
+            'message': f'Found item "{item["item_name"]}" was already reported.'
+        })
+    
+    item['status'] = 'unclaimed'
+    item['image_url'] = images.photo_url({'image_file': image_file})
+    return jsonify({
+        'item': item,
+        'message': f'Found item "{item["item_name"]}" reported successfully!'
+    }), 201
+
+@route('/api/notifications')
+@api_required()
+def api_notifications():
+    return paginated(lambda limit, offset: db.get_notifications_page(current_user.id, limit, offset))
+
+@route('/api/notifications/<int:notification_id>/read', methods=['POST'])
+@api_required()
+def api_mark_notification_read(notification_id):
+    if not db.mark_notification_read(notification_id, user_id=current_user.id):
+        return jsonify({'error': 'Notification not found.'}), 404
+    return jsonify({'notification_id': notification_id, 'unread_count': db.get_unread_count(current_user.id)})
+
+@route('/api/notifications/read_all', methods=['POST'])
+@api_required()
+def api_mark_all_read():
+    db.mark_all_notifications_read(current_user.id)
+    return jsonify({'unread_count': 0})
+
+@route('/api/admin/lost_items')
+@api_required('admin')
+def api_admin_lost_items():
+    return paginated(db.get_lost_items_page)
+
+@route('/api/admin/found_items')
+@api_required('admin')
+def api_admin_found_items():
+    return paginated(db.get_found_items_page)
+
+@route('/api/admin/users')
+@api_required('admin')
+def api_admin_users():
+    return paginated(db.get_users_page)
+
+@route('/api/admin/archive/lost_items')
+@api_required('admin')
+def api_archived_lost_items():
+    user_id = request.args.get('user_id', type=int)
+    return paginated(lambda limit, offset: db.get_archived_lost_items_page(limit, offset, user_id=user_id))
+
+@route('/api/admin/archive/found_items')
+@api_required('admin')
+def api_archived_found_items():
+    user_id = request.args.get('user_id', type=int)
+    return paginated(lambda limit, offset: db.get_archived_found_items_page(limit, offset, user_id=user_id))
+
+@route('/api/admin/archive/matches')
+@api_required('admin')
+def api_archived_matches():
+    matches = db.get_archived_matches(lost_id=request.args.get('lost_id', type=int),
+                                      found_id=request.args.get('found_id', type=int))
+    return jsonify({'items': [json_row(match) for match in matches]})
+
+@route('/api/admin/analytics')
+@api_required('admin')
+def api_admin_analytics():
+    grain = request.args.get('grain', 'day')
+    if grain not in analytics.MAX_PERIODS:
+        return jsonify({'error': f'Invalid grain: {grain}'}), 400
+    return jsonify(analytics.analytics_report(db, grain, request.args.get('periods', type=int)))
+
+@route('/api/admin/lost_items/<int:lost_id>/status', methods=['POST'])
+@api_required('admin')
+def api_update_lost_status(lost_id):
+    status = request_data().get('status')
+    if status not in LOST_STATUSES:
+        return jsonify({'error': f'Invalid status: {status}'}), 400
+    
+    db.update_lost_item_status(lost_id, status)
+    audit.event('status_changed', kind='lost', item_id=lost_id, status=status)
+    return jsonify({'lost_id': lost_id, 'status': status})
+
+@route('/api/admin/found_items/<int:found_id>/status', methods=['POST'])
+@api_required('admin')
+def api_update_found_status(found_id):
+    status = request_data().get('status')
+    if status not in FOUND_STATUSES:
+        return jsonify({'error': f'Invalid status: {status}'}), 400
+    
+    db.update_found_item_status(found_id, status)
+    audit.event('status_changed', kind='found', item_id=found_id, status=status)
+    return jsonify({'found_id': found_id, 'status': status})
+
+@route('/api/admin/matches/pending')
+@api_required('admin')
+def api_verification_queue():
+    return paginated(db.get_verification_queue_page)
+
+@route('/api/admin/matches/<int:match_id>/verify', methods=['POST'])
+@api_required('admin')
+def api_verify_match(match_id):
+    verified = db.verify_matches([match_id], verification_notifications)
+    if not verified:
+        return jsonify({'error': 'Match is already verified or its items are no longer open.'}), 409
+    
+    audit_verified(verified)
+    return jsonify(verify_result(verified, [match_id]))
+
+@route('/api/admin/matches/verify', methods=['POST'])
+@api_required('admin')
+def api_verify_matches():
+    match_ids = requested_match_ids()
+    if match_ids is None:
+        return jsonify({'error': 'match_ids must be a list of match ids.'}), 400
+    if len(match_ids) > MAX_VERIFY_BATCH:
+        return jsonify({'error': f'At most {MAX_VERIFY_BATCH} matches can be verified at once.'}), 400
+    
+    verified = db.verify_matches(match_ids, verification_notifications) if match_ids else []
+    audit_verified(verified)
+    return jsonify(verify_result(verified, match_ids))
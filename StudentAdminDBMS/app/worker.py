@@ -0,0 +1,147 @@
+import asyncio
+import queue
+import threading
+from app.matching import find_and_create_matches
+
+# Longest wait between connection attempts of the async worker
+RETRY_MAX_SECONDS = 30
+
+class MatchingWorker:
+    # Runs matching passes for newly reported items on a background thread so
+    # report requests return as soon as the item is stored. The worker owns
+    # its own Database connection; the match cache is shared with the request
+    # side so invalidations stay visible to both.
+    def __init__(self, database_factory):
+        self.database_factory = database_factory
+        self.jobs = queue.Queue()
+        self.thread = None
+        self.db = None
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.db = self.database_factory()
+        self.thread = threading.Thread(target=self.run, name='matching-worker', daemon=True)
+        self.thread.start()
+
+    def submit(self, item_id, item_type):
+        self.jobs.put((item_id, item_type))
+
+    def pending(self):
+        return self.jobs.qsize()
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                find_and_create_matches(self.db, *job)
+            except Exception as e:
+                print(f"Matching error for {job}: {e}")
+            finally:
+                self.jobs.task_done()
+
+    def stop(self, timeout=30):
+        # Jobs queued before the sentinel are still processed, so in-flight
+        # matching work is drained before the connection is closed.
+        if self.thread is None:
+            return
+        self.jobs.put(None)
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            print(f"Matching worker did not drain within {timeout}s; {self.pending()} jobs dropped")
+        else:
+            self.db.close()
+        self.thread = None
+
+class AsyncMatchingWorker:
+    # Same interface as MatchingWorker, but jobs run on an asyncio loop over
+    # AsyncDatabase so several matching passes overlap on a few pooled
+    # connections instead of queueing behind one. The pool is opened on the
+    # loop, retrying with backoff while the database is unreachable; jobs
+    # submitted meanwhile queue up and run once it answers.
+    def __init__(self, database_factory, concurrency=4, retry_seconds=1):
+        self.database_factory = database_factory
+        self.concurrency = concurrency
+        self.retry_seconds = retry_seconds
+        self.loop = None
+        self.jobs = None
+        self.stopping = None
+        self.thread = None
+        self.ready = threading.Event()
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self.run_loop, name='async-matching-worker', daemon=True)
+        self.thread.start()
+        self.ready.wait()
+
+    def run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        self.jobs = asyncio.Queue()
+        self.stopping = asyncio.Event()
+        self.ready.set()
+        self.loop.run_until_complete(self.run())
+        self.loop.close()
+
+    def submit(self, item_id, item_type):
+        self.loop.call_soon_threadsafe(self.jobs.put_nowait, (item_id, item_type))
+
+    def pending(self):
+        return self.jobs.qsize() if self.jobs is not None else 0
+
+    async def run_job(self, db, slots, job):
+        async with slots:
+            try:
+                await db.find_and_create_matches(*job)
+            except Exception as e:
+                print(f"Matching error for {job}: {e}")
+
+    async def connect(self):
+        # The connected database, or None when stopped before it answered
+        delay = self.retry_seconds
+        while True:
+            try:
+                db = self.database_factory()
+                await db.connect()
+                return db
+            except Exception as e:
+                print(f"Matching worker cannot reach the database, retrying in {delay:g}s: {e}")
+            try:
+                await asyncio.wait_for(self.stopping.wait(), delay)
+                return None
+            except asyncio.TimeoutError:
+                delay = min(delay * 2, RETRY_MAX_SECONDS)
+
+    async def run(self):
+        db = await self.connect()
+        if db is None:
+            dropped = 0
+            while not self.jobs.empty():
+                dropped += self.jobs.get_nowait() is not None
+            print(f"Matching worker stopped before reaching the database; {dropped} jobs dropped")
+            return
+        slots = asyncio.Semaphore(self.concurrency)
+        running = set()
+        while True:
+            job = await self.jobs.get()
+            if job is None:
+                break
+            task = asyncio.ensure_future(self.run_job(db, slots, job))
+            running.add(task)
+            task.add_done_callback(running.discard)
+        if running:
+            await asyncio.gather(*running)
+        await db.close()
+
+    def stop(self, timeout=30):
+        if self.thread is None:
+            return
+        self.loop.call_soon_threadsafe(self.jobs.put_nowait, None)
+        self.loop.call_soon_threadsafe(self.stopping.set)
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            print(f"Matching worker did not drain within {timeout}s; {self.pending()} jobs dropped")
+        self.thread = None
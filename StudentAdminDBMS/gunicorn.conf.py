@@ -0,0 +1,17 @@
+import multiprocessing
+import os
+from app import lifecycle
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('WEB_THREADS', 1))
+preload_app = True
+graceful_timeout = int(os.environ.get('SHUTDOWN_DRAIN_TIMEOUT', 30)) + 5
+max_requests = int(os.environ.get('MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+def post_worker_init(worker):
+    lifecycle.start_worker(worker.wsgi)
+
+def worker_exit(server, worker):
+    lifecycle.stop_worker(worker.wsgi)
@@ -0,0 +1,213 @@
+import click
+import json
+import time
+from app.database import Database, create_database
+import os
+from app import analytics, bulk, assets, benchmark, conformance, migrations, query_plans, scoring, startup_benchmark, sweep
+from app.audit import audit_log
+from app.open_index import OpenItemsIndex
+
+@click.group()
+def cli():
+    pass
+
+@cli.command('import-items')
+@click.argument('kind', type=click.Choice(['lost', 'found']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--no-match', is_flag=True, help='Skip the matching pass over the imported rows.')
+def import_items(kind, path, no_match):
+    db = Database()
+    audit_log.start(db.dsn)
+    with open(path, 'rb') as stream:
+        result = bulk.import_items(db, kind, stream, run_matching=not no_match)
+    db.close()
+    audit_log.stop()
+    click.echo(f"Imported {result['imported']} rows, skipped {result['skipped']}, created {result['matches']} matches.")
+
+@cli.command('export-items')
+@click.argument('kind', type=click.Choice(['lost', 'found', 'matches']))
+@click.argument('output', type=click.File('w'), default='-')
+def export_items(kind, output):
+    db = Database()
+    for chunk in bulk.export_csv(db, kind):
+        output.write(chunk)
+    db.close()
+
+@cli.command('build-assets')
+def build_assets():
+    static_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    manifest = assets.build_assets(static_folder)
+    for name, hashed_name in manifest.items():
+        click.echo(f'{name} -> {hashed_name}')
+    if assets.brotli is None:
+        click.echo('brotli is not installed; only gzip variants were written.')
+
+@cli.command('migrate')
+@click.option('--target', type=int, help='Stop after this migration version.')
+@click.option('--list', 'list_only', is_flag=True, help='Only list pending migrations.')
+def migrate(target, list_only):
+    db = Database()
+    if list_only:
+        for version, name, path in migrations.pending_migrations(db):
+            click.echo(f'pending {version:04d}_{name}')
+    else:
+        for version, name in migrations.upgrade(db, target):
+            click.echo(f'applied {version:04d}_{name}')
+    db.close()
+
+@cli.command('explain-hot-queries')
+def explain_hot_queries():
+    db = Database()
+    results = query_plans.check_hot_queries(db)
+    db.close()
+    for result in results:
+        used = ', '.join(f'{node_type} on {index}' for node_type, index in result['used']) or 'no index'
+        click.echo(f"{'ok  ' if result['ok'] else 'FAIL'} {result['name']}: {used}")
+    if not all(result['ok'] for result in results):
+        raise SystemExit(1)
+
+@cli.command('archive')
+@click.option('--days', default=30, show_default=True, help='Archive items resolved at least this many days ago.')
+@click.option('--notification-days', default=90, show_default=True, help='Archive read notifications older than this.')
+@click.option('--batch-size', default=5000, show_default=True, help='Items moved per transaction.')
+def archive(days, notification_days, batch_size):
+    db = Database()
+    moved = db.archive_resolved(days, notification_days, batch_size)
+    db.close()
+    click.echo(', '.join(f'{count} {table}' for table, count in moved.items()) + ' archived')
+
+@cli.command('sweep')
+@click.option('--processes', type=int, help='Worker processes for scoring (default: one per CPU; 1 scores inline).')
+@click.option('--lag', default=60, show_default=True, help='Leave items stored in the last N seconds to the next run.')
+def sweep_matches(processes, lag):
+    # Re-scores open pairs with an item newer than the last sweep; schedule from cron
+    db = Database()
+    audit_log.start(db.dsn)
+    result = sweep.run_sweep(db, processes, lag)
+    db.close()
+    audit_log.stop()
+    if result is None:
+        click.echo('Another sweep is running')
+        return
+    click.echo(f"lost ids {result['lost_watermark']}..{result['target_lost']}, "
+               f"found ids {result['found_watermark']}..{result['target_found']}")
+    click.echo(f"{result['partitions']} partitions ({result['resumed_partitions']} already done), "
+               f"{result['pairs_scored']} pairs scored in {result['seconds']:.2f}s")
+    click.echo(f"{result['matches_created']} matches created, {result['matches_updated']} updated")
+
+@cli.command('aggregate-analytics')
+@click.option('--batch-size', default=analytics.ANALYTICS_BATCH_SIZE, show_default=True,
+              help='Events applied per transaction.')
+def aggregate_analytics(batch_size):
+    # Folds pending analytics events into the rollups; for ANALYTICS_INTERVAL_SECONDS=0
+    db = Database()
+    result = analytics.aggregate(db, batch_size)
+    db.close()
+    if result is None:
+        click.echo('Another aggregation is running')
+        return
+    click.echo(f"{result['events']} events applied in {result['batches']} batches, "
+               f"{result['pruned']} hourly rollups pruned in {result['seconds']:.2f}s")
+
+@cli.command('normalize-items')
+@click.option('--only-missing', is_flag=True, help='Only rows stored before normalization existed.')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows updated per transaction.')
+def normalize_items(only_missing, batch_size):
+    # Rewrites category_id and name_tokens; run after changing app/normalize.py
+    db = Database()
+    for kind in ('lost', 'found'):
+        count = db.normalize_items(kind, only_missing, batch_size)
+        click.echo(f'{count} {kind} items normalized')
+    db.close()
+
+@cli.command('open-index')
+@click.option('--sample', default=200, show_default=True, help='Open lost items to look up against the found items.')
+def open_index_stats(sample):
+    # Loads the open items index as a worker would and times lookups with it
+    db = Database()
+    index = OpenItemsIndex()
+    started = time.perf_counter()
+    index.start(db.dsn, wait=True)
+    loaded = time.perf_counter() - started
+    stats = index.stats()
+    click.echo(f"loaded      {stats['lost_items']} lost, {stats['found_items']} found in {loaded:.2f}s")
+    click.echo(f"memory      {stats['memory_bytes'] / 2 ** 20:.1f} MB, {stats['vocabulary']} strings")
+    scorer = scoring.get_scorer()
+    lost_items = [item for item in db.get_open_lost_items() if item['status'] == 'unfound'][:sample]
+    candidates = 0
+    started = time.perf_counter()
+    for item in lost_items:
+        found = index.candidates(scorer, scorer.lost_features(item), 'found')
+        if found is None:
+            click.echo('index is not active')
+            break
+        candidates += len(found[1])
+    elapsed = time.perf_counter() - started
+    if lost_items:
+        click.echo(f"lookups     {len(lost_items)} at {elapsed / len(lost_items) * 1e6:,.0f} us each, "
+                   f"{candidates / len(lost_items):,.0f} candidates on average")
+    index.stop()
+    db.close()
+
+@cli.command('check-backend')
+@click.option('--backend', type=click.Choice(['postgres', 'memory']), default='postgres', show_default=True)
+@click.option('--scratch', is_flag=True, help='The database is a scratch one: also run checks that leave shared rows.')
+def check_backend(backend, scratch):
+    db = create_database(backend)
+    results = conformance.run_conformance(db, scratch)
+    db.close()
+    for name, status, detail in results:
+        click.echo(f"{status:<4} {name}" + (f': {detail}' if detail else ''))
+    if any(status == 'FAIL' for name, status, detail in results):
+        raise SystemExit(1)
+
+@cli.command('scoring-rules')
+def scoring_rules():
+    # Effective rules: the defaults merged with the SCORING_RULES file, if any.
+    # Redirect to a file to start a custom rules file.
+    click.echo(json.dumps(scoring.get_scorer().rules, indent=2))
+
+@cli.command('benchmark-matching')
+@click.option('--pairs', default=300, show_default=True, help='Lost/found pairs that describe the same object.')
+@click.option('--distractors', default=700, show_default=True, help='Unrelated reports added on each side.')
+@click.option('--seed', default=1, show_default=True)
+@click.option('--typo-rate', default=0.15, show_default=True, help='Chance of a typo per word in found reports.')
+@click.option('--category-noise', default=0.1, show_default=True, help='Chance a finder picks another category.')
+@click.option('--date-jitter', default=5, show_default=True, help='Days between losing and finding an item.')
+@click.option('--alias-rate', default=0.0, show_default=True,
+              help='Chance a finder uses another word for the category or object.')
+@click.option('--show-misses', default=0, show_default=True, help='Print this many missed true pairs.')
+@click.option('--write-csv', type=click.Path(file_okay=False), help='Also write the corpus as import CSVs here.')
+def benchmark_matching(pairs, distractors, seed, typo_rate, category_noise, date_jitter, alias_rate, show_misses,
+                       write_csv):
+    corpus = benchmark.generate_corpus(pairs, distractors, seed, typo_rate, category_noise, date_jitter, alias_rate)
+    if write_csv:
+        benchmark.write_corpus_csv(corpus, write_csv)
+    result = benchmark.run_benchmark(corpus)
+    click.echo(f"corpus      {result['lost_items']} lost, {result['found_items']} found, {result['true_pairs']} true pairs")
+    click.echo(f"threshold   {result['threshold']}")
+    click.echo(f"predicted   {result['predicted']} matches, {result['true_positives']} correct")
+    click.echo(f"precision   {result['precision']:.3f}")
+    click.echo(f"recall      {result['recall']:.3f}")
+    click.echo(f"f1          {result['f1']:.3f}")
+    click.echo(f"scored      {result['pairs_scored']} pairs in {result['wall_seconds']:.2f}s "
+               f"({result['pairs_per_second']:,.0f} pairs/s)")
+    for pair in result['missed'][:show_misses]:
+        score, lost, found = benchmark.explain_miss(corpus, pair)
+        click.echo(f"missed {score:5.1f}  {lost['item_name']} / {lost['category']} / {lost['location']} / {lost['date']}"
+                   f"  vs  {found['item_name']} / {found['category']} / {found['location']} / {found['date']}")
+
+@cli.command('benchmark-startup')
+@click.option('--runs', default=5, show_default=True, help='Fresh interpreters to start.')
+@click.option('--top-imports', default=0, show_default=True, help='Also list the N slowest module imports.')
+def benchmark_startup(runs, top_imports):
+    result = startup_benchmark.run_startup_benchmark(runs, top_imports)
+    click.echo(f"{'phase':<15}{'median ms':>10}{'min ms':>10}")
+    for phase, seconds in result['median'].items():
+        click.echo(f"{phase:<15}{seconds * 1000:>10.1f}{result['min'][phase] * 1000:>10.1f}")
+    click.echo(f"/readyz        {', '.join(str(status) for status in result['ready'])}")
+    for own, cumulative, name in result['imports']:
+        click.echo(f"import {own * 1000:7.1f} ms self {cumulative * 1000:7.1f} ms total  {name}")
+
+if __name__ == '__main__':
+    cli()
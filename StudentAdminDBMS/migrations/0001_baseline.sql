@@ -0,0 +1,97 @@
+-- Baseline schema, identical to database_schema.sql but safe to run against a
+-- database that was already created from it.
+
+-- Users Table
+CREATE TABLE IF NOT EXISTS users (
+    user_id SERIAL PRIMARY KEY,
+    username VARCHAR(100) NOT NULL UNIQUE,
+    email VARCHAR(255) NOT NULL UNIQUE,
+    password_hash VARCHAR(255) NOT NULL,
+    full_name VARCHAR(200) NOT NULL,
+    role VARCHAR(20) NOT NULL CHECK (role IN ('student', 'admin')),
+    phone VARCHAR(20),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_login TIMESTAMP
+);
+
+-- Lost Items Table
+CREATE TABLE IF NOT EXISTS lost_items (
+    lost_id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    item_name VARCHAR(200) NOT NULL,
+    category VARCHAR(100) NOT NULL,
+    description TEXT NOT NULL,
+    location_lost VARCHAR(300) NOT NULL,
+    date_lost DATE NOT NULL,
+    status VARCHAR(20) DEFAULT 'unfound' CHECK (status IN ('unfound', 'found', 'resolved')),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Found Items Table
+CREATE TABLE IF NOT EXISTS found_items (
+    found_id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    item_name VARCHAR(200) NOT NULL,
+    category VARCHAR(100) NOT NULL,
+    description TEXT NOT NULL,
+    location_found VARCHAR(300) NOT NULL,
+    date_found DATE NOT NULL,
+    status VARCHAR(20) DEFAULT 'unclaimed' CHECK (status IN ('unclaimed', 'returned', 'resolved')),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Match Table (many-to-many relationship between lost and found items)
+CREATE TABLE IF NOT EXISTS match_table (
+    match_id SERIAL PRIMARY KEY,
+    lost_id INTEGER NOT NULL REFERENCES lost_items(lost_id) ON DELETE CASCADE,
+    found_id INTEGER NOT NULL REFERENCES found_items(found_id) ON DELETE CASCADE,
+    match_score DECIMAL(5,2) NOT NULL,
+    match_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    verified BOOLEAN DEFAULT FALSE,
+    UNIQUE(lost_id, found_id)
+);
+
+-- Notifications Table
+CREATE TABLE IF NOT EXISTS notifications (
+    notification_id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    match_id INTEGER REFERENCES match_table(match_id) ON DELETE CASCADE,
+    message TEXT NOT NULL,
+    is_read BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Create indexes for better query performance
+CREATE INDEX IF NOT EXISTS idx_lost_items_user ON lost_items(user_id);
+CREATE INDEX IF NOT EXISTS idx_lost_items_status ON lost_items(status);
+CREATE INDEX IF NOT EXISTS idx_lost_items_category ON lost_items(category);
+CREATE INDEX IF NOT EXISTS idx_found_items_user ON found_items(user_id);
+CREATE INDEX IF NOT EXISTS idx_found_items_status ON found_items(status);
+CREATE INDEX IF NOT EXISTS idx_found_items_category ON found_items(category);
+CREATE INDEX IF NOT EXISTS idx_notifications_user ON notifications(user_id);
+CREATE INDEX IF NOT EXISTS idx_notifications_read ON notifications(is_read);
+CREATE INDEX IF NOT EXISTS idx_match_table_lost ON match_table(lost_id);
+CREATE INDEX IF NOT EXISTS idx_match_table_found ON match_table(found_id);
+
+-- Create trigger to update updated_at timestamp
+CREATE OR REPLACE FUNCTION update_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS update_lost_items_updated_at ON lost_items;
+CREATE TRIGGER update_lost_items_updated_at
+    BEFORE UPDATE ON lost_items
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+DROP TRIGGER IF EXISTS update_found_items_updated_at ON found_items;
+CREATE TRIGGER update_found_items_updated_at
+    BEFORE UPDATE ON found_items
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
@@ -0,0 +1,26 @@
+-- Composite and covering indexes for the hot queries
+
+-- Per-user lists ordered by newest first (get_*_items_by_user, get_user_notifications)
+CREATE INDEX IF NOT EXISTS idx_lost_items_user_created ON lost_items (user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_found_items_user_created ON found_items (user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_created ON notifications (user_id, created_at DESC);
+
+-- Unread notifications are a small, hot subset of the table
+CREATE INDEX IF NOT EXISTS idx_notifications_user_unread ON notifications (user_id, created_at DESC) WHERE is_read = FALSE;
+
+-- Matching candidates: open items filtered by status, then category and date
+CREATE INDEX IF NOT EXISTS idx_lost_items_status_category_date ON lost_items (status, category, date_lost);
+CREATE INDEX IF NOT EXISTS idx_found_items_status_category_date ON found_items (status, category, date_found);
+
+-- Admin lists ordered by newest first, and dashboard versions (max(updated_at))
+CREATE INDEX IF NOT EXISTS idx_lost_items_created ON lost_items (created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_found_items_created ON found_items (created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_lost_items_updated ON lost_items (updated_at);
+CREATE INDEX IF NOT EXISTS idx_found_items_updated ON found_items (updated_at);
+
+-- Match lists per item in display order, covering the columns read from match_table
+CREATE INDEX IF NOT EXISTS idx_match_table_lost_score ON match_table (lost_id, match_score DESC, match_date DESC) INCLUDE (found_id, verified);
+CREATE INDEX IF NOT EXISTS idx_match_table_found_score ON match_table (found_id, match_score DESC, match_date DESC) INCLUDE (lost_id, verified);
+
+-- Verified match count for the statistics panel
+CREATE INDEX IF NOT EXISTS idx_match_table_verified ON match_table (match_id) WHERE verified = TRUE;
@@ -0,0 +1,11 @@
+-- Single-column indexes that are now a prefix of a composite index from 0002,
+-- or (is_read) which is replaced by the partial unread index. Dropping them
+-- saves a write per index on every insert and status change.
+DROP INDEX IF EXISTS idx_lost_items_user;
+DROP INDEX IF EXISTS idx_found_items_user;
+DROP INDEX IF EXISTS idx_lost_items_status;
+DROP INDEX IF EXISTS idx_found_items_status;
+DROP INDEX IF EXISTS idx_notifications_user;
+DROP INDEX IF EXISTS idx_notifications_read;
+DROP INDEX IF EXISTS idx_match_table_lost;
+DROP INDEX IF EXISTS idx_match_table_found;
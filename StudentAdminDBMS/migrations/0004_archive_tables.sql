@@ -0,0 +1,38 @@
+-- Archive tables for resolved items and their matches and notifications.
+-- They mirror the live tables (column for column, without foreign keys) plus
+-- an archived_at timestamp. Later migrations that add a column to a live
+-- table must add it to its archive table too.
+
+CREATE TABLE IF NOT EXISTS lost_items_archive (LIKE lost_items);
+ALTER TABLE lost_items_archive ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE lost_items_archive DROP CONSTRAINT IF EXISTS lost_items_archive_pkey;
+ALTER TABLE lost_items_archive ADD PRIMARY KEY (lost_id);
+
+CREATE TABLE IF NOT EXISTS found_items_archive (LIKE found_items);
+ALTER TABLE found_items_archive ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE found_items_archive DROP CONSTRAINT IF EXISTS found_items_archive_pkey;
+ALTER TABLE found_items_archive ADD PRIMARY KEY (found_id);
+
+CREATE TABLE IF NOT EXISTS match_table_archive (LIKE match_table);
+ALTER TABLE match_table_archive ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE match_table_archive DROP CONSTRAINT IF EXISTS match_table_archive_pkey;
+ALTER TABLE match_table_archive ADD PRIMARY KEY (match_id);
+
+CREATE TABLE IF NOT EXISTS notifications_archive (LIKE notifications);
+ALTER TABLE notifications_archive ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE notifications_archive DROP CONSTRAINT IF EXISTS notifications_archive_pkey;
+ALTER TABLE notifications_archive ADD PRIMARY KEY (notification_id);
+
+-- History lookups
+CREATE INDEX IF NOT EXISTS idx_lost_items_archive_user_created ON lost_items_archive (user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_lost_items_archive_archived ON lost_items_archive (archived_at DESC);
+CREATE INDEX IF NOT EXISTS idx_found_items_archive_user_created ON found_items_archive (user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_found_items_archive_archived ON found_items_archive (archived_at DESC);
+CREATE INDEX IF NOT EXISTS idx_match_table_archive_lost ON match_table_archive (lost_id);
+CREATE INDEX IF NOT EXISTS idx_match_table_archive_found ON match_table_archive (found_id);
+CREATE INDEX IF NOT EXISTS idx_notifications_archive_user ON notifications_archive (user_id, created_at DESC);
+
+-- Archival candidates: terminal status, oldest first
+CREATE INDEX IF NOT EXISTS idx_lost_items_resolved ON lost_items (updated_at) WHERE status = 'resolved';
+CREATE INDEX IF NOT EXISTS idx_found_items_resolved ON found_items (updated_at) WHERE status IN ('resolved', 'returned');
+CREATE INDEX IF NOT EXISTS idx_notifications_read_created ON notifications (created_at) WHERE is_read = TRUE;
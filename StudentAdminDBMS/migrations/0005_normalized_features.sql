@@ -0,0 +1,13 @@
+-- Normalized matching features, filled in when an item is stored (see
+-- app/normalize.py). Existing rows are filled by 'manage.py normalize-items'.
+-- NULL means "not normalized yet"; matching then normalizes on the fly.
+
+ALTER TABLE lost_items ADD COLUMN IF NOT EXISTS category_id SMALLINT;
+ALTER TABLE lost_items ADD COLUMN IF NOT EXISTS name_tokens INTEGER[];
+ALTER TABLE found_items ADD COLUMN IF NOT EXISTS category_id SMALLINT;
+ALTER TABLE found_items ADD COLUMN IF NOT EXISTS name_tokens INTEGER[];
+
+ALTER TABLE lost_items_archive ADD COLUMN IF NOT EXISTS category_id SMALLINT;
+ALTER TABLE lost_items_archive ADD COLUMN IF NOT EXISTS name_tokens INTEGER[];
+ALTER TABLE found_items_archive ADD COLUMN IF NOT EXISTS category_id SMALLINT;
+ALTER TABLE found_items_archive ADD COLUMN IF NOT EXISTS name_tokens INTEGER[];
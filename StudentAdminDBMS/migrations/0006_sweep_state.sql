@@ -0,0 +1,16 @@
+-- Progress of the periodic re-matching sweep (app/sweep.py). The watermarks
+-- are the highest item ids covered by the last completed run. While a run is
+-- in progress, target_lost/target_found hold the ids it covers and
+-- done_partitions the partitions already saved, so an interrupted run
+-- resumes where it stopped.
+
+CREATE TABLE IF NOT EXISTS sweep_state (
+    name VARCHAR(50) PRIMARY KEY,
+    lost_watermark INTEGER NOT NULL DEFAULT 0,
+    found_watermark INTEGER NOT NULL DEFAULT 0,
+    target_lost INTEGER,
+    target_found INTEGER,
+    done_partitions TEXT[] NOT NULL DEFAULT '{}',
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
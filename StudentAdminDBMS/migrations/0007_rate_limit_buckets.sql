@@ -0,0 +1,12 @@
+-- Token buckets for RATE_LIMIT_STORE=postgres (app/ratelimit.py), shared by
+-- every server worker. UNLOGGED: losing the buckets in a crash only resets
+-- the limits, and it keeps the per-request write out of the WAL.
+
+CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_buckets (
+    key VARCHAR(200) PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    allowed BOOLEAN NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_rate_limit_buckets_updated ON rate_limit_buckets(updated_at);
@@ -0,0 +1,13 @@
+-- Client-generated idempotency keys for item reports. A resubmitted report
+-- carries the same key and is answered with the item it already created.
+-- Imported and older rows have no key.
+
+ALTER TABLE lost_items ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(64);
+ALTER TABLE found_items ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(64);
+ALTER TABLE lost_items_archive ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(64);
+ALTER TABLE found_items_archive ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(64);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_lost_items_user_idempotency
+    ON lost_items (user_id, idempotency_key) WHERE idempotency_key IS NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_found_items_user_idempotency
+    ON found_items (user_id, idempotency_key) WHERE idempotency_key IS NOT NULL;
@@ -0,0 +1,51 @@
+-- Change notifications for the open items index (app/open_index.py). Every
+-- insert, delete and update of a matching column of lost_items/found_items
+-- sends '<kind>:<id>' on the open_items channel; listeners re-read the row.
+-- Notifications are delivered on commit and duplicates within a transaction
+-- are folded, so a bulk import sends one per row.
+
+CREATE OR REPLACE FUNCTION notify_open_items()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('open_items', TG_ARGV[0] || ':' || (to_jsonb(OLD) ->> TG_ARGV[1]));
+    ELSE
+        PERFORM pg_notify('open_items', TG_ARGV[0] || ':' || (to_jsonb(NEW) ->> TG_ARGV[1]));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS notify_lost_items_insert_delete ON lost_items;
+CREATE TRIGGER notify_lost_items_insert_delete
+    AFTER INSERT OR DELETE ON lost_items
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_open_items('lost', 'lost_id');
+
+DROP TRIGGER IF EXISTS notify_lost_items_update ON lost_items;
+CREATE TRIGGER notify_lost_items_update
+    AFTER UPDATE ON lost_items
+    FOR EACH ROW
+    WHEN ((OLD.status, OLD.item_name, OLD.category, OLD.category_id, OLD.name_tokens, OLD.description,
+           OLD.location_lost, OLD.date_lost)
+          IS DISTINCT FROM
+          (NEW.status, NEW.item_name, NEW.category, NEW.category_id, NEW.name_tokens, NEW.description,
+           NEW.location_lost, NEW.date_lost))
+    EXECUTE FUNCTION notify_open_items('lost', 'lost_id');
+
+DROP TRIGGER IF EXISTS notify_found_items_insert_delete ON found_items;
+CREATE TRIGGER notify_found_items_insert_delete
+    AFTER INSERT OR DELETE ON found_items
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_open_items('found', 'found_id');
+
+DROP TRIGGER IF EXISTS notify_found_items_update ON found_items;
+CREATE TRIGGER notify_found_items_update
+    AFTER UPDATE ON found_items
+    FOR EACH ROW
+    WHEN ((OLD.status, OLD.item_name, OLD.category, OLD.category_id, OLD.name_tokens, OLD.description,
+           OLD.location_found, OLD.date_found)
+          IS DISTINCT FROM
+          (NEW.status, NEW.item_name, NEW.category, NEW.category_id, NEW.name_tokens, NEW.description,
+           NEW.location_found, NEW.date_found))
+    EXECUTE FUNCTION notify_open_items('found', 'found_id');
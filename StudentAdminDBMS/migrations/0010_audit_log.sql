@@ -0,0 +1,17 @@
+-- Audit events for AUDIT_LOG_DB=1 (app/audit.py), written in batches by each
+-- server worker. actor_id is the signed-in user of the request that raised
+-- the event; it is not a foreign key so the history outlives the account.
+-- The full event, including its ids, is kept in data.
+
+CREATE TABLE IF NOT EXISTS audit_log (
+    audit_id BIGSERIAL PRIMARY KEY,
+    created_at TIMESTAMPTZ NOT NULL,
+    event VARCHAR(50) NOT NULL,
+    request_id VARCHAR(64),
+    actor_id INTEGER,
+    data JSONB NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_audit_log_created ON audit_log(created_at);
+CREATE INDEX IF NOT EXISTS idx_audit_log_event_created ON audit_log(event, created_at);
+CREATE INDEX IF NOT EXISTS idx_audit_log_actor_created ON audit_log(actor_id, created_at) WHERE actor_id IS NOT NULL;
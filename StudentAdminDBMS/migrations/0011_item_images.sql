@@ -0,0 +1,37 @@
+-- Photos on item reports (app/images.py). image_file is the stored upload,
+-- named by its content hash; image_hash is the photo's 64-bit difference
+-- hash, filled in by the image workers after the thumbnail is made and used
+-- as a matching signal. The open items index needs to see image_hash change,
+-- so the update triggers from 0009 are recreated with it in their columns.
+
+ALTER TABLE lost_items ADD COLUMN IF NOT EXISTS image_file VARCHAR(64);
+ALTER TABLE lost_items ADD COLUMN IF NOT EXISTS image_hash BIGINT;
+ALTER TABLE found_items ADD COLUMN IF NOT EXISTS image_file VARCHAR(64);
+ALTER TABLE found_items ADD COLUMN IF NOT EXISTS image_hash BIGINT;
+
+ALTER TABLE lost_items_archive ADD COLUMN IF NOT EXISTS image_file VARCHAR(64);
+ALTER TABLE lost_items_archive ADD COLUMN IF NOT EXISTS image_hash BIGINT;
+ALTER TABLE found_items_archive ADD COLUMN IF NOT EXISTS image_file VARCHAR(64);
+ALTER TABLE found_items_archive ADD COLUMN IF NOT EXISTS image_hash BIGINT;
+
+DROP TRIGGER IF EXISTS notify_lost_items_update ON lost_items;
+CREATE TRIGGER notify_lost_items_update
+    AFTER UPDATE ON lost_items
+    FOR EACH ROW
+    WHEN ((OLD.status, OLD.item_name, OLD.category, OLD.category_id, OLD.name_tokens, OLD.description,
+           OLD.location_lost, OLD.date_lost, OLD.image_hash)
+          IS DISTINCT FROM
+          (NEW.status, NEW.item_name, NEW.category, NEW.category_id, NEW.name_tokens, NEW.description,
+           NEW.location_lost, NEW.date_lost, NEW.image_hash))
+    EXECUTE FUNCTION notify_open_items('lost', 'lost_id');
+
+DROP TRIGGER IF EXISTS notify_found_items_update ON found_items;
+CREATE TRIGGER notify_found_items_update
+    AFTER UPDATE ON found_items
+    FOR EACH ROW
+    WHEN ((OLD.status, OLD.item_name, OLD.category, OLD.category_id, OLD.name_tokens, OLD.description,
+           OLD.location_found, OLD.date_found, OLD.image_hash)
+          IS DISTINCT FROM
+          (NEW.status, NEW.item_name, NEW.category, NEW.category_id, NEW.name_tokens, NEW.description,
+           NEW.location_found, NEW.date_found, NEW.image_hash))
+    EXECUTE FUNCTION notify_open_items('found', 'found_id');
@@ -0,0 +1,171 @@
+-- Analytics rollups (app/analytics.py). Triggers append a row to
+-- analytics_events when an item is reported, when it gets its first match and
+-- when it is recovered (or un-recovered by a status change back). The
+-- aggregator folds new events into hourly and daily rollups and deletes them,
+-- so charts read a bounded number of rollup rows however long the history.
+--
+-- Every event is bucketed by its item's report time, so a bucket's match and
+-- recovery counts are those of the items reported in it. Existing items are
+-- backfilled; times to match are taken from the earliest match still stored.
+
+CREATE TABLE IF NOT EXISTS analytics_events (
+    event_id BIGSERIAL PRIMARY KEY,
+    event VARCHAR(10) NOT NULL CHECK (event IN ('reported', 'matched', 'recovered')),
+    kind VARCHAR(5) NOT NULL CHECK (kind IN ('lost', 'found')),
+    category VARCHAR(100) NOT NULL,
+    category_id SMALLINT,
+    location VARCHAR(300) NOT NULL,
+    reported_at TIMESTAMP NOT NULL,
+    delta SMALLINT NOT NULL DEFAULT 1,
+    seconds DOUBLE PRECISION
+);
+
+-- Items that have had a match, so only the first one counts
+CREATE TABLE IF NOT EXISTS analytics_matched_items (
+    kind VARCHAR(5) NOT NULL,
+    item_id INTEGER NOT NULL,
+    PRIMARY KEY (kind, item_id)
+);
+
+-- dimension is 'all' (value ''), 'category' or 'location'. match_seconds is
+-- the total time to first match of the matched items.
+CREATE TABLE IF NOT EXISTS analytics_rollups (
+    grain VARCHAR(4) NOT NULL CHECK (grain IN ('hour', 'day')),
+    dimension VARCHAR(10) NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    kind VARCHAR(5) NOT NULL,
+    value VARCHAR(300) NOT NULL,
+    reported INTEGER NOT NULL DEFAULT 0,
+    matched INTEGER NOT NULL DEFAULT 0,
+    match_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    recovered INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (grain, dimension, bucket, kind, value)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_state (
+    name VARCHAR(50) PRIMARY KEY,
+    events_applied BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP
+);
+
+-- TG_ARGV: kind, location column, recovered statuses
+CREATE OR REPLACE FUNCTION analytics_item_events()
+RETURNS TRIGGER AS $$
+DECLARE
+    recovered_statuses TEXT[] := string_to_array(TG_ARGV[2], ',');
+    delta INTEGER := 0;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO analytics_events (event, kind, category, category_id, location, reported_at)
+        VALUES ('reported', TG_ARGV[0], NEW.category, NEW.category_id, to_jsonb(NEW) ->> TG_ARGV[1], NEW.created_at);
+        IF NEW.status = ANY(recovered_statuses) THEN
+            delta := 1;
+        END IF;
+    ELSIF (OLD.status = ANY(recovered_statuses)) <> (NEW.status = ANY(recovered_statuses)) THEN
+        delta := CASE WHEN NEW.status = ANY(recovered_statuses) THEN 1 ELSE -1 END;
+    END IF;
+    IF delta <> 0 THEN
+        INSERT INTO analytics_events (event, kind, category, category_id, location, reported_at, delta)
+        VALUES ('recovered', TG_ARGV[0], NEW.category, NEW.category_id, to_jsonb(NEW) ->> TG_ARGV[1], NEW.created_at, delta);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION analytics_match_events()
+RETURNS TRIGGER AS $$
+BEGIN
+    WITH first_match AS (
+        INSERT INTO analytics_matched_items (kind, item_id)
+        VALUES ('lost', NEW.lost_id), ('found', NEW.found_id)
+        ON CONFLICT DO NOTHING
+        RETURNING kind, item_id
+    )
+    INSERT INTO analytics_events (event, kind, category, category_id, location, reported_at, seconds)
+    SELECT 'matched', 'lost', l.category, l.category_id, l.location_lost, l.created_at,
+           EXTRACT(EPOCH FROM NEW.match_date - l.created_at)
+    FROM first_match m JOIN lost_items l ON m.kind = 'lost' AND l.lost_id = m.item_id
+    UNION ALL
+    SELECT 'matched', 'found', f.category, f.category_id, f.location_found, f.created_at,
+           EXTRACT(EPOCH FROM NEW.match_date - f.created_at)
+    FROM first_match m JOIN found_items f ON m.kind = 'found' AND f.found_id = m.item_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS analytics_lost_items_insert ON lost_items;
+CREATE TRIGGER analytics_lost_items_insert
+    AFTER INSERT ON lost_items
+    FOR EACH ROW
+    EXECUTE FUNCTION analytics_item_events('lost', 'location_lost', 'found,resolved');
+
+DROP TRIGGER IF EXISTS analytics_lost_items_status ON lost_items;
+CREATE TRIGGER analytics_lost_items_status
+    AFTER UPDATE OF status ON lost_items
+    FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status)
+    EXECUTE FUNCTION analytics_item_events('lost', 'location_lost', 'found,resolved');
+
+DROP TRIGGER IF EXISTS analytics_found_items_insert ON found_items;
+CREATE TRIGGER analytics_found_items_insert
+    AFTER INSERT ON found_items
+    FOR EACH ROW
+    EXECUTE FUNCTION analytics_item_events('found', 'location_found', 'returned,resolved');
+
+DROP TRIGGER IF EXISTS analytics_found_items_status ON found_items;
+CREATE TRIGGER analytics_found_items_status
+    AFTER UPDATE OF status ON found_items
+    FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status)
+    EXECUTE FUNCTION analytics_item_events('found', 'location_found', 'returned,resolved');
+
+DROP TRIGGER IF EXISTS analytics_match_table_insert ON match_table;
+CREATE TRIGGER analytics_match_table_insert
+    AFTER INSERT ON match_table
+    FOR EACH ROW
+    EXECUTE FUNCTION analytics_match_events();
+
+-- Backfill, live and archived rows alike
+INSERT INTO analytics_events (event, kind, category, category_id, location, reported_at)
+SELECT 'reported', 'lost', category, category_id, location_lost, created_at FROM lost_items
+UNION ALL SELECT 'reported', 'lost', category, category_id, location_lost, created_at FROM lost_items_archive
+UNION ALL SELECT 'reported', 'found', category, category_id, location_found, created_at FROM found_items
+UNION ALL SELECT 'reported', 'found', category, category_id, location_found, created_at FROM found_items_archive;
+
+INSERT INTO analytics_events (event, kind, category, category_id, location, reported_at)
+SELECT 'recovered', 'lost', category, category_id, location_lost, created_at
+FROM lost_items WHERE status IN ('found', 'resolved')
+UNION ALL SELECT 'recovered', 'lost', category, category_id, location_lost, created_at
+FROM lost_items_archive WHERE status IN ('found', 'resolved')
+UNION ALL SELECT 'recovered', 'found', category, category_id, location_found, created_at
+FROM found_items WHERE status IN ('returned', 'resolved')
+UNION ALL SELECT 'recovered', 'found', category, category_id, location_found, created_at
+FROM found_items_archive WHERE status IN ('returned', 'resolved');
+
+CREATE TEMP TABLE analytics_first_matches ON COMMIT DROP AS
+SELECT 'lost'::VARCHAR(5) AS kind, lost_id AS item_id, MIN(match_date) AS match_date
+FROM (SELECT lost_id, match_date FROM match_table UNION ALL SELECT lost_id, match_date FROM match_table_archive) m
+GROUP BY lost_id
+UNION ALL
+SELECT 'found', found_id, MIN(match_date)
+FROM (SELECT found_id, match_date FROM match_table UNION ALL SELECT found_id, match_date FROM match_table_archive) m
+GROUP BY found_id;
+
+INSERT INTO analytics_matched_items (kind, item_id)
+SELECT kind, item_id FROM analytics_first_matches
+ON CONFLICT DO NOTHING;
+
+INSERT INTO analytics_events (event, kind, category, category_id, location, reported_at, seconds)
+SELECT 'matched', 'lost', l.category, l.category_id, l.location_lost, l.created_at,
+       EXTRACT(EPOCH FROM m.match_date - l.created_at)
+FROM analytics_first_matches m
+JOIN (SELECT lost_id, category, category_id, location_lost, created_at FROM lost_items
+      UNION ALL SELECT lost_id, category, category_id, location_lost, created_at FROM lost_items_archive) l
+  ON m.kind = 'lost' AND l.lost_id = m.item_id
+UNION ALL
+SELECT 'matched', 'found', f.category, f.category_id, f.location_found, f.created_at,
+       EXTRACT(EPOCH FROM m.match_date - f.created_at)
+FROM analytics_first_matches m
+JOIN (SELECT found_id, category, category_id, location_found, created_at FROM found_items
+      UNION ALL SELECT found_id, category, category_id, location_found, created_at FROM found_items_archive) f
+  ON m.kind = 'found' AND f.found_id = m.item_id;
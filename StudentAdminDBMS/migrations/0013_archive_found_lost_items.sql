@@ -0,0 +1,7 @@
+-- Lost items marked 'found' are archived like returned found items. A
+-- verified match sets the lost item 'found' and the found item 'returned';
+-- archiving only the found side took the match along and left the lost item
+-- in the hot table for good.
+
+DROP INDEX IF EXISTS idx_lost_items_resolved;
+CREATE INDEX IF NOT EXISTS idx_lost_items_closed ON lost_items (updated_at) WHERE status IN ('resolved', 'found');
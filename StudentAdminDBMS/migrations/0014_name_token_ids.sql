@@ -0,0 +1,22 @@
+-- Interned name token IDs (app/normalize.py). Tokens used to be numbered by
+-- their CRC32, so two tokens could share an ID and earn name points for each
+-- other; each now gets the next ID of this table the first time it is seen.
+-- Stored arrays hold the old IDs and are cleared: matching normalizes such
+-- rows on the fly until 'manage.py normalize-items --only-missing' refills
+-- them. The updated_at triggers are off while the arrays are cleared: a
+-- derived column changing is no edit, and must neither restart the archive
+-- clock nor change the dashboard versions.
+
+CREATE TABLE IF NOT EXISTS name_token_ids (
+    token_id SERIAL PRIMARY KEY,
+    token TEXT NOT NULL UNIQUE
+);
+
+ALTER TABLE lost_items DISABLE TRIGGER update_lost_items_updated_at;
+ALTER TABLE found_items DISABLE TRIGGER update_found_items_updated_at;
+UPDATE lost_items SET name_tokens = NULL WHERE name_tokens IS NOT NULL;
+UPDATE found_items SET name_tokens = NULL WHERE name_tokens IS NOT NULL;
+ALTER TABLE lost_items ENABLE TRIGGER update_lost_items_updated_at;
+ALTER TABLE found_items ENABLE TRIGGER update_found_items_updated_at;
+UPDATE lost_items_archive SET name_tokens = NULL WHERE name_tokens IS NOT NULL;
+UPDATE found_items_archive SET name_tokens = NULL WHERE name_tokens IS NOT NULL;
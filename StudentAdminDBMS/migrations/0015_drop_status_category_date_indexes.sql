@@ -0,0 +1,9 @@
+-- The (status, category, date) indexes from 0002 were meant for a candidate
+-- query filtering open items by category and date, which the application
+-- never sends: open items are read by status alone (get_open_*_items and
+-- the statistics counts). Plain status indexes serve those, with two fewer
+-- columns to maintain on every insert and status change.
+DROP INDEX IF EXISTS idx_lost_items_status_category_date;
+DROP INDEX IF EXISTS idx_found_items_status_category_date;
+CREATE INDEX IF NOT EXISTS idx_lost_items_status ON lost_items (status);
+CREATE INDEX IF NOT EXISTS idx_found_items_status ON found_items (status);
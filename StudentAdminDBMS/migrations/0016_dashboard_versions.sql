@@ -0,0 +1,120 @@
+-- Version counters for the dashboard fragment cache and ETags. Versions used
+-- to be row count + MAX(updated_at), but updated_at is the writer's
+-- transaction start: an update that committed after a newer one had been
+-- read could leave the maximum unchanged, and the page cached before it was
+-- served forever. The counters are bumped by triggers in the writing
+-- transaction, so a reader sees the new version exactly when it sees the
+-- rows that changed.
+
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO table_versions (table_name)
+VALUES ('lost_items'), ('found_items'), ('users')
+ON CONFLICT (table_name) DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS user_versions (
+    user_id INTEGER PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION bump_table_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- One bump per statement and owner. Owners are locked in user_id order so
+-- two statements touching the same users cannot deadlock on their counters.
+CREATE OR REPLACE FUNCTION bump_user_versions()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO user_versions (user_id, version)
+        SELECT DISTINCT user_id, 1 FROM old_rows WHERE user_id IS NOT NULL ORDER BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET version = user_versions.version + 1;
+    ELSE
+        INSERT INTO user_versions (user_id, version)
+        SELECT DISTINCT user_id, 1 FROM new_rows WHERE user_id IS NOT NULL ORDER BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET version = user_versions.version + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS bump_lost_items_version ON lost_items;
+CREATE TRIGGER bump_lost_items_version
+    AFTER INSERT OR UPDATE OR DELETE ON lost_items
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS bump_found_items_version ON found_items;
+CREATE TRIGGER bump_found_items_version
+    AFTER INSERT OR UPDATE OR DELETE ON found_items
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS bump_users_version ON users;
+CREATE TRIGGER bump_users_version
+    AFTER INSERT OR UPDATE OR DELETE ON users
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_table_version();
+
+-- Transition tables allow one event per trigger, hence three per table.
+DROP TRIGGER IF EXISTS bump_lost_items_user_insert ON lost_items;
+CREATE TRIGGER bump_lost_items_user_insert
+    AFTER INSERT ON lost_items REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_versions();
+
+DROP TRIGGER IF EXISTS bump_lost_items_user_update ON lost_items;
+CREATE TRIGGER bump_lost_items_user_update
+    AFTER UPDATE ON lost_items REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_versions();
+
+DROP TRIGGER IF EXISTS bump_lost_items_user_delete ON lost_items;
+CREATE TRIGGER bump_lost_items_user_delete
+    AFTER DELETE ON lost_items REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_versions();
+
+DROP TRIGGER IF EXISTS bump_found_items_user_insert ON found_items;
+CREATE TRIGGER bump_found_items_user_insert
+    AFTER INSERT ON found_items REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_versions();
+
+DROP TRIGGER IF EXISTS bump_found_items_user_update ON found_items;
+CREATE TRIGGER bump_found_items_user_update
+    AFTER UPDATE ON found_items REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_versions();
+
+DROP TRIGGER IF EXISTS bump_found_items_user_delete ON found_items;
+CREATE TRIGGER bump_found_items_user_delete
+    AFTER DELETE ON found_items REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_versions();
+
+DROP TRIGGER IF EXISTS bump_notifications_user_insert ON notifications;
+CREATE TRIGGER bump_notifications_user_insert
+    AFTER INSERT ON notifications REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_versions();
+
+DROP TRIGGER IF EXISTS bump_notifications_user_update ON notifications;
+CREATE TRIGGER bump_notifications_user_update
+    AFTER UPDATE ON notifications REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_versions();
+
+DROP TRIGGER IF EXISTS bump_notifications_user_delete ON notifications;
+CREATE TRIGGER bump_notifications_user_delete
+    AFTER DELETE ON notifications REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_versions();
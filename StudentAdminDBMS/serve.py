@@ -0,0 +1,14 @@
+import os
+import sys
+from gunicorn.app.wsgiapp import run
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+if __name__ == '__main__':
+    sys.argv = [
+        sys.argv[0],
+        '--chdir', PROJECT_ROOT,
+        '--config', os.path.join(PROJECT_ROOT, 'gunicorn.conf.py'),
+        'wsgi:app',
+    ] + sys.argv[1:]
+    run()
@@ -30,3 +30,479 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 });
+
+const STATUS_BADGES = {
+    unfound: 'warning',
+    found: 'success',
+    unclaimed: 'warning',
+    returned: 'success',
+    resolved: 'info'
+};
+
+function apiRequest(url, body) {
+    return fetch(url, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: { 'Accept': 'application/json' },
+        body: body
+    }).then(response => response.json().then(data => {
+        if (!response.ok) {
+            throw new Error(data.error || 'Request failed');
+        }
+        return data;
+    }));
+}
+
+function showAlert(message, category) {
+    const container = document.querySelector('.container');
+    const alert = document.createElement('div');
+    alert.className = 'alert alert-' + category;
+    alert.textContent = message;
+    container.insertBefore(alert, container.firstChild);
+    setTimeout(() => alert.remove(), 5000);
+}
+
+function setCount(name, value) {
+    const counter = document.querySelector('[data-count="' + name + '"]');
+    if (counter) {
+        counter.textContent = value;
+    }
+}
+
+function adjustCount(name, delta) {
+    const counter = document.querySelector('[data-count="' + name + '"]');
+    if (counter) {
+        counter.textContent = parseInt(counter.textContent, 10) + delta;
+    }
+}
+
+function setBadge(row, status) {
+    const badge = row.querySelector('.badge');
+    if (badge) {
+        badge.className = 'badge badge-' + (STATUS_BADGES[status] || 'info');
+        badge.textContent = status;
+    }
+}
+
+function initStatusSelects() {
+    document.querySelectorAll('select[data-status-url]').forEach(select => {
+        select.dataset.current = select.value;
+        select.addEventListener('change', () => {
+            const body = new FormData();
+            body.append('status', select.value);
+            apiRequest(select.dataset.statusUrl, body)
+                .then(data => {
+                    select.dataset.current = data.status;
+                    setBadge(select.closest('tr'), data.status);
+                })
+                .catch(error => {
+                    select.value = select.dataset.current;
+                    showAlert('Error updating status: ' + error.message, 'error');
+                });
+        });
+    });
+}
+
+function initNotificationLinks() {
+    document.querySelectorAll('a[data-read-url]').forEach(link => {
+        link.addEventListener('click', event => {
+            event.preventDefault();
+            apiRequest(link.dataset.readUrl)
+                .then(data => {
+                    link.closest('.notification-item').classList.remove('unread');
+                    link.remove();
+                    setCount('unread', data.unread_count);
+                })
+                .catch(error => showAlert(error.message, 'error'));
+        });
+    });
+
+    const readAll = document.querySelector('a[data-read-all-url]');
+    if (readAll) {
+        readAll.addEventListener('click', event => {
+            event.preventDefault();
+            apiRequest(readAll.dataset.readAllUrl)
+                .then(data => {
+                    document.querySelectorAll('.notification-item.unread').forEach(item => item.classList.remove('unread'));
+                    document.querySelectorAll('a[data-read-url]').forEach(link => link.remove());
+                    setCount('unread', data.unread_count);
+                    showAlert('All notifications marked as read.', 'success');
+                })
+                .catch(error => showAlert(error.message, 'error'));
+        });
+    }
+}
+
+function appendItemRow(tableId, item) {
+    const tbody = document.querySelector('#' + tableId + ' tbody');
+    if (!tbody) {
+        // First item of its kind: the table isn't rendered yet
+        window.location.reload();
+        return;
+    }
+
+    const row = document.createElement('tr');
+    const cells = [item.item_name, item.category, item.location_lost || item.location_found, item.date_lost || item.date_found];
+    cells.forEach(value => {
+        const cell = document.createElement('td');
+        cell.textContent = value;
+        row.appendChild(cell);
+    });
+    if (item.image_url) {
+        // The thumbnail is made in the background; show the photo until the next reload
+        const link = document.createElement('a');
+        const image = document.createElement('img');
+        link.href = item.image_url;
+        image.className = 'item-photo';
+        image.src = item.image_url;
+        image.alt = '';
+        link.appendChild(image);
+        row.firstChild.insertBefore(link, row.firstChild.firstChild);
+    }
+
+    const statusCell = document.createElement('td');
+    const badge = document.createElement('span');
+    statusCell.appendChild(badge);
+    row.appendChild(statusCell);
+    setBadge(row, item.status);
+
+    tbody.insertBefore(row, tbody.firstChild);
+}
+
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+}
+
+function initReportForms() {
+    document.querySelectorAll('form[data-api-url]').forEach(form => {
+        // One key per report: a retried or double submit reuses it and gets the
+        // original item back, and the key is only replaced after a success
+        const key = form.querySelector('input[name="idempotency_key"]');
+        key.value = newIdempotencyKey();
+
+        form.addEventListener('submit', event => {
+            event.preventDefault();
+            const button = form.querySelector('button[type="submit"]');
+            button.disabled = true;
+
+            apiRequest(form.dataset.apiUrl, new FormData(form))
+                .then(data => {
+                    if (data.duplicate) {
+                        showAlert(data.message, 'info');
+                    } else {
+                        appendItemRow(form.dataset.table, data.item);
+                        adjustCount(form.dataset.table === 'my-lost-items' ? 'lost' : 'found', 1);
+                        showAlert(data.message, 'success');
+                    }
+                    form.reset();
+                    key.value = newIdempotencyKey();
+                    form.querySelectorAll('input[type="date"]').forEach(input => {
+                        input.value = input.max;
+                    });
+                })
+                .catch(error => showAlert(error.message, 'error'))
+                .finally(() => {
+                    button.disabled = false;
+                });
+        });
+    });
+}
+
+function whenVisible(element, load) {
+    // Runs load once, the first time element is shown: panels on hidden tabs
+    // (display: none) fetch nothing until their tab is opened, and panels
+    // further down the page until they are scrolled into view
+    if (!('IntersectionObserver' in window)) {
+        load();
+        return;
+    }
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            observer.disconnect();
+            load();
+        }
+    });
+    observer.observe(element);
+}
+
+function loadListPage(table, button) {
+    // History lists are fetched a page at a time, the first once they are shown
+    const page = parseInt(table.dataset.page || '0', 10) + 1;
+    const columns = table.dataset.columns.split(',');
+    const tbody = table.querySelector('tbody');
+
+    fetch(table.dataset.listUrl + '?page=' + page, { credentials: 'same-origin', headers: { 'Accept': 'application/json' } })
+        .then(response => response.json())
+        .then(data => {
+            data.items.forEach(item => {
+                const row = document.createElement('tr');
+                columns.forEach(column => {
+                    const cell = document.createElement('td');
+                    cell.textContent = item[column] === null ? '' : item[column];
+                    row.appendChild(cell);
+                });
+                tbody.appendChild(row);
+            });
+            table.dataset.page = page;
+            button.style.display = data.has_more ? '' : 'none';
+        })
+        .catch(error => showAlert(error.message, 'error'));
+}
+
+function initListTables() {
+    document.querySelectorAll('table[data-list-url]').forEach(table => {
+        const button = table.closest('.card').querySelector('[data-load-more]');
+        button.addEventListener('click', () => loadListPage(table, button));
+        whenVisible(table, () => loadListPage(table, button));
+    });
+}
+
+function setItemStatus(kind, itemId, status) {
+    const row = document.querySelector('#' + kind + '-items-tab tr[data-item-id="' + itemId + '"]');
+    if (!row) {
+        return;
+    }
+    setBadge(row, status);
+    const select = row.querySelector('select[data-status-url]');
+    if (select) {
+        select.value = status;
+        select.dataset.current = status;
+    }
+}
+
+function queueCell(row, content) {
+    const cell = document.createElement('td');
+    if (content instanceof Node) {
+        cell.appendChild(content);
+    } else {
+        cell.textContent = content;
+    }
+    row.appendChild(cell);
+}
+
+function loadQueuePage(table, button, reset) {
+    const tbody = table.querySelector('tbody');
+    if (reset) {
+        // Verified matches leave the queue and shift the pages after them
+        tbody.innerHTML = '';
+        table.dataset.page = '0';
+    }
+    const page = parseInt(table.dataset.page || '0', 10) + 1;
+
+    fetch(table.dataset.queueUrl + '?page=' + page, { credentials: 'same-origin', headers: { 'Accept': 'application/json' } })
+        .then(response => response.json())
+        .then(data => {
+            data.items.forEach(match => {
+                const row = document.createElement('tr');
+                const checkbox = document.createElement('input');
+                checkbox.type = 'checkbox';
+                checkbox.name = 'match_ids';
+                checkbox.value = match.match_id;
+                const verify = document.createElement('button');
+                verify.type = 'button';
+                verify.className = 'btn btn-sm btn-primary';
+                verify.textContent = 'Verify';
+                verify.dataset.matchId = match.match_id;
+
+                queueCell(row, checkbox);
+                queueCell(row, match.match_score + '%');
+                queueCell(row, match.lost_item_name);
+                queueCell(row, match.lost_owner);
+                queueCell(row, match.location_lost + ', ' + match.date_lost);
+                queueCell(row, match.found_item_name);
+                queueCell(row, match.finder);
+                queueCell(row, match.location_found + ', ' + match.date_found);
+                queueCell(row, verify);
+                tbody.appendChild(row);
+            });
+            table.dataset.page = page;
+            button.style.display = data.has_more ? '' : 'none';
+        })
+        .catch(error => showAlert(error.message, 'error'));
+}
+
+function verifyMatches(form, matchIds) {
+    const table = form.querySelector('table[data-queue-url]');
+    const body = new FormData();
+    matchIds.forEach(matchId => body.append('match_ids', matchId));
+
+    return apiRequest(form.dataset.verifyUrl, body)
+        .then(data => {
+            data.verified.forEach(match => {
+                setItemStatus('lost', match.lost_id, 'found');
+                setItemStatus('found', match.found_id, 'returned');
+            });
+            adjustCount('verified_matches', data.verified.length);
+            adjustCount('unfound_lost', -data.verified.length);
+            adjustCount('unclaimed_found', -data.verified.length);
+            let message = 'Verified ' + data.verified.length + ' match' + (data.verified.length === 1 ? '' : 'es') + '.';
+            if (data.skipped.length) {
+                message += ' ' + data.skipped.length + ' skipped: already verified or sharing an item with a better match.';
+            }
+            showAlert(message, data.verified.length ? 'success' : 'info');
+            loadQueuePage(table, form.querySelector('[data-load-more]'), true);
+        })
+        .catch(error => showAlert('Error verifying matches: ' + error.message, 'error'));
+}
+
+function initVerificationQueue() {
+    const form = document.querySelector('form[data-verify-url]');
+    if (!form) {
+        return;
+    }
+    const table = form.querySelector('table[data-queue-url]');
+    const button = form.querySelector('[data-load-more]');
+    button.addEventListener('click', () => loadQueuePage(table, button));
+
+    form.querySelector('[data-select-all]').addEventListener('change', event => {
+        form.querySelectorAll('input[name="match_ids"]').forEach(checkbox => {
+            checkbox.checked = event.target.checked;
+        });
+    });
+
+    table.addEventListener('click', event => {
+        const verify = event.target.closest('button[data-match-id]');
+        if (verify) {
+            verify.disabled = true;
+            verifyMatches(form, [verify.dataset.matchId]).finally(() => {
+                verify.disabled = false;
+            });
+        }
+    });
+
+    form.addEventListener('submit', event => {
+        event.preventDefault();
+        const matchIds = Array.from(form.querySelectorAll('input[name="match_ids"]:checked')).map(checkbox => checkbox.value);
+        if (!matchIds.length) {
+            showAlert('Please select the matches to verify.', 'error');
+            return;
+        }
+        const submit = form.querySelector('button[type="submit"]');
+        submit.disabled = true;
+        form.querySelector('[data-select-all]').checked = false;
+        verifyMatches(form, matchIds).finally(() => {
+            submit.disabled = false;
+        });
+    });
+
+    whenVisible(form, () => loadQueuePage(table, button));
+}
+
+const SVG_NS = 'http://www.w3.org/2000/svg';
+
+function svgElement(name, attributes) {
+    const element = document.createElementNS(SVG_NS, name);
+    Object.keys(attributes).forEach(key => element.setAttribute(key, attributes[key]));
+    return element;
+}
+
+function percent(rate) {
+    return rate === null ? '-' : Math.round(rate * 100) + '%';
+}
+
+function renderAnalyticsChart(container, data) {
+    // Lost and found reports side by side per period, the matched share darker
+    const width = 800;
+    const height = 220;
+    const periods = data.series.length;
+    const peak = Math.max(1, ...data.series.map(point => Math.max(point.lost.reported, point.found.reported)));
+    const slot = width / periods;
+    const bar = Math.max(1, slot / 2 - 1);
+    const svg = svgElement('svg', { viewBox: '0 0 ' + width + ' ' + (height + 20), role: 'img' });
+
+    data.series.forEach((point, index) => {
+        ['lost', 'found'].forEach((kind, offset) => {
+            const x = index * slot + offset * bar;
+            const reported = point[kind].reported / peak * height;
+            const matched = point[kind].matched / peak * height;
+            svg.appendChild(svgElement('rect', { x: x, y: height - reported, width: bar, height: reported, class: 'bar-' + kind }));
+            svg.appendChild(svgElement('rect', { x: x, y: height - matched, width: bar, height: matched, class: 'bar-' + kind + '-matched' }));
+        });
+        const title = svgElement('title', {});
+        title.textContent = point.bucket.replace('T00:00:00', '') + ': ' + point.lost.reported + ' lost (' +
+            point.lost.matched + ' matched), ' + point.found.reported + ' found (' + point.found.matched + ' matched)';
+        const hover = svgElement('rect', { x: index * slot, y: 0, width: slot, height: height, class: 'bar-hover' });
+        hover.appendChild(title);
+        svg.appendChild(hover);
+    });
+    [data.series[0], data.series[periods - 1]].forEach((point, index) => {
+        const label = svgElement('text', { x: index ? width : 0, y: height + 15, 'text-anchor': index ? 'end' : 'start' });
+        label.textContent = data.grain === 'hour' ? point.bucket.slice(5, 16).replace('T', ' ') : point.bucket.slice(0, 10);
+        svg.appendChild(label);
+    });
+    container.replaceChildren(svg);
+}
+
+function renderAnalyticsTotals(container, totals) {
+    const cards = [
+        [totals.lost.reported, 'Lost Reported'],
+        [percent(totals.lost.match_rate), 'Lost Matched'],
+        [percent(totals.lost.recovery_rate), 'Lost Recovered'],
+        [totals.lost.avg_hours_to_match === null ? '-' : totals.lost.avg_hours_to_match + 'h', 'Avg. Time to Match'],
+        [totals.found.reported, 'Found Reported'],
+        [percent(totals.found.recovery_rate), 'Found Returned'],
+    ];
+    container.replaceChildren(...cards.map(([value, label]) => {
+        const card = document.createElement('div');
+        card.className = 'stat-card';
+        const heading = document.createElement('h3');
+        heading.textContent = value;
+        const text = document.createElement('p');
+        text.textContent = label;
+        card.append(heading, text);
+        return card;
+    }));
+}
+
+function renderAnalyticsBreakdown(table, rows) {
+    const tbody = table.querySelector('tbody');
+    tbody.innerHTML = '';
+    rows.forEach(item => {
+        const row = document.createElement('tr');
+        queueCell(row, item.value);
+        ['lost', 'found'].forEach(kind => {
+            queueCell(row, item[kind].reported);
+            queueCell(row, item[kind].matched + ' (' + percent(item[kind].match_rate) + ')');
+            queueCell(row, item[kind].recovered + ' (' + percent(item[kind].recovery_rate) + ')');
+        });
+        tbody.appendChild(row);
+    });
+}
+
+function loadAnalytics(card) {
+    const [grain, periods] = card.querySelector('[data-analytics-range]').value.split(':');
+    fetch(card.dataset.analyticsUrl + '?grain=' + grain + '&periods=' + periods,
+          { credentials: 'same-origin', headers: { 'Accept': 'application/json' } })
+        .then(response => response.json())
+        .then(data => {
+            renderAnalyticsTotals(card.querySelector('[data-analytics-totals]'), data.totals);
+            renderAnalyticsChart(card.querySelector('[data-analytics-chart]'), data);
+            document.querySelectorAll('table[data-analytics-breakdown]').forEach(table => {
+                renderAnalyticsBreakdown(table, data[table.dataset.analyticsBreakdown]);
+            });
+            card.querySelector('[data-analytics-updated]').textContent = data.updated_at ?
+                'Updated ' + new Date(data.updated_at).toLocaleString() + '.' : 'Not aggregated yet.';
+        })
+        .catch(error => showAlert(error.message, 'error'));
+}
+
+function initAnalytics() {
+    const card = document.querySelector('[data-analytics-url]');
+    if (!card) {
+        return;
+    }
+    card.querySelector('[data-analytics-range]').addEventListener('change', () => loadAnalytics(card));
+    whenVisible(card, () => loadAnalytics(card));
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    initStatusSelects();
+    initListTables();
+    initVerificationQueue();
+    initNotificationLinks();
+    initReportForms();
+    initAnalytics();
+});
@@ -0,0 +1,5 @@
+from app import create_app
+
+# Resources are opened per worker by the server's post-fork hook (see
+# gunicorn.conf.py) or lazily on the first request, never in the master.
+app = create_app(start_worker=False)